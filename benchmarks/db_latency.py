@@ -0,0 +1,75 @@
+"""
+Сравнение задержки вызовов БД: новое соединение на каждый вызов (как было)
+против постоянного пула соединений Database.
+
+Запуск из корня репозитория:
+    python -m benchmarks.db_latency --calls 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import aiosqlite
+
+from src.database import init_db
+
+SELECT_BY_USER = (
+    "SELECT id, user_id, username, full_name, age, citizenship, region_name, address, phone, status "
+    "FROM applications WHERE user_id = ?"
+)
+
+
+def _report(title: str, samples: list[float]):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{title:<28} avg={statistics.mean(samples) * 1000:.3f}ms "
+        f"p50={statistics.median(samples) * 1000:.3f}ms p95={p95 * 1000:.3f}ms"
+    )
+
+
+async def bench_fresh_connections(path: str, calls: int) -> list[float]:
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        async with aiosqlite.connect(path) as db:
+            async with db.execute(SELECT_BY_USER, (i % 100,)) as cursor:
+                await cursor.fetchone()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def bench_pool(path: str, calls: int) -> list[float]:
+    db = await init_db(path)
+    samples = []
+    try:
+        for i in range(calls):
+            started = time.perf_counter()
+            await db.get_application_by_user_id(i % 100)
+            samples.append(time.perf_counter() - started)
+    finally:
+        await db.close()
+    return samples
+
+
+async def main(calls: int):
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = await init_db(path)
+        for user_id in range(100):
+            await db.add_or_update_application(user_id, f"user{user_id}", "Тест", {"age": 30, "phone": "+79000000000"})
+        await db.close()
+
+        _report("новое соединение на вызов", await bench_fresh_connections(path, calls))
+        _report("пул Database", await bench_pool(path, calls))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().calls))
@@ -0,0 +1,38 @@
+"""
+Пропускная способность записи при всплеске одновременных заявок:
+все записи идут через задачу-писателя Database и фиксируются пачками.
+
+Запуск из корня репозитория:
+    python -m benchmarks.db_writes --submissions 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from src.database import init_db
+
+
+async def main(submissions: int):
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await init_db(os.path.join(tmp, "bench.db"))
+        user_data = {"age": 30, "citizenship": "РФ", "region_name": "Московская область", "phone": "+79000000000"}
+        try:
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                db.add_or_update_application(user_id, f"user{user_id}", "Тест", user_data)
+                for user_id in range(submissions)
+            ))
+            elapsed = time.perf_counter() - started
+        finally:
+            await db.close()
+    print(f"{submissions} заявок за {elapsed:.3f}с ({submissions / elapsed:.0f} записей/с)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().submissions))
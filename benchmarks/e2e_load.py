@@ -0,0 +1,298 @@
+"""
+Сквозной нагрузочный тест бота на локальной заглушке Telegram Bot API.
+
+--users пользователей одновременно проходят всю анкету UserRegistration
+(/start, "Подать заявку", возраст, гражданство, регион, адрес - из списка
+или поиском, телефон, подтверждение), а --admins администраторов листают /view_apps, нажимая
+кнопку "След." из последней показанной клавиатуры. Каждый участник ждет
+обработки своего предыдущего обновления, как живой пользователь.
+Доля --double-tap пользователей нажимает "Подтвердить" дважды подряд;
+заявка должна быть отправлена один раз (см. UpdateSchedulerMiddleware).
+
+Бот собирается так же, как в bot.py (setup_dispatcher), и получает
+обновления через getUpdates заглушки (--mode polling) или через вебхук
+(--mode webhook). В конце печатаются p50/p95/p99 времени работы каждого
+хендлера, сквозная задержка обновления и пропускная способность.
+
+Запуск из корня репозитория (сеть не нужна):
+    python -m benchmarks.e2e_load --users 2000 --admins 5 --pages 20 --mode polling
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+import aiohttp
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import TelegramObject, Update
+
+from benchmarks.fake_telegram import FakeTelegramServer, BOT_ID
+from bot import setup_dispatcher, build_webhook_app
+from src.database import init_db
+
+ADMIN_CHAT_ID = -1000
+ADMIN_BASE_ID = 1
+USER_BASE_ID = 100_000
+SECRET = "load-test-secret"
+
+
+class HandlerTimer(BaseMiddleware):
+    """Внутренний middleware роутера: время работы хендлера по его имени."""
+
+    def __init__(self, timings: dict[str, list[float]]):
+        super().__init__()
+        self.timings = timings
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            name = data["handler"].callback.__name__
+            self.timings[name].append(time.perf_counter() - started)
+
+
+class UpdateTracker(BaseMiddleware):
+    """Внешний middleware диспетчера: сообщает сценарию, что обновление обработано."""
+
+    def __init__(self):
+        super().__init__()
+        self.pending: dict[int, tuple[float, asyncio.Future]] = {}
+        self.latencies: list[float] = []
+
+    def expect(self, update_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = (time.perf_counter(), future)
+        return future
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            started, future = self.pending.pop(event.update_id, (None, None))
+            if future is not None and not future.done():
+                self.latencies.append(time.perf_counter() - started)
+                future.set_result(None)
+
+
+class Scenario:
+    """Формирует обновления от имени пользователей и отправляет их боту."""
+
+    def __init__(self, fake_api: FakeTelegramServer, tracker: UpdateTracker, webhook_url: str | None):
+        self._fake_api = fake_api
+        self._tracker = tracker
+        self._webhook_url = webhook_url
+        self._client: aiohttp.ClientSession | None = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+        self.timeouts = 0
+
+    async def __aenter__(self):
+        if self._webhook_url:
+            self._client = aiohttp.ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._client is not None:
+            await self._client.close()
+
+    @staticmethod
+    def _user(user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    async def _send(self, payload: dict, wait: bool = True):
+        update_id = next(self._update_ids)
+        update = {"update_id": update_id, **payload}
+        done = self._tracker.expect(update_id) if wait else None
+        if self._client is not None:
+            async with self._client.post(self._webhook_url, json=update) as response:
+                response.raise_for_status()
+        else:
+            self._fake_api.push_update(update)
+        if done is None:
+            # Повторное нажатие может быть отброшено, не дойдя до UpdateTracker, - его не ждем
+            return
+        try:
+            await asyncio.wait_for(done, 30)
+        except asyncio.TimeoutError:
+            self._tracker.pending.pop(update_id, None)
+            self.timeouts += 1
+
+    async def message(self, user_id: int, text: str):
+        entities = [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else None
+        await self._send({"message": {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+            "entities": entities
+        }})
+
+    async def press(self, user_id: int, data: str, message_id: int | None = None, wait: bool = True):
+        await self._send({"callback_query": {
+            "id": str(next(self._message_ids)),
+            "from": self._user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": BOT_ID, "is_bot": True, "first_name": "Bot"},
+                "text": "..."
+            }
+        }}, wait=wait)
+
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+
+    def find_button(self, chat_id: int, prefix: str) -> str | None:
+        for row in self._fake_api.last_markup.get(chat_id, []):
+            for button in row:
+                if button.get("text", "").startswith(prefix):
+                    return button.get("callback_data")
+        return None
+
+    def callbacks(self, chat_id: int, data_prefix: str) -> list[str]:
+        """callback_data кнопок последней клавиатуры чата, начинающиеся с data_prefix."""
+        return [
+            button["callback_data"]
+            for row in self._fake_api.last_markup.get(chat_id, [])
+            for button in row
+            if button.get("callback_data", "").startswith(data_prefix)
+        ]
+
+
+async def applicant(scenario: Scenario, user_id: int, double_tap: bool = False):
+    await scenario.message(user_id, "/start")
+    await scenario.press(user_id, "start_new_application")
+    await scenario.message(user_id, str(18 + user_id % 40))
+    await scenario.message(user_id, "РФ")
+    await scenario.press(user_id, "region_msk")
+    if user_id % 4 == 0:
+        # Часть пользователей ищет адрес по тексту, а не выбирает из списка
+        await scenario.message(user_id, "калин")
+    addresses = scenario.callbacks(user_id, "address_")
+    await scenario.press(user_id, addresses[user_id % len(addresses)] if addresses else "address_1")
+    await scenario.message(user_id, f"+7900{user_id % 10_000_000:07d}")
+    if double_tap:
+        # Второе нажатие той же кнопки в том же сообщении, пока первое еще обрабатывается
+        message_id = scenario.next_message_id()
+        await asyncio.gather(
+            scenario.press(user_id, "confirm_submission", message_id=message_id),
+            scenario.press(user_id, "confirm_submission", message_id=message_id, wait=False)
+        )
+    else:
+        await scenario.press(user_id, "confirm_submission")
+
+
+async def admin(scenario: Scenario, admin_id: int, pages: int):
+    await scenario.message(admin_id, "/view_apps")
+    for _ in range(pages):
+        next_page = scenario.find_button(admin_id, "След.")
+        if next_page is None:
+            await scenario.message(admin_id, "/view_apps")
+        else:
+            await scenario.press(admin_id, next_page)
+
+
+def percentiles(values: list[float]) -> str:
+    if len(values) < 2:
+        return f"{values[0] * 1000:8.2f}" * 3 if values else "       -" * 3
+    q = statistics.quantiles(values, n=100)
+    return f"{q[49] * 1000:8.2f}{q[94] * 1000:8.2f}{q[98] * 1000:8.2f}"
+
+
+async def main(users: int, admins: int, pages: int, seed: int, mode: str, double_tap: float):
+    logging.disable(logging.WARNING)
+    fake_api = FakeTelegramServer()
+    await fake_api.start()
+    timings: dict[str, list[float]] = defaultdict(list)
+    tracker = UpdateTracker()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await init_db(os.path.join(tmp, "bench.db"))
+        user_data = {"age": 30, "citizenship": "РФ", "region_name": "Московская область", "address": "Мытищи", "phone": "+79000000000"}
+        await asyncio.gather(*(
+            db.add_or_update_application(user_id, f"seed{user_id}", "Seed", user_data)
+            for user_id in range(USER_BASE_ID + users, USER_BASE_ID + users + seed)
+        ))
+
+        bot = Bot(token=f"{BOT_ID}:LOAD_TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(fake_api.url)))
+        admin_ids = list(range(ADMIN_BASE_ID, ADMIN_BASE_ID + admins))
+        dp = await setup_dispatcher(bot, db, ADMIN_CHAT_ID, admin_ids, metrics_port=0)
+        dp.update.outer_middleware(tracker)
+        for router in dp.sub_routers:
+            router.message.middleware(HandlerTimer(timings))
+            router.callback_query.middleware(HandlerTimer(timings))
+
+        runner, polling, webhook_url = None, None, None
+        if mode == "webhook":
+            runner = web.AppRunner(build_webhook_app(bot, dp, path="/webhook", secret=SECRET), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", 0).start()
+            webhook_url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+        else:
+            polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+
+        try:
+            async with Scenario(fake_api, tracker, webhook_url) as scenario:
+                started = time.perf_counter()
+                await asyncio.gather(
+                    *(applicant(scenario, USER_BASE_ID + i, i < users * double_tap) for i in range(users)),
+                    *(admin(scenario, admin_id, pages) for admin_id in admin_ids)
+                )
+                elapsed = time.perf_counter() - started
+        finally:
+            if polling is not None:
+                await dp.stop_polling()
+                await polling
+                await bot.session.close()
+            if runner is not None:
+                await runner.cleanup()
+            await db.close()
+            await fake_api.close()
+
+    updates = len(tracker.latencies)
+    print(f"Режим: {mode}; пользователей: {users}, админов: {admins} x {pages} страниц, заявок в БД до старта: {seed}")
+    print(f"{'хендлер':<40}{'вызовов':>8}{'p50 мс':>8}{'p95 мс':>8}{'p99 мс':>8}")
+    for name, values in sorted(timings.items(), key=lambda item: -len(item[1])):
+        print(f"{name:<40}{len(values):>8}{percentiles(values)}")
+    print(f"{'обновление целиком':<40}{updates:>8}{percentiles(tracker.latencies)}")
+    print(f"Обработано {updates} обновлений за {elapsed:.2f} с ({updates / elapsed:.0f} обновлений/с), таймаутов: {scenario.timeouts}")
+    print(
+        f"Отправлено заявок: {len(timings['process_confirm_submission'])} на {users} пользователей "
+        f"(нажимали \"Подтвердить\" дважды: {int(users * double_tap)})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1000, help="сколько заявок создать в БД заранее")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--double-tap", type=float, default=0.1, help="доля пользователей, дважды нажимающих 'Подтвердить'")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.admins, args.pages, args.seed, args.mode, args.double_tap))
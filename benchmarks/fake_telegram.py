@@ -0,0 +1,122 @@
+"""
+Локальная заглушка Telegram Bot API для нагрузочных тестов.
+
+Сервер принимает запросы вида /bot<token>/<method>, отвечает правдоподобными
+результатами и считает вызовы, чтобы тест мог дождаться, когда бот отправит
+нужное количество ответов. Бот подключается к заглушке через
+TelegramAPIServer.from_base(server.url).
+
+Для режима polling обновления кладутся в очередь через push_update() и
+отдаются боту методом getUpdates (с long polling, как у настоящего API).
+Последняя inline-клавиатура, отправленная в каждый чат, запоминается,
+чтобы сценарий мог "нажимать" кнопки, которые показал бот.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, deque
+
+from aiohttp import web
+
+BOT_ID = 100000
+
+
+class FakeTelegramServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._host = host
+        self._port = port
+        self._runner: web.AppRunner | None = None
+        self._message_ids = itertools.count(1)
+        self._waiters: list[tuple[int, asyncio.Future]] = []
+        self._updates: deque[dict] = deque()
+        self._updates_ready = asyncio.Event()
+        self.calls: Counter[str] = Counter()
+        self.replies = 0
+        self.last_markup: dict[int, list[list[dict]]] = {}
+        self.url = ""
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{self._host}:{port}"
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def wait_for_replies(self, count: int, timeout: float):
+        """Ждет, пока бот отправит не меньше count сообщений (sendMessage/sendPhoto/editMessageText)."""
+        if self.replies >= count:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((count, future))
+        await asyncio.wait_for(future, timeout)
+
+    def push_update(self, update: dict):
+        """Ставит обновление в очередь для getUpdates."""
+        self._updates.append(update)
+        self._updates_ready.set()
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates:
+            self._updates_ready.clear()
+            try:
+                await asyncio.wait_for(self._updates_ready.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                return []
+        limit = int(params.get("limit") or 100)
+        return list(itertools.islice(self._updates, limit))
+
+    def _message(self, params: dict, **extra) -> dict:
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "Bot"},
+            **extra
+        }
+
+    def _result(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": BOT_ID, "is_bot": True, "first_name": "Bot", "username": "fake_bot"}
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(params, text=params.get("text", ""))
+        if method == "sendPhoto":
+            photo = [{"file_id": "fake-photo", "file_unique_id": "fake-photo", "width": 640, "height": 480}]
+            return self._message(params, photo=photo, caption=params.get("caption"))
+        return True
+
+    def _count_reply(self, method: str, params: dict):
+        if method not in ("sendMessage", "sendPhoto", "editMessageText"):
+            return
+        self.replies += 1
+        markup = json.loads(params["reply_markup"]) if params.get("reply_markup") else {}
+        self.last_markup[int(params.get("chat_id", 0))] = markup.get("inline_keyboard", [])
+        for waiter in [w for w in self._waiters if w[0] <= self.replies]:
+            self._waiters.remove(waiter)
+            if not waiter[1].done():
+                waiter[1].set_result(None)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+        else:
+            result = self._result(method, params)
+            self._count_reply(method, params)
+        return web.json_response({"ok": True, "result": result}, dumps=json.dumps)
+
+
+__all__ = ['FakeTelegramServer', 'BOT_ID']
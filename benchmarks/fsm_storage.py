@@ -0,0 +1,67 @@
+"""
+Накладные расходы хранилища FSM на одно обновление: MemoryStorage против SQLiteStorage.
+
+Каждое "обновление" повторяет типичный шаг анкеты: get_state, update_data,
+get_data, set_state. Пользователи проходят шаги по кругу, так что часть
+сессий вытесняется из LRU-кэша, если --cache-size меньше --users.
+
+Запуск из корня репозитория:
+    python -m benchmarks.fsm_storage --users 5000 --steps 6 --cache-size 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from src.database import init_db
+from src.fsm_storage import SQLiteStorage
+
+
+async def run_updates(storage, users: int, steps: int) -> float:
+    started = time.perf_counter()
+    for step in range(steps):
+        for user_id in range(users):
+            key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+            await storage.get_state(key)
+            await storage.update_data(key, {f"field_{step}": step, "editing_now": False})
+            await storage.get_data(key)
+            await storage.set_state(key, f"UserRegistration:step_{step}")
+    return time.perf_counter() - started
+
+
+async def main(users: int, steps: int, cache_size: int):
+    logging.disable(logging.INFO)
+    updates = users * steps
+
+    elapsed = await run_updates(MemoryStorage(), users, steps)
+    print(f"MemoryStorage: {elapsed / updates * 1e6:.1f} мкс/обновление")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await init_db(os.path.join(tmp, "bench.db"))
+        storage = SQLiteStorage(db, cache_size=cache_size, flush_interval=0.05)
+        storage.start()
+        try:
+            elapsed = await run_updates(storage, users, steps)
+            flush_started = time.perf_counter()
+            await storage.close()
+            flush_elapsed = time.perf_counter() - flush_started
+        finally:
+            await db.close()
+    print(
+        f"SQLiteStorage: {elapsed / updates * 1e6:.1f} мкс/обновление "
+        f"(финальный сброс {flush_elapsed * 1000:.1f} мс, кэш {cache_size} сессий)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.steps, args.cache_size))
@@ -0,0 +1,115 @@
+"""
+Задержки цикла событий из-за логирования: синхронные обработчики против очереди.
+
+--tasks корутин пишут по --records записей INFO (как хендлеры под нагрузкой),
+а отдельная задача каждую миллисекунду замеряет, насколько позже
+запланированного она просыпается. Сравниваются:
+  sync     - прежняя схема: StreamHandler + RotatingFileHandler в корневом логгере;
+  queue    - setup_logger(): QueueHandler + фоновый поток QueueListener;
+  sampled  - то же, что queue, с прореживанием частых INFO-записей.
+Вывод в консоль перенаправляется во временный файл, чтобы не засорять терминал.
+
+Нагрузка искусственная: записи пишутся быстрее, чем фоновый поток успевает
+их выводить, поэтому в режиме queue в очереди копятся десятки тысяч
+записей и отдельный проход сборщика мусора по ним дает заметный
+единичный максимум задержки. Прореживание убирает и его.
+
+Запуск из корня репозитория:
+    python -m benchmarks.logging_stall --tasks 50 --records 2000
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+from src.setup_logging import TEXT_FORMAT, setup_logger
+
+logger = logging.getLogger("benchmarks.logging_stall")
+
+
+def setup_sync(log_folder: str):
+    formatter = logging.Formatter(TEXT_FORMAT)
+    console_handler = logging.StreamHandler(sys.stdout)
+    file_handler = RotatingFileHandler(
+        os.path.join(log_folder, "sync_bot.log"), maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8"
+    )
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(logging.INFO)
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+
+
+async def workload(tasks: int, records: int) -> tuple[float, list[float]]:
+    # Прогрев: первые записи обходятся дороже (ленивая инициализация форматтеров и потока)
+    for _ in range(100):
+        logger.info("Прогрев логирования")
+    await asyncio.sleep(0.2)
+
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - started - 0.001)
+
+    async def handler_like(task_id: int):
+        for i in range(records):
+            logger.info("Пользователь %s указал возраст: %s. Переход к шагу 'гражданство'.", task_id * records + i, 30)
+            await asyncio.sleep(0)
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(handler_like(t) for t in range(tasks)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker_task
+    return elapsed, lags
+
+
+def report(name: str, elapsed: float, lags: list[float], total: int):
+    q = statistics.quantiles(lags, n=100) if len(lags) > 1 else lags * 99
+    print(
+        f"{name:<8} {total / elapsed:>9.0f} записей/с   задержка цикла: "
+        f"p50 {q[49] * 1000:6.2f} мс, p99 {q[98] * 1000:6.2f} мс, макс. {max(lags) * 1000:7.2f} мс"
+    )
+
+
+async def main(tasks: int, records: int):
+    total = tasks * records
+    with tempfile.TemporaryDirectory() as tmp, open(os.path.join(tmp, "stdout.log"), "w", encoding="utf-8") as stdout:
+        with contextlib.redirect_stdout(stdout):
+            setup_sync(tmp)
+            sync_result = await workload(tasks, records)
+            for handler in logging.getLogger().handlers:
+                handler.close()
+
+            listener = setup_logger(log_folder=os.path.join(tmp, "queue"), sampling_burst=0)
+            queue_result = await workload(tasks, records)
+            listener.stop()
+
+            listener = setup_logger(log_folder=os.path.join(tmp, "sampled"))
+            sampled_result = await workload(tasks, records)
+            listener.stop()
+            logging.getLogger().handlers.clear()
+
+    report("sync", *sync_result, total)
+    report("queue", *queue_result, total)
+    report("sampled", *sampled_result, total)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--records", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks, args.records))
@@ -0,0 +1,104 @@
+"""
+Нагрузочный тест режима webhook на локальной заглушке Telegram.
+
+Бот настраивается так же, как в bot.py, но ходит в FakeTelegramServer
+вместо api.telegram.org, а его вебхук поднимается на свободном локальном
+порту. Генератор отправляет на вебхук обновления "/start" от --users
+разных пользователей (не более --concurrency запросов одновременно) и
+измеряет время ответа вебхука и время, за которое бот ответил всем.
+
+Запуск из корня репозитория:
+    python -m benchmarks.webhook_load --users 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from benchmarks.fake_telegram import FakeTelegramServer, BOT_ID
+from bot import setup_dispatcher, build_webhook_app
+from src.database import init_db
+
+SECRET = "load-test-secret"
+ADMIN_CHAT_ID = -1000
+
+
+def start_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}]
+        }
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+async def main(users: int, concurrency: int):
+    logging.disable(logging.WARNING)
+    fake_api = FakeTelegramServer()
+    await fake_api.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await init_db(os.path.join(tmp, "bench.db"))
+        session = AiohttpSession(api=TelegramAPIServer.from_base(fake_api.url))
+        bot = Bot(token=f"{BOT_ID}:LOAD_TEST", session=session)
+        dp = await setup_dispatcher(bot, db, ADMIN_CHAT_ID, admin_user_ids_list=[], metrics_port=0)
+        runner = web.AppRunner(build_webhook_app(bot, dp, path="/webhook", secret=SECRET), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        webhook_url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+
+        ack_latencies: list[float] = []
+        semaphore = asyncio.Semaphore(concurrency)
+        replies_before = fake_api.replies
+        try:
+            async with aiohttp.ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as client:
+                async def post(update_id: int):
+                    async with semaphore:
+                        started = time.perf_counter()
+                        async with client.post(webhook_url, json=start_update(update_id, 10_000 + update_id)) as response:
+                            response.raise_for_status()
+                        ack_latencies.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(post(i) for i in range(1, users + 1)))
+                posted = time.perf_counter() - started
+                await fake_api.wait_for_replies(replies_before + users, timeout=60 + users / 10)
+                elapsed = time.perf_counter() - started
+        finally:
+            await runner.cleanup()
+            await db.close()
+            await fake_api.close()
+
+    print(f"Обновлений: {users}, параллельных запросов: {concurrency}")
+    print(
+        f"Ответ вебхука: p50 {percentile(ack_latencies, 50) * 1000:.1f} мс, "
+        f"p99 {percentile(ack_latencies, 99) * 1000:.1f} мс; все приняты за {posted:.2f} с"
+    )
+    print(f"Все ответы бота отправлены за {elapsed:.2f} с ({users / elapsed:.0f} обновлений/с)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.concurrency))
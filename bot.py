@@ -1,21 +1,43 @@
 import asyncio
 import logging
+import signal
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher, Router, types, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import ReplyKeyboardRemove, BotCommandScopeAllPrivateChats
 from aiogram.enums import ChatType
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from src.setup_logging import setup_logger
-from src.config import BOT_TOKEN, ADMIN_CHAT_ID_STR, ADMIN_USER_IDS_STR, DEFAULT_BOT_COMMANDS, GREETING_PICTURE_PATH
-from src.middlewares import AdminChatIdMiddleware, BanManagerMiddleware
+from src.config import (
+    BOT_TOKEN, ADMIN_CHAT_ID_STR, ADMIN_USER_IDS_STR, DEFAULT_BOT_COMMANDS,
+    BROADCAST_RATE_PER_SECOND, BROADCAST_PER_CHAT_INTERVAL, BOT_MODE, RESUME_BROADCASTS,
+    METRICS_HOST, METRICS_PORT, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_HANDLE_IN_BACKGROUND, TELEGRAM_API_URL, BOT_WORKERS, BOT_WORKER_INDEX
+)
+from src.middlewares import (
+    AdminChatIdMiddleware, BanManagerMiddleware, DatabaseMiddleware, BufferedFSMMiddleware, GreetingPhotoMiddleware,
+    BroadcasterMiddleware, OutboxMiddleware, UpdateMetricsMiddleware, HandlerMetricsMiddleware, CatalogMiddleware,
+    UpdateSchedulerMiddleware, ThrottlingMiddleware
+)
 from src.filters import IsAdmin, IsBanned
 from src.user_handlers import user_router, UserRegistration, show_confirmation_message
 from src.admin_handlers import admin_router as admin_commands_router
-from src.database import init_db, get_application_by_user_id
+from src.database import init_db, Database
 from src.keyboards import user_get_start_keyboard
 from src.ban_manager import BanManager
+from src.fsm_storage import SQLiteStorage
+from src.greeting import GreetingPhoto
+from src.catalog import Catalog
+from src.broadcast import Broadcaster
+from src.outbox import Outbox
+from src.rate_limit import ChatRateLimiter
+from src.metrics import BotMetrics, start_metrics_server
+from src.supervisor import Supervisor
 
 # Настраиваем логгер для этого модуля
 logger = logging.getLogger(__name__)
@@ -23,25 +45,18 @@ logger = logging.getLogger(__name__)
 # --- ОСНОВНОЙ РОУТЕР ДЛЯ ОБЩИХ КОМАНД ---
 common_router = Router(name="common_commands")
 
-@common_router.message(CommandStart())
-async def cmd_start(message: types.Message, state: FSMContext, bot: Bot):
+@common_router.message(CommandStart(), flags={"throttle": "greeting"})
+async def cmd_start(message: types.Message, state: FSMContext, bot: Bot, db: Database, greeting_photo: GreetingPhoto):
     """
     Обрабатывает команду /start. Приветствует пользователя, проверяет наличие
     существующей заявки и предлагает дальнейшие действия с помощью клавиатуры.
     """
     user_id = message.from_user.id
-    logger.info(f"Пользователь {user_id} ({message.from_user.full_name}) запустил команду /start.")
+    logger.info("Пользователь %s (%s) запустил команду /start.", user_id, message.from_user.full_name)
     await state.clear()
 
-    existing_application = await get_application_by_user_id(user_id)
-    logger.info(f"Проверка существующей заявки для {user_id}: {'Найдена' if existing_application else 'Не найдена'}.")
-
-    try:
-        with open(GREETING_PICTURE_PATH, 'rb') as photo_file:
-            photo = types.BufferedInputFile(photo_file.read(), filename='greeting.jpg')
-    except Exception as e:
-        logger.error(f"Не удалось открыть приветственное изображение по пути {GREETING_PICTURE_PATH}: {e}")
-        photo = None
+    existing_application = await db.get_application_by_user_id(user_id)
+    logger.info("Проверка существующей заявки для %s: %s.", user_id, 'Найдена' if existing_application else 'Не найдена')
 
     greeting_text = f"👋 Привет, {message.from_user.full_name}!\n"
     greeting_text += "У вас уже есть сохраненная заявка.\n" if existing_application else "Готовы оставить заявку?\n"
@@ -49,37 +64,32 @@ async def cmd_start(message: types.Message, state: FSMContext, bot: Bot):
 
     start_kb = user_get_start_keyboard(has_existing_application=bool(existing_application))
 
-    if photo:
-        await bot.send_photo(
-            chat_id=message.chat.id,
-            photo=photo,
-            caption=greeting_text,
-            reply_markup=start_kb
-        )
+    if greeting_photo.available:
+        await greeting_photo.send(bot, chat_id=message.chat.id, caption=greeting_text, reply_markup=start_kb)
     else:
         await message.answer(greeting_text, reply_markup=start_kb)
 
 
 @common_router.callback_query(F.data == "start_new_application")
-async def cq_start_new_application(callback_query: types.CallbackQuery, state: FSMContext):
+async def cq_start_new_application(callback_query: types.CallbackQuery, state: FSMContext, db: Database):
     """
     Обрабатывает нажатие на кнопку 'Подать заявку' / 'Подать новую'.
     Начинает процесс сбора данных для новой заявки.
     """
     user_id = callback_query.from_user.id
-    logger.info(f"Пользователь {user_id} инициировал создание новой заявки.")
+    logger.info("Пользователь %s инициировал создание новой заявки.", user_id)
     await state.clear()
     
-    existing_application = await get_application_by_user_id(user_id)
+    existing_application = await db.get_application_by_user_id(user_id)
     if existing_application:
         # Сохраняем ID существующей заявки для последующего обновления
         await state.update_data(existing_app_id=existing_application[0])
-        logger.info(f"Для пользователя {user_id} найдена существующая заявка ID {existing_application[0]}, которая будет обновлена.")
+        logger.info("Для пользователя %s найдена существующая заявка ID %s, которая будет обновлена.", user_id, existing_application[0])
 
     try:
         await callback_query.message.delete()
     except Exception as e:
-        logger.warning(f"Не удалось удалить сообщение {callback_query.message.message_id} для пользователя {user_id}: {e}")
+        logger.warning("Не удалось удалить сообщение %s для пользователя %s: %s", callback_query.message.message_id, user_id, e)
 
     await callback_query.message.answer("Отлично! Давайте начнем.\nДля начала, пожалуйста, напишите свой возраст (только цифры).")
     await state.set_state(UserRegistration.awaiting_age)
@@ -87,16 +97,16 @@ async def cq_start_new_application(callback_query: types.CallbackQuery, state: F
 
 
 @common_router.callback_query(F.data == "start_edit_application")
-async def cq_start_edit_application(callback_query: types.CallbackQuery, state: FSMContext):
+async def cq_start_edit_application(callback_query: types.CallbackQuery, state: FSMContext, db: Database):
     """
     Обрабатывает нажатие на кнопку 'Редактировать мою заявку'.
     Загружает существующие данные в FSM и переводит в режим подтверждения.
     """
     user_id = callback_query.from_user.id
-    logger.info(f"Пользователь {user_id} инициировал редактирование существующей заявки.")
+    logger.info("Пользователь %s инициировал редактирование существующей заявки.", user_id)
     await state.clear()
 
-    existing_application = await get_application_by_user_id(user_id)
+    existing_application = await db.get_application_by_user_id(user_id)
 
     if existing_application:
         app_id, _, username, full_name, age, citizenship, region_name, address, phone, status = existing_application
@@ -105,17 +115,17 @@ async def cq_start_edit_application(callback_query: types.CallbackQuery, state:
             existing_app_id=app_id, age=age, citizenship=citizenship, region_name=region_name,
             address=address, phone=phone, db_username=username, db_full_name=full_name
         )
-        logger.info(f"Данные заявки ID {app_id} для пользователя {user_id} загружены в FSM для редактирования.")
+        logger.info("Данные заявки ID %s для пользователя %s загружены в FSM для редактирования.", app_id, user_id)
         
         try:
             await callback_query.message.delete()
         except Exception as e:
-            logger.warning(f"Не удалось удалить сообщение {callback_query.message.message_id} при редактировании заявки: {e}")
+            logger.warning("Не удалось удалить сообщение %s при редактировании заявки: %s", callback_query.message.message_id, e)
 
         await state.set_state(UserRegistration.awaiting_confirmation)
         await show_confirmation_message(callback_query.message, state, edit_message=False)
     else:
-        logger.warning(f"Пользователь {user_id} попытался редактировать заявку, но она не была найдена в БД.")
+        logger.warning("Пользователь %s попытался редактировать заявку, но она не была найдена в БД.", user_id)
         await callback_query.message.edit_text("Ошибка: ваша заявка не найдена. Пожалуйста, подайте новую.")
     
     await callback_query.answer()
@@ -133,18 +143,20 @@ async def cmd_cancel(message: types.Message, state: FSMContext):
         await message.answer("Нечего отменять.", reply_markup=ReplyKeyboardRemove())
         return
 
-    logger.info(f"Пользователь {message.from_user.id} отменил действие в состоянии {current_state}.")
+    logger.info("Пользователь %s отменил действие в состоянии %s.", message.from_user.id, current_state)
     await state.clear()
     await message.answer("Действие отменено. Чтобы начать заново, введите /start", reply_markup=ReplyKeyboardRemove())
 
 
+def create_bot() -> Bot:
+    """Создает бота; при заданном TELEGRAM_API_URL запросы идут на этот сервер Bot API."""
+    if TELEGRAM_API_URL:
+        return Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)))
+    return Bot(token=BOT_TOKEN)
+
+
 async def main():
     """Основная функция для настройки и запуска бота."""
-    setup_logger()
-
-    logger.info("Инициализация базы данных...")
-    await init_db()
-    
     logger.info("Проверка конфигурации...")
     if not BOT_TOKEN or BOT_TOKEN == "YOUR_BOT_TOKEN":
         logger.critical("Необходимо указать BOT_TOKEN в config.py!")
@@ -156,42 +168,101 @@ async def main():
     try:
         admin_chat_id_for_notifications = int(ADMIN_CHAT_ID_STR)
     except ValueError:
-        logger.critical(f"ADMIN_CHAT_ID_STR '{ADMIN_CHAT_ID_STR}' должен быть числом.")
+        logger.critical("ADMIN_CHAT_ID_STR '%s' должен быть числом.", ADMIN_CHAT_ID_STR)
         return
 
     admin_user_ids_list = []
     if ADMIN_USER_IDS_STR and ADMIN_USER_IDS_STR != "YOUR_USER_ID_1,YOUR_USER_ID_2":
         try:
             admin_user_ids_list = [int(uid.strip()) for uid in ADMIN_USER_IDS_STR.split(',') if uid.strip()]
-            logger.info(f"Загружены ID администраторов: {admin_user_ids_list}")
+            logger.info("Загружены ID администраторов: %s", admin_user_ids_list)
         except ValueError:
             logger.error("Ошибка в ADMIN_USER_IDS_STR: должны быть только числа через запятую.")
     
     if not admin_user_ids_list:
         logger.warning("Список ADMIN_USER_IDS_STR пуст. Админ-команды будут недоступны.")
 
+    logger.info("Инициализация базы данных...")
+    db = await init_db()
+    try:
+        bot = create_bot()
+        dp = await setup_dispatcher(bot, db, admin_chat_id_for_notifications, admin_user_ids_list)
+        if BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await run_polling(bot, dp)
+    finally:
+        await db.close()
+
+
+async def setup_dispatcher(
+    bot: Bot, db: Database, admin_chat_id_for_notifications: int, admin_user_ids_list: list[int],
+    metrics_port: int = METRICS_PORT
+) -> Dispatcher:
+    """
+    Настраивает зависимости, фильтры и роутеры, запускает фоновые задачи и возвращает диспетчер.
+    Если metrics_port не 0, также поднимает эндпоинт /metrics.
+    """
     logger.info("Настройка менеджера банов...")
-    ban_manager_instance = BanManager()
+    ban_manager_instance = BanManager(db)
+    # Это предотвращает админов от случайного использования пользовательских FSM.
+    # Админы хранятся только в памяти и не записываются в blocked_users.
+    ban_manager_instance.set_admins(admin_user_ids_list)
     await ban_manager_instance.load_banned_users_from_db()
-    for admin_id in admin_user_ids_list:
-        # Это предотвращает админов от случайного использования пользовательских FSM
-        await ban_manager_instance.add_banned_user(admin_id, 'admin_privilege')
+    ban_manager_instance.start()
     logger.info("Менеджер банов успешно загрузил данные из БД и кэшировал ID админов.")
     
-    bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    fsm_storage = SQLiteStorage(db)
+    fsm_storage.start()
+    dp = Dispatcher(storage=fsm_storage)
+    dp.shutdown.register(ban_manager_instance.close)
 
     try:
         await bot.set_my_commands(DEFAULT_BOT_COMMANDS, scope=BotCommandScopeAllPrivateChats())
         logger.info("Команды бота успешно установлены.")
     except Exception as e:
-        logger.error(f"Не удалось установить команды бота: {e}")
+        logger.error("Не удалось установить команды бота: %s", e)
+
+    greeting_photo = GreetingPhoto(db)
+    await greeting_photo.load()
+    catalog = await Catalog.load(db)
+    # Рассылки и уведомления делят один лимит исходящих сообщений бота;
+    # под supervisor'ом лимит делится между процессами-обработчиками
+    rate_per_second = BROADCAST_RATE_PER_SECOND / BOT_WORKERS if BOT_WORKER_INDEX is not None else BROADCAST_RATE_PER_SECOND
+    send_limiter = ChatRateLimiter(rate_per_second, BROADCAST_PER_CHAT_INTERVAL)
+    broadcaster = Broadcaster(bot, db, limiter=send_limiter)
+    dp.shutdown.register(broadcaster.close)
+    outbox = Outbox(bot, db, limiter=send_limiter)
+    dp.shutdown.register(outbox.close)
+    metrics = BotMetrics(db, fsm_storage)
+    if metrics_port:
+        try:
+            metrics_runner = await start_metrics_server(metrics, METRICS_HOST, metrics_port)
+            dp.shutdown.register(metrics_runner.cleanup)
+        except OSError as e:
+            logger.error("Не удалось запустить эндпоинт метрик на %s:%s: %s", METRICS_HOST, metrics_port, e)
 
     logger.info("Регистрация middlewares...")
+    common_router.message.middleware(GreetingPhotoMiddleware(greeting_photo=greeting_photo))
     notification_mw = AdminChatIdMiddleware(admin_chat_id=admin_chat_id_for_notifications)
+    dp.update.outer_middleware(DatabaseMiddleware(db=db))
+    # Очередь по пользователю - до BufferedFSMMiddleware, чтобы чтение и запись FSM шли внутри нее
+    dp.update.outer_middleware(UpdateSchedulerMiddleware(metrics=metrics))
+    dp.update.outer_middleware(BufferedFSMMiddleware())
     dp.update.outer_middleware(BanManagerMiddleware(ban_manager=ban_manager_instance))
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics=metrics))
+    # Внутренние middleware корневого диспетчера применяются к хендлерам всех вложенных роутеров
+    # Защита от флуда - раньше метрик хендлеров, чтобы отброшенные обновления не искажали их время
+    throttling_mw = ThrottlingMiddleware(exempt_ids=admin_user_ids_list, metrics=metrics)
+    dp.message.middleware(throttling_mw)
+    dp.callback_query.middleware(throttling_mw)
+    dp.message.middleware(HandlerMetricsMiddleware(metrics=metrics))
+    dp.callback_query.middleware(HandlerMetricsMiddleware(metrics=metrics))
+    dp.update.outer_middleware(OutboxMiddleware(outbox=outbox))
+    dp.update.outer_middleware(CatalogMiddleware(catalog=catalog))
     user_router.callback_query.middleware(notification_mw)
     admin_commands_router.message.middleware(notification_mw)
+    admin_commands_router.callback_query.middleware(BroadcasterMiddleware(broadcaster=broadcaster))
 
     logger.info("Регистрация фильтров...")
     is_admin_filter = IsAdmin(admin_ids=admin_user_ids_list)
@@ -215,15 +286,124 @@ async def main():
     logger.info("Регистрация роутеров...")
     dp.include_routers(common_router, user_router, admin_commands_router)
 
-    await bot.delete_webhook(drop_pending_updates=True)
+    if RESUME_BROADCASTS:
+        await broadcaster.resume_unfinished()
+    outbox.start()
+    return dp
+
+
+async def run_polling(bot: Bot, dp: Dispatcher):
+    """Запускает получение обновлений через long polling."""
+    # Накопившиеся за время перезапуска обновления не отбрасываем
+    await bot.delete_webhook(drop_pending_updates=False)
     logger.info("Бот запускается в режиме polling...")
     await dp.start_polling(bot)
 
 
+def build_webhook_app(
+    bot: Bot, dp: Dispatcher, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+    handle_in_background: bool = WEBHOOK_HANDLE_IN_BACKGROUND
+) -> web.Application:
+    """
+    Создает aiohttp-приложение, передающее обновления с вебхука в диспетчер.
+    Если handle_in_background=False, ответ на запрос отправляется после обработки обновления.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, secret_token=secret or None, handle_in_background=handle_in_background
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """
+    Запускает HTTP-сервер, принимающий обновления от Telegram через вебхук.
+
+    Обновления обрабатываются в фоне (Telegram сразу получает ответ 200),
+    поэтому одновременно обрабатывается столько обновлений, сколько
+    соединений откроет Telegram. Состояния FSM, очередь и защита от флуда
+    живут в памяти процесса, поэтому все обновления пользователя должны
+    приходить в один процесс: несколько процессов запускаются только через
+    supervisor (BOT_WORKERS), который раздает обновления по ID пользователя.
+    """
+    app = build_webhook_app(bot, dp)
+    if WEBHOOK_BASE_URL:
+        # Накопившиеся за время перезапуска обновления Telegram доставит на вебхук
+        await bot.set_webhook(
+            url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=False
+        )
+        logger.info("Вебхук зарегистрирован: %s%s", WEBHOOK_BASE_URL.rstrip('/'), WEBHOOK_PATH)
+    elif not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET не задан: запросы к вебхуку не проверяются.")
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+    logger.info("Бот запущен в режиме webhook на %s:%s%s.", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_supervisor():
+    """
+    Запускает бота в BOT_WORKERS процессах: supervisor получает обновления
+    и раздает их процессам-обработчикам (см. src.supervisor).
+    """
+    if not BOT_TOKEN or BOT_TOKEN == "YOUR_BOT_TOKEN":
+        logger.critical("Необходимо указать BOT_TOKEN в config.py!")
+        return
+
+    # Схему БД создаем до запуска процессов, чтобы они не выполняли миграции одновременно
+    db = await init_db()
+    await db.close()
+
+    bot = create_bot()
+    supervisor = Supervisor()
+    # SIGTERM (например, от systemd) останавливает supervisor так же штатно, как Ctrl+C
+    main_task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+    await supervisor.start()
+    metrics_runner = None
+    try:
+        if METRICS_PORT:
+            try:
+                metrics_runner = await supervisor.start_metrics_server()
+            except OSError as e:
+                logger.error("Не удалось запустить эндпоинт метрик на %s:%s: %s", METRICS_HOST, METRICS_PORT, e)
+        if BOT_MODE == "webhook":
+            await supervisor.run_webhook(bot)
+        else:
+            await supervisor.run_polling(bot)
+    except asyncio.CancelledError:
+        logger.info("Supervisor получил сигнал остановки.")
+    finally:
+        await supervisor.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await bot.session.close()
+
+
 if __name__ == '__main__':
+    run_as_supervisor = BOT_WORKERS > 1 and BOT_WORKER_INDEX is None
+    if run_as_supervisor:
+        log_name = "supervisor"
+    else:
+        log_name = f"worker{BOT_WORKER_INDEX}" if BOT_WORKER_INDEX is not None else "bot"
+    log_listener = setup_logger(name=log_name)
     try:
-        asyncio.run(main())
+        asyncio.run(run_supervisor() if run_as_supervisor else main())
     except (KeyboardInterrupt, SystemExit):
         logger.info("Бот остановлен вручную.")
     except Exception as e:
-        logger.critical(f"Критическая ошибка при запуске бота: {e}", exc_info=True)
\ No newline at end of file
+        logger.critical("Критическая ошибка при запуске бота: %s", e, exc_info=True)
+    finally:
+        # Дописываем оставшиеся в очереди записи
+        log_listener.stop()
\ No newline at end of file
@@ -1,16 +1,33 @@
+import html
 import logging
+import time
 from datetime import datetime
 from aiogram import Bot, Router, types, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from src.config import APPLICATIONS_PER_PAGE
-from src.database import get_applications_paginated, get_application_by_id, update_application_status
-from src.keyboards import get_admin_pagination_keyboard, get_admin_review_keyboard
-from src.ban_manager import BanManager
+from src.config import (
+    APPLICATIONS_PER_PAGE, COMPLETED_BAN_DURATION, SEARCH_COUNT_LIMIT, BULK_MAX_SELECTION, ADMIN_PAGE_CACHE_SIZE,
+    ADMIN_PAGE_CACHE_TTL
+)
+from src.database import Database, PageCursor, TTLCache
+from src.keyboards import (
+    BROADCAST_STATUS_GROUPS,
+    ApplicationFilter, APP_FILTER_STATUSES, APP_FILTER_PERIODS,
+    BULK_ACTIONS,
+    get_admin_pagination_keyboard, get_admin_review_keyboard, get_admin_filter_keyboard,
+    get_admin_bulk_keyboard, get_admin_bulk_confirm_keyboard,
+    get_broadcast_region_keyboard, get_broadcast_status_keyboard, get_broadcast_confirm_keyboard
+)
+from src.ban_manager import BanManager, BanCategory, parse_duration
+from src.broadcast import Broadcaster
+from src.outbox import Outbox
+from src.metrics import BotMetrics
+from src.catalog import Catalog
 
 logger = logging.getLogger(__name__)
 
@@ -19,18 +36,50 @@ class AdminActions(StatesGroup):
     awaiting_message_to_user = State()
     reviewing_application = State()
     awaiting_rejection_reason = State()
+    broadcast_choosing_region = State()
+    broadcast_choosing_status = State()
+    broadcast_awaiting_text = State()
+    broadcast_confirmation = State()
+    bulk_selecting = State()
+    bulk_confirmation = State()
+    awaiting_bulk_rejection_reason = State()
+
+BROADCAST_STATES = (
+    AdminActions.broadcast_choosing_region, AdminActions.broadcast_choosing_status,
+    AdminActions.broadcast_awaiting_text, AdminActions.broadcast_confirmation
+)
+BULK_STATES = (
+    AdminActions.bulk_selecting, AdminActions.bulk_confirmation, AdminActions.awaiting_bulk_rejection_reason
+)
 
 admin_router = Router(name="admin_commands")
 
+# Уведомления пользователям и причины банов - общие для действий над одной заявкой и массовых действий
+APPLICATION_COMPLETED_NOTICE = "🎉 Ваша заявка #{app_id} была принята! Скоро с Вами свяжутся."
+APPLICATION_REJECTED_NOTICE = (
+    "ℹ️ К сожалению, ваша заявка #{app_id} была отклонена.\nПричина: {reason}\nОбновите заявку и попробуйте отправить её снова."
+)
+USER_BANNED_NOTICE = "⛔️ Вы были заблокированы администратором."
+COMPLETED_BAN_REASON = 'completed application'
+ADMIN_BAN_REASON = 'banned by admin {admin_id}'
+
+# Готовые страницы списка заявок (текст и клавиатура) по фильтру, странице, курсору и версии данных
+# из БД (Database.get_applications_version), поэтому после изменения любой заявки, в том числе
+# в другом процессе, страница строится заново
+_pages_cache = TTLCache(ADMIN_PAGE_CACHE_SIZE, ADMIN_PAGE_CACHE_TTL)
+# Хэш страницы списка (текст и клавиатура), показанной в сообщении (chat_id, message_id). html_text
+# из обновления с отправленным HTML не сравнить: Telegram обрезает пробелы и по-своему экранирует текст
+_shown_pages = TTLCache(ADMIN_PAGE_CACHE_SIZE, ADMIN_PAGE_CACHE_TTL)
+
 
 async def send_application_to_admins(
-    bot: Bot, admin_chat_id: int, user_data: dict, from_user: types.User, app_id: int | None, is_update: bool = False
+    outbox: Outbox, admin_chat_id: int, user_data: dict, from_user: types.User, app_id: int | None, is_update: bool = False
 ):
     """
-    Формирует и отправляет уведомление о новой или обновленной заявке в чат администраторов.
+    Формирует уведомление о новой или обновленной заявке и ставит его в очередь отправки в чат администраторов.
 
     Args:
-        bot: Экземпляр бота.
+        outbox: Очередь исходящих уведомлений.
         admin_chat_id: ID чата для отправки уведомлений.
         user_data: Словарь с данными из заявки.
         from_user: Объект пользователя, отправившего заявку.
@@ -55,106 +104,304 @@ async def send_application_to_admins(
     
     full_admin_message = f"{status_text}\n\n{admin_message_text}"
 
-    try:
-        await bot.send_message(chat_id=admin_chat_id, text=full_admin_message, parse_mode=ParseMode.HTML)
-        logger.info(f"Уведомление о заявке ID {app_id or 'новая'} от {from_user.id} успешно отправлено в чат {admin_chat_id}.")
-    except Exception as e:
-        logger.error(f"Не удалось отправить уведомление о заявке в чат {admin_chat_id}: {e}", exc_info=True)
+    if await outbox.enqueue(admin_chat_id, full_admin_message, parse_mode=ParseMode.HTML):
+        logger.info("Уведомление о заявке ID %s от %s поставлено в очередь для чата %s.", app_id or 'новая', from_user.id, admin_chat_id)
+    else:
+        logger.error("Не удалось поставить в очередь уведомление о заявке для чата %s.", admin_chat_id)
 
 
-async def show_applications_page(target: types.Message | types.CallbackQuery, page: int = 1, is_edit: bool = False):
+def _application_list_item(app_data: tuple, page: int, filter_token: str | None = None) -> tuple[str, InlineKeyboardButton]:
+    """
+    Краткое описание заявки для списка и кнопка перехода к ее рассмотрению.
+    filter_token - фильтр списка, к которому нужно вернуться после рассмотрения.
+    """
+    (app_id, user_id, username, full_name, _, _, _, _, phone, status, created_at, updated_at) = app_data[:12]
+    date_to_show_str = updated_at if status != 'new' else created_at
+    formatted_date = datetime.strptime(date_to_show_str, '%Y-%m-%d %H:%M:%S').strftime('%d.%m.%y %H:%M')
+    text = (
+        f"\n<b>Заявка #{app_id}</b> (Статус: <code>{status}</code>)\n"
+        f"От: {formatted_date}\n"
+        f"Пользователь: {html.escape(full_name)} (@{username or 'N/A'}, ID: {user_id})\n"
+        f"Телефон: {phone}\n"
+    )
+    callback_data = f"admin_app_review_{app_id}_{page}_{filter_token}" if filter_token else f"admin_app_review_{app_id}_{page}"
+    button = InlineKeyboardButton(text=f"Рассмотреть заявку #{app_id}", callback_data=callback_data)
+    return text, button
+
+
+def _describe_filter(app_filter: ApplicationFilter, region_name: str | None) -> str:
+    """Описание фильтра для заголовка списка, например 'Отклоненные, за неделю, Владимирская область'."""
+    parts = [APP_FILTER_STATUSES[app_filter.status][0]]
+    if APP_FILTER_PERIODS[app_filter.period][1] is not None:
+        parts.append(APP_FILTER_PERIODS[app_filter.period][0].lower())
+    if region_name:
+        parts.append(region_name)
+    return ", ".join(parts)
+
+
+async def show_applications_page(
+    target: types.Message | types.CallbackQuery,
+    db: Database,
+    catalog: Catalog,
+    page: int = 1,
+    is_edit: bool = False,
+    cursor: PageCursor | None = None,
+    app_filter: ApplicationFilter = ApplicationFilter()
+):
     """
     Отображает страницу со списком заявок для администратора.
 
     Args:
         target: Объект Message или CallbackQuery, на который нужно ответить.
+        db: Слой доступа к базе данных.
+        catalog: Каталог областей (для фильтра по области).
         page: Номер страницы для отображения.
         is_edit: Флаг, указывающий на необходимость редактирования существующего сообщения.
+        cursor: Курсор keyset-пагинации из callback_data; без него страница выбирается по номеру.
+        app_filter: Фильтр по статусу, периоду и области.
     """
-    logger.info(f"Запрос на отображение страницы {page} заявок. Редактирование: {is_edit}.")
-    apps_on_page, total_pages, total_items = await get_applications_paginated(
-        page=page, 
-        per_page=APPLICATIONS_PER_PAGE,
-        status_filter=['new', 'updated', 'updated_conflict']
+    logger.info("Запрос на отображение страницы %s заявок (фильтр %s). Редактирование: %s.", page, app_filter.encode(), is_edit)
+    app_filter, region_name = _resolve_filter(catalog, app_filter)
+    filter_token = app_filter.encode()
+    # Версию читаем до заявок: если заявки изменятся между запросами, страница попадет в кэш под старой версией
+    version = await db.get_applications_version()
+    cache_key = (filter_token, page, cursor, version)
+    rendered = _pages_cache.get(cache_key, None) if version is not None else None
+    if rendered is None:
+        rendered = await _render_applications_page(db, app_filter, region_name, page, cursor)
+        if version is not None:
+            _pages_cache.put(cache_key, rendered)
+    await _send_or_edit(target, *rendered, is_edit)
+
+
+async def _render_applications_page(
+    db: Database, app_filter: ApplicationFilter, region_name: str | None, page: int, cursor: PageCursor | None
+) -> tuple[str, InlineKeyboardMarkup]:
+    """Запрашивает заявки страницы и строит текст и клавиатуру списка."""
+    filter_token = app_filter.encode()
+    query_filter = _filter_query(app_filter, region_name)
+    apps_on_page, total_pages, total_items = await db.get_applications_paginated(
+        page=page, per_page=APPLICATIONS_PER_PAGE, cursor=cursor, **query_filter
     )
+    if cursor is not None and not apps_on_page and total_items:
+        # Список изменился так, что за курсором ничего не осталось - откатываемся на выбор по номеру
+        page = min(page, total_pages)
+        apps_on_page, total_pages, total_items = await db.get_applications_paginated(
+            page=page, per_page=APPLICATIONS_PER_PAGE, **query_filter
+        )
 
+    filter_row = [InlineKeyboardButton(text="🔎 Фильтр", callback_data=f"admin_filter_{filter_token}")]
     if not apps_on_page:
-        text = "Нет доступных заявок для просмотра."
-        final_reply_markup = None
-        logger.info("Нет активных заявок для отображения администратору.")
+        text = f"Нет заявок для просмотра ({_describe_filter(app_filter, region_name)})."
+        final_reply_markup = InlineKeyboardMarkup(inline_keyboard=[filter_row])
+        logger.info("Нет заявок по фильтру %s для отображения администратору.", filter_token)
     else:
-        text_parts = [f"📝 <b>Заявки (Страница {page}/{total_pages}, Всего: {total_items}):</b>\n"]
+        text_parts = [
+            f"📝 <b>Заявки: {_describe_filter(app_filter, region_name)} "
+            f"(Страница {page}/{total_pages}, Всего: {total_items}):</b>\n"
+        ]
         all_keyboard_rows = [] 
 
         for app_data in apps_on_page:
-            (app_id, user_id, username, full_name, _, _, _, _, phone, status, created_at, updated_at) = app_data[:12]
-            date_to_show_str = updated_at if status != 'new' else created_at
-            formatted_date = datetime.strptime(date_to_show_str, '%Y-%m-%d %H:%M:%S').strftime('%d.%m.%y %H:%M')
-
-            text_parts.append(
-                f"\n<b>Заявка #{app_id}</b> (Статус: <code>{status}</code>)\n"
-                f"От: {formatted_date}\n"
-                f"Пользователь: {full_name} (@{username or 'N/A'}, ID: {user_id})\n"
-                f"Телефон: {phone}\n"
-            )
-            all_keyboard_rows.append([InlineKeyboardButton(text=f"Рассмотреть заявку #{app_id}", callback_data=f"admin_app_review_{app_id}_{page}")])
+            item_text, item_button = _application_list_item(app_data, page, filter_token)
+            text_parts.append(item_text)
+            all_keyboard_rows.append([item_button])
 
         text = "".join(text_parts)
-        pagination_kb = get_admin_pagination_keyboard(page, total_pages, action_prefix="admin_viewapps_page_")
+        pagination_kb = get_admin_pagination_keyboard(
+            page, total_pages, action_prefix=f"admin_viewapps_page_{filter_token}_",
+            prev_cursor=PageCursor.before(apps_on_page[0]).encode(),
+            next_cursor=PageCursor.after(apps_on_page[-1]).encode()
+        )
         if pagination_kb:
             all_keyboard_rows.extend(pagination_kb.inline_keyboard)
+        filter_row.append(
+            InlineKeyboardButton(text="☑️ Выбрать несколько", callback_data=f"admin_bulk_start_{filter_token}_{page}")
+        )
+        all_keyboard_rows.append(filter_row)
         
         final_reply_markup = InlineKeyboardMarkup(inline_keyboard=all_keyboard_rows)
-    
-    # Отправка или редактирование сообщения
+
+    return text, final_reply_markup
+
+
+def _resolve_filter(catalog: Catalog, app_filter: ApplicationFilter) -> tuple[ApplicationFilter, str | None]:
+    """Название области фильтра; фильтр по области, которой нет в каталоге, сбрасывается."""
+    region_name = catalog.region_name(app_filter.region_code)
+    if region_name is None:
+        app_filter = app_filter._replace(region_code=None)
+    return app_filter, region_name
+
+
+def _filter_query(app_filter: ApplicationFilter, region_name: str | None) -> dict:
+    """Аргументы отбора заявок по фильтру для методов Database."""
+    return dict(status_filter=app_filter.statuses, region_name=region_name, updated_since=app_filter.updated_since())
+
+
+def _page_digest(text: str, reply_markup: InlineKeyboardMarkup | None) -> int:
+    return hash((text, reply_markup.model_dump_json() if reply_markup else None))
+
+
+async def _answer_page(message: types.Message, text: str, reply_markup: InlineKeyboardMarkup | None):
+    sent = await message.answer(text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+    _shown_pages.put((sent.chat.id, sent.message_id), _page_digest(text, reply_markup))
+
+
+async def _send_or_edit(
+    target: types.Message | types.CallbackQuery, text: str, reply_markup: InlineKeyboardMarkup | None, is_edit: bool
+):
+    """
+    Отправляет или редактирует сообщение со списком заявок и отвечает на callback.
+    Если сообщение уже показывает ту же страницу (тот же хэш в _shown_pages и та же клавиатура,
+    то есть сообщение не переключали на карточку заявки или фильтр), редактирование пропускается.
+    """
     target_message = target.message if isinstance(target, types.CallbackQuery) else target
+    message_key = (target_message.chat.id, target_message.message_id)
+    digest = _page_digest(text, reply_markup)
     try:
         if is_edit:
-            await target_message.edit_text(text, reply_markup=final_reply_markup, parse_mode=ParseMode.HTML)
+            if target_message.reply_markup == reply_markup and _shown_pages.get(message_key, None) == digest:
+                logger.debug("Список заявок в сообщении %s не изменился, редактирование пропущено.", target_message.message_id)
+            else:
+                await target_message.edit_text(text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+                _shown_pages.put(message_key, digest)
+        else:
+            await _answer_page(target_message, text, reply_markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            _shown_pages.put(message_key, digest)
         else:
-            await target_message.answer(text, reply_markup=final_reply_markup, parse_mode=ParseMode.HTML)
+            logger.warning("Не удалось отредактировать сообщение со списком заявок: %s. Отправка нового сообщения.", e)
+            await _answer_page(target_message, text, reply_markup)
     except Exception as e:
-        logger.warning(f"Не удалось отправить/отредактировать сообщение со списком заявок: {e}. Отправка нового сообщения.")
+        logger.warning("Не удалось отправить/отредактировать сообщение со списком заявок: %s. Отправка нового сообщения.", e)
         # Если редактирование не удалось (например, текст не изменился), отправляем новое сообщение
-        await target_message.answer(text, reply_markup=final_reply_markup, parse_mode=ParseMode.HTML)
+        await _answer_page(target_message, text, reply_markup)
 
     if isinstance(target, types.CallbackQuery):
         await target.answer()
 
 
 @admin_router.message(Command("view_apps"))
-async def cmd_view_applications(message: types.Message, state: FSMContext):
-    """Обрабатывает команду /view_apps, отображая первую страницу заявок."""
-    logger.info(f"Администратор {message.from_user.id} вызвал команду /view_apps.")
+async def cmd_view_applications(message: types.Message, state: FSMContext, db: Database, catalog: Catalog):
+    """Обрабатывает команду /view_apps, отображая первую страницу активных заявок."""
+    logger.info("Администратор %s вызвал команду /view_apps.", message.from_user.id)
+    await state.clear()
+    await show_applications_page(message, db, catalog, page=1, is_edit=False)
+
+
+async def show_search_results(target: types.Message | types.CallbackQuery, db: Database, query: str, page: int = 1, is_edit: bool = False):
+    """
+    Отображает страницу результатов полнотекстового поиска заявок (/find) в том же виде,
+    что и список /view_apps. Из рассмотрения заявки администратор возвращается к первой странице /view_apps.
+    """
+    apps_on_page, total_pages, total_items = await db.search_applications(query, page=page, per_page=APPLICATIONS_PER_PAGE)
+    keyboard = None
+    if not apps_on_page:
+        text = f"🔍 По запросу «{html.escape(query)}» ничего не найдено."
+    else:
+        page = min(page, total_pages)
+        total_text = f"{total_items}+" if total_items >= SEARCH_COUNT_LIMIT else str(total_items)
+        text_parts = [f"🔍 <b>Поиск «{html.escape(query)}» (Страница {page}/{total_pages}, Найдено: {total_text}):</b>\n"]
+        keyboard_rows = []
+        for app_data in apps_on_page:
+            item_text, item_button = _application_list_item(app_data, 1)
+            text_parts.append(item_text)
+            keyboard_rows.append([item_button])
+        pagination_kb = get_admin_pagination_keyboard(page, total_pages, action_prefix="admin_find_page_")
+        if pagination_kb:
+            keyboard_rows.extend(pagination_kb.inline_keyboard)
+        text = "".join(text_parts)
+        keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
+
+    target_message = target.message if isinstance(target, types.CallbackQuery) else target
+    if is_edit:
+        await target_message.edit_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+    else:
+        await target_message.answer(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+    if isinstance(target, types.CallbackQuery):
+        await target.answer()
+
+
+@admin_router.message(Command("find"))
+async def cmd_find(message: types.Message, command: CommandObject, state: FSMContext, db: Database):
+    """Обрабатывает команду /find <текст>: полнотекстовый поиск заявок по имени, username, телефону, гражданству, области и адресу."""
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("Использование: /find текст (имя, @username, телефон, гражданство, область или адрес)")
+        return
+    logger.info("Администратор %s ищет заявки: '%s'.", message.from_user.id, query)
     await state.clear()
-    await show_applications_page(message, page=1, is_edit=False)
+    # Запрос хранится в FSM, так как в callback_data для перелистывания он может не поместиться
+    await state.update_data(find_query=query)
+    await show_search_results(message, db, query)
+
+
+@admin_router.callback_query(F.data.startswith("admin_find_page_"))
+async def cq_admin_find_page(callback_query: types.CallbackQuery, state: FSMContext, db: Database):
+    """Перелистывает результаты /find. Формат callback_data: 'admin_find_page_{page}'."""
+    query = (await state.get_data()).get("find_query")
+    if not query:
+        await callback_query.answer("Поиск устарел, повторите /find.", show_alert=True)
+        return
+    page = int(callback_query.data.removeprefix("admin_find_page_"))
+    await show_search_results(callback_query, db, query, page=page, is_edit=True)
 
 
 @admin_router.callback_query(F.data.startswith("admin_viewapps_page_"))
-async def cq_admin_view_applications_page(callback_query: types.CallbackQuery, state: FSMContext):
-    """Обрабатывает пагинацию в списке заявок."""
-    page = int(callback_query.data.split("_")[-1])
-    logger.info(f"Администратор {callback_query.from_user.id} переключил страницу заявок на {page}.")
+async def cq_admin_view_applications_page(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """
+    Обрабатывает пагинацию в списке заявок.
+    Формат callback_data: 'admin_viewapps_page_{filter}_{page}' или 'admin_viewapps_page_{filter}_{page}_{cursor}'
+    (кнопки, созданные до появления фильтров, - без '{filter}_').
+    """
+    parts = callback_query.data.removeprefix("admin_viewapps_page_").split("_")
+    if not parts[0].isdigit():
+        app_filter = ApplicationFilter.decode(parts.pop(0))
+    else:
+        app_filter = ApplicationFilter()
+    page = int(parts[0])
+    raw_cursor = parts[1] if len(parts) > 1 else ""
+    cursor = None
+    if raw_cursor:
+        try:
+            cursor = PageCursor.decode(raw_cursor)
+        except ValueError as e:
+            logger.warning("%s. Переход к странице %s по номеру.", e, page)
+    logger.info("Администратор %s переключил страницу заявок на %s.", callback_query.from_user.id, page)
     await state.clear()
-    await show_applications_page(callback_query, page=page, is_edit=True)
+    await show_applications_page(callback_query, db, catalog, page=page, is_edit=True, cursor=cursor, app_filter=app_filter)
+
+
+@admin_router.callback_query(F.data.startswith("admin_filter_"))
+async def cq_admin_filter(callback_query: types.CallbackQuery, catalog: Catalog):
+    """Показывает меню фильтра списка заявок. Формат callback_data: 'admin_filter_{filter}'."""
+    app_filter = ApplicationFilter.decode(callback_query.data.removeprefix("admin_filter_"))
+    await callback_query.message.edit_text(
+        "🔎 Выберите статус, период и область заявок:",
+        reply_markup=get_admin_filter_keyboard(app_filter, [(region.code, region.name) for region in catalog.regions])
+    )
+    await callback_query.answer()
 
 
 @admin_router.callback_query(F.data.startswith("admin_app_review_"))
-async def cq_admin_app_start_review(callback_query: types.CallbackQuery, state: FSMContext):
+async def cq_admin_app_start_review(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
     """
     Обрабатывает нажатие 'Рассмотреть заявку', отображая детальную информацию и кнопки действий.
+    Формат callback_data: 'admin_app_review_{app_id}_{page}' или 'admin_app_review_{app_id}_{page}_{filter}'.
     """
-    parts = callback_query.data.split("_")
-    app_id = int(parts[-2])
-    current_page = int(parts[-1])
+    parts = callback_query.data.removeprefix("admin_app_review_").split("_")
+    app_id = int(parts[0])
+    current_page = int(parts[1])
+    app_filter = ApplicationFilter.decode(parts[2] if len(parts) > 2 else None)
     admin_id = callback_query.from_user.id
     
-    logger.info(f"Администратор {admin_id} начал просмотр заявки #{app_id} со страницы {current_page}.")
-    app_data = await get_application_by_id(app_id)
+    logger.info("Администратор %s начал просмотр заявки #%s со страницы %s.", admin_id, app_id, current_page)
+    app_data = await db.get_application_by_id(app_id)
     if not app_data:
-        logger.warning(f"Администратор {admin_id} попытался просмотреть несуществующую заявку #{app_id}.")
+        logger.warning("Администратор %s попытался просмотреть несуществующую заявку #%s.", admin_id, app_id)
         await callback_query.answer(f"Заявка #{app_id} не найдена или уже обработана.", show_alert=True)
-        await show_applications_page(callback_query, page=current_page, is_edit=True) # Обновляем список
+        await show_applications_page(callback_query, db, catalog, page=current_page, is_edit=True, app_filter=app_filter) # Обновляем список
         return
 
     (id_db, user_id, username, full_name, age, citizenship, region, address, phone, status, created_at, updated_at) = app_data
@@ -162,9 +409,10 @@ async def cq_admin_app_start_review(callback_query: types.CallbackQuery, state:
     await state.set_state(AdminActions.reviewing_application)
     await state.update_data(
         current_app_id=id_db, current_app_user_id=user_id, current_app_user_name=full_name,
-        current_app_page_from_list=current_page, current_app_status=status
+        current_app_page_from_list=current_page, current_app_status=status,
+        current_app_filter=app_filter.encode()
     )
-    logger.debug(f"Состояние FSM обновлено для просмотра заявки #{app_id}. Данные: {await state.get_data()}")
+    logger.debug("Состояние FSM обновлено для просмотра заявки #%s. Данные: %s", app_id, await state.get_data())
 
     created_at_str = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S').strftime('%d.%m.%Y %H:%M')
     updated_at_str = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').strftime('%d.%m.%Y %H:%M')
@@ -193,7 +441,7 @@ async def cq_admin_review_write_start(callback_query: types.CallbackQuery, state
     user_full_name = admin_state_data.get("current_app_user_name")
     app_id = admin_state_data.get("current_app_id")
 
-    logger.info(f"Администратор {callback_query.from_user.id} начал писать сообщение по заявке #{app_id}.")
+    logger.info("Администратор %s начал писать сообщение по заявке #%s.", callback_query.from_user.id, app_id)
     await state.set_state(AdminActions.awaiting_message_to_user)
     
     await callback_query.message.edit_text(
@@ -204,7 +452,9 @@ async def cq_admin_review_write_start(callback_query: types.CallbackQuery, state
 
 
 @admin_router.callback_query(AdminActions.reviewing_application, F.data.startswith("admin_review_complete_"))
-async def cq_admin_review_complete(callback_query: types.CallbackQuery, state: FSMContext, bot: Bot, ban_manager: BanManager):
+async def cq_admin_review_complete(
+    callback_query: types.CallbackQuery, state: FSMContext, ban_manager: BanManager, db: Database, outbox: Outbox, catalog: Catalog
+):
     """Обрабатывает утверждение заявки."""
     admin_state_data = await state.get_data()
     app_id = admin_state_data.get("current_app_id")
@@ -213,31 +463,35 @@ async def cq_admin_review_complete(callback_query: types.CallbackQuery, state: F
     admin_id = callback_query.from_user.id
 
     if not app_id:
-        logger.error(f"Критическая ошибка FSM: не найден app_id в состоянии для администратора {admin_id}.")
+        logger.error("Критическая ошибка FSM: не найден app_id в состоянии для администратора %s.", admin_id)
         await callback_query.answer("Ошибка: ID заявки не найден.", show_alert=True)
         return
 
-    logger.info(f"Администратор {admin_id} утвердил заявку #{app_id}.")
-    await update_application_status(app_id, "completed", admin_id=admin_id)
+    logger.info("Администратор %s утвердил заявку #%s.", admin_id, app_id)
+    await db.update_application_status(app_id, "completed", admin_id=admin_id)
     
-    try:
-        await bot.send_message(user_id_to_notify, f"🎉 Ваша заявка #{app_id} была принята! Скоро с Вами свяжутся.")
-        logger.info(f"Пользователю {user_id_to_notify} отправлено уведомление о принятии заявки #{app_id}.")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить пользователя {user_id_to_notify} о принятии заявки #{app_id}: {e}")
+    if await outbox.enqueue(user_id_to_notify, APPLICATION_COMPLETED_NOTICE.format(app_id=app_id)):
+        logger.info("Уведомление о принятии заявки #%s для пользователя %s поставлено в очередь.", app_id, user_id_to_notify)
+    else:
+        logger.warning("Не удалось поставить в очередь уведомление пользователю %s о принятии заявки #%s.", user_id_to_notify, app_id)
 
-    await ban_manager.add_banned_user(user_id_to_notify, 'completed application')
+    await ban_manager.add_banned_user(
+        user_id_to_notify, COMPLETED_BAN_REASON, BanCategory.COMPLETED, duration=COMPLETED_BAN_DURATION, banned_by=admin_id
+    )
 
     await callback_query.answer(f"Заявка #{app_id} отмечена как 'завершенная'.", show_alert=True)
     await state.clear()
-    await show_applications_page(callback_query, page=page_to_return, is_edit=True)
+    await show_applications_page(
+        callback_query, db, catalog, page=page_to_return, is_edit=True,
+        app_filter=ApplicationFilter.decode(admin_state_data.get("current_app_filter"))
+    )
 
 
 @admin_router.callback_query(AdminActions.reviewing_application, F.data.startswith("admin_review_reject_"))
 async def cq_admin_review_reject_start(callback_query: types.CallbackQuery, state: FSMContext):
     """Переводит администратора в состояние ожидания причины отклонения заявки."""
     app_id = (await state.get_data()).get("current_app_id")
-    logger.info(f"Администратор {callback_query.from_user.id} начал отклонение заявки #{app_id}.")
+    logger.info("Администратор %s начал отклонение заявки #%s.", callback_query.from_user.id, app_id)
     await state.set_state(AdminActions.awaiting_rejection_reason)
     
     await callback_query.message.edit_text(
@@ -248,7 +502,7 @@ async def cq_admin_review_reject_start(callback_query: types.CallbackQuery, stat
 
 
 @admin_router.message(AdminActions.awaiting_rejection_reason, F.text)
-async def process_rejection_reason(message: types.Message, state: FSMContext, bot: Bot):
+async def process_rejection_reason(message: types.Message, state: FSMContext, db: Database, outbox: Outbox, catalog: Catalog):
     """Обрабатывает введенную причину отклонения, обновляет статус и уведомляет пользователя."""
     rejection_reason = message.text
     admin_data = await state.get_data()
@@ -258,36 +512,45 @@ async def process_rejection_reason(message: types.Message, state: FSMContext, bo
     admin_id = message.from_user.id
 
     if not all([app_id, user_id_to_notify]):
-        logger.error(f"Критическая ошибка FSM: не найдены данные для отклонения заявки для админа {admin_id}.")
+        logger.error("Критическая ошибка FSM: не найдены данные для отклонения заявки для админа %s.", admin_id)
         await message.answer("Произошла ошибка. Попробуйте снова.")
         await state.clear()
         return
 
-    logger.info(f"Администратор {admin_id} отклонил заявку #{app_id}. Причина: {rejection_reason}")
-    await update_application_status(app_id, 'rejected', admin_id=admin_id)
+    logger.info("Администратор %s отклонил заявку #%s. Причина: %s", admin_id, app_id, rejection_reason)
+    await db.update_application_status(app_id, 'rejected', admin_id=admin_id)
     
-    try:
-        await bot.send_message(user_id_to_notify, f"ℹ️ К сожалению, ваша заявка #{app_id} была отклонена.\nПричина: {rejection_reason}\nОбновите заявку и попробуйте отправить её снова.")
-        logger.info(f"Пользователю {user_id_to_notify} отправлено уведомление об отклонении заявки.")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить пользователя {user_id_to_notify} об отклонении: {e}")
+    notified = await outbox.enqueue(
+        user_id_to_notify,
+        APPLICATION_REJECTED_NOTICE.format(app_id=app_id, reason=rejection_reason)
+    )
+    if notified:
+        logger.info("Уведомление об отклонении заявки для пользователя %s поставлено в очередь.", user_id_to_notify)
+    else:
+        logger.warning("Не удалось поставить в очередь уведомление пользователю %s об отклонении.", user_id_to_notify)
     
-    await message.answer(f"✅ Заявка #{app_id} отклонена. Пользователь уведомлен.")
+    await message.answer(f"✅ Заявка #{app_id} отклонена. Пользователь будет уведомлен.")
     await state.clear()
-    await show_applications_page(message, page=page_to_return, is_edit=False)
+    await show_applications_page(
+        message, db, catalog, page=page_to_return, is_edit=False,
+        app_filter=ApplicationFilter.decode(admin_data.get("current_app_filter"))
+    )
 
 
 @admin_router.callback_query(AdminActions.reviewing_application, F.data.startswith("admin_review_backtolist_"))
-async def cq_admin_review_backtolist(callback_query: types.CallbackQuery, state: FSMContext):
-    """Возвращает администратора из детального просмотра обратно к списку заявок."""
+async def cq_admin_review_backtolist(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """Возвращает администратора из детального просмотра обратно к списку заявок (с тем же фильтром)."""
     page_to_return = int(callback_query.data.split("_")[-1])
-    logger.info(f"Администратор {callback_query.from_user.id} вернулся к списку заявок на страницу {page_to_return}.")
+    logger.info("Администратор %s вернулся к списку заявок на страницу %s.", callback_query.from_user.id, page_to_return)
+    app_filter = ApplicationFilter.decode((await state.get_data()).get("current_app_filter"))
     await state.clear()
-    await show_applications_page(callback_query, page=page_to_return, is_edit=True)
+    await show_applications_page(callback_query, db, catalog, page=page_to_return, is_edit=True, app_filter=app_filter)
 
 
 @admin_router.callback_query(AdminActions.reviewing_application, F.data.startswith("admin_ban_user_"))
-async def cq_admin_ban_user(callback_query: types.CallbackQuery, bot: Bot, state: FSMContext, ban_manager: BanManager):
+async def cq_admin_ban_user(
+    callback_query: types.CallbackQuery, state: FSMContext, ban_manager: BanManager, db: Database, outbox: Outbox, catalog: Catalog
+):
     """Блокирует пользователя, связанного с заявкой."""
     parts = callback_query.data.split("_")
     user_to_ban_id = int(parts[-1])
@@ -295,22 +558,22 @@ async def cq_admin_ban_user(callback_query: types.CallbackQuery, bot: Bot, state
     page_to_return = int(parts[-3])
     admin_id = callback_query.from_user.id
 
-    logger.info(f"Администратор {admin_id} инициировал бан пользователя {user_to_ban_id} из заявки #{app_id}.")
-    await ban_manager.add_banned_user(user_to_ban_id, f'banned by admin {admin_id}')
+    logger.info("Администратор %s инициировал бан пользователя %s из заявки #%s.", admin_id, user_to_ban_id, app_id)
+    await ban_manager.add_banned_user(user_to_ban_id, ADMIN_BAN_REASON.format(admin_id=admin_id), banned_by=admin_id)
     
-    try:
-        await bot.send_message(user_to_ban_id, "⛔️ Вы были заблокированы администратором.")
-        logger.info(f"Пользователю {user_to_ban_id} отправлено уведомление о блокировке.")
-    except Exception as e:
-        logger.warning(f"Не удалось уведомить пользователя {user_to_ban_id} о блокировке: {e}")
+    if await outbox.enqueue(user_to_ban_id, USER_BANNED_NOTICE):
+        logger.info("Уведомление о блокировке для пользователя %s поставлено в очередь.", user_to_ban_id)
+    else:
+        logger.warning("Не удалось поставить в очередь уведомление пользователю %s о блокировке.", user_to_ban_id)
     
     await callback_query.answer(f"Пользователь {user_to_ban_id} заблокирован.", show_alert=True)
+    app_filter = ApplicationFilter.decode((await state.get_data()).get("current_app_filter"))
     await state.clear()
-    await show_applications_page(callback_query, page=page_to_return, is_edit=True)
+    await show_applications_page(callback_query, db, catalog, page=page_to_return, is_edit=True, app_filter=app_filter)
 
 
 @admin_router.message(AdminActions.awaiting_message_to_user, F.text)
-async def process_admin_message_to_user(message: types.Message, state: FSMContext, bot: Bot):
+async def process_admin_message_to_user(message: types.Message, state: FSMContext, bot: Bot, db: Database, catalog: Catalog):
     """Обрабатывает введенный админом текст и отправляет его пользователю."""
     admin_message_text = message.text
     admin_data = await state.get_data()
@@ -320,36 +583,462 @@ async def process_admin_message_to_user(message: types.Message, state: FSMContex
     page_to_return = admin_data.get("current_app_page_from_list", 1)
 
     if not all([target_user_id, target_app_id]):
-        logger.error(f"Критическая ошибка FSM: не найдены данные для отправки сообщения от админа {admin_id}.")
+        logger.error("Критическая ошибка FSM: не найдены данные для отправки сообщения от админа %s.", admin_id)
         await message.answer("Произошла ошибка. Попробуйте снова.")
         await state.clear()
         return
 
-    logger.info(f"Администратор {admin_id} отправляет сообщение пользователю {target_user_id} по заявке #{target_app_id}.")
+    logger.info("Администратор %s отправляет сообщение пользователю %s по заявке #%s.", admin_id, target_user_id, target_app_id)
     try:
         await bot.send_message(target_user_id, f"Сообщение от администратора по вашей заявке #{target_app_id}:\n\n{admin_message_text}")
         await message.answer("✅ Сообщение успешно отправлено пользователю.")
-        logger.info(f"Сообщение пользователю {target_user_id} успешно отправлено.")
+        logger.info("Сообщение пользователю %s успешно отправлено.", target_user_id)
     except Exception as e:
         await message.answer(f"⚠️ Не удалось отправить сообщение: {e}")
-        logger.error(f"Ошибка при отправке сообщения от {admin_id} к {target_user_id}: {e}", exc_info=True)
+        logger.error("Ошибка при отправке сообщения от %s к %s: %s", admin_id, target_user_id, e, exc_info=True)
 
     # После отправки возвращаемся в режим детального просмотра
-    await show_applications_page(message, page=page_to_return, is_edit=True)
+    await show_applications_page(
+        message, db, catalog, page=page_to_return, is_edit=True,
+        app_filter=ApplicationFilter.decode(admin_data.get("current_app_filter"))
+    )
 
 
 @admin_router.message(Command("cancel_admin_action"), AdminActions.awaiting_message_to_user)
-async def cmd_cancel_admin_action(message: types.Message, state: FSMContext):
+async def cmd_cancel_admin_action(message: types.Message, state: FSMContext, db: Database, catalog: Catalog):
     """Отменяет текущее FSM-действие администратора (напр., ввод причины отклонения)."""
     current_state = await state.get_state()
-    logger.info(f"Администратор {message.from_user.id} отменил действие в состоянии {current_state}.")
+    logger.info("Администратор %s отменил действие в состоянии %s.", message.from_user.id, current_state)
     
     admin_data = await state.get_data()
     page_to_return = admin_data.get("current_app_page_from_list", 1)
     
     await state.clear()
     await message.answer("Действие отменено. Возврат к списку заявок.")
-    await show_applications_page(message, page=page_to_return, is_edit=False)
+    await show_applications_page(
+        message, db, catalog, page=page_to_return, is_edit=False,
+        app_filter=ApplicationFilter.decode(admin_data.get("current_app_filter"))
+    )
+
+
+# --- Массовые действия над заявками ---
+# Выбор хранится в FSM: bulk_filter (фильтр списка), bulk_page (текущая страница),
+# bulk_selected (ID выбранных заявок). Действие выполняется одной транзакцией
+# (Database.bulk_update_applications), уведомления ставятся в outbox одной записью.
+
+async def show_bulk_selection_page(
+    target: types.Message | types.CallbackQuery,
+    state: FSMContext,
+    db: Database,
+    catalog: Catalog,
+    is_edit: bool = True
+):
+    """Отображает страницу списка заявок в режиме выбора (страница и выбор берутся из FSM)."""
+    data = await state.get_data()
+    app_filter, region_name = _resolve_filter(catalog, ApplicationFilter.decode(data.get("bulk_filter")))
+    selected = set(data.get("bulk_selected", []))
+    page = data.get("bulk_page", 1)
+
+    apps_on_page, total_pages, total_items = await db.get_applications_paginated(
+        page=page, per_page=APPLICATIONS_PER_PAGE, **_filter_query(app_filter, region_name)
+    )
+    if not apps_on_page and total_items:
+        page = total_pages
+        await state.update_data(bulk_page=page)
+        apps_on_page, total_pages, total_items = await db.get_applications_paginated(
+            page=page, per_page=APPLICATIONS_PER_PAGE, **_filter_query(app_filter, region_name)
+        )
+
+    text_parts = [
+        f"☑️ <b>Выбор заявок: {_describe_filter(app_filter, region_name)} "
+        f"(Страница {page}/{max(total_pages, 1)}, Всего: {total_items}, выбрано: {len(selected)}):</b>\n"
+    ]
+    items = []
+    for app_data in apps_on_page:
+        item_text, _ = _application_list_item(app_data, page)
+        text_parts.append(item_text)
+        items.append((app_data[0], f"#{app_data[0]} {app_data[3]}", app_data[0] in selected))
+    if not apps_on_page:
+        text_parts.append("\nНет заявок по фильтру.")
+
+    await _send_or_edit(target, "".join(text_parts), get_admin_bulk_keyboard(items, page, total_pages, len(selected)), is_edit)
+
+
+@admin_router.callback_query(F.data.startswith("admin_bulk_start_"))
+async def cq_admin_bulk_start(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """Включает режим выбора заявок. Формат callback_data: 'admin_bulk_start_{filter}_{page}'."""
+    filter_token, _, page_str = callback_query.data.removeprefix("admin_bulk_start_").rpartition("_")
+    logger.info("Администратор %s включил выбор заявок (фильтр %s).", callback_query.from_user.id, filter_token)
+    await state.clear()
+    await state.set_state(AdminActions.bulk_selecting)
+    await state.update_data(bulk_filter=filter_token, bulk_page=int(page_str), bulk_selected=[])
+    await show_bulk_selection_page(callback_query, state, db, catalog)
+
+
+@admin_router.callback_query(AdminActions.bulk_selecting, F.data.startswith("admin_bulk_toggle_"))
+async def cq_admin_bulk_toggle(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """Отмечает заявку или снимает с нее отметку."""
+    app_id = int(callback_query.data.removeprefix("admin_bulk_toggle_"))
+    selected = (await state.get_data()).get("bulk_selected", [])
+    if app_id in selected:
+        selected.remove(app_id)
+    elif len(selected) >= BULK_MAX_SELECTION:
+        await callback_query.answer(f"Можно выбрать не больше {BULK_MAX_SELECTION} заявок.", show_alert=True)
+        return
+    else:
+        selected.append(app_id)
+    await state.update_data(bulk_selected=selected)
+    await show_bulk_selection_page(callback_query, state, db, catalog)
+
+
+@admin_router.callback_query(AdminActions.bulk_selecting, F.data.startswith("admin_bulk_page_"))
+async def cq_admin_bulk_page(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """Перелистывает список в режиме выбора, сохраняя отметки."""
+    await state.update_data(bulk_page=int(callback_query.data.removeprefix("admin_bulk_page_")))
+    await show_bulk_selection_page(callback_query, state, db, catalog)
+
+
+@admin_router.callback_query(AdminActions.bulk_selecting, F.data.in_({"admin_bulk_selpage", "admin_bulk_selall", "admin_bulk_clear"}))
+async def cq_admin_bulk_select_many(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """
+    Отмечает сразу несколько заявок: всю текущую страницу (повторное нажатие снимает
+    отметки), все заявки по фильтру (не больше BULK_MAX_SELECTION) или сбрасывает выбор.
+    """
+    data = await state.get_data()
+    selected = data.get("bulk_selected", [])
+    app_filter, region_name = _resolve_filter(catalog, ApplicationFilter.decode(data.get("bulk_filter")))
+
+    if callback_query.data == "admin_bulk_clear":
+        selected = []
+    elif callback_query.data == "admin_bulk_selall":
+        selected = await db.get_application_ids(limit=BULK_MAX_SELECTION, **_filter_query(app_filter, region_name))
+    else:
+        apps_on_page, _, _ = await db.get_applications_paginated(
+            page=data.get("bulk_page", 1), per_page=APPLICATIONS_PER_PAGE, **_filter_query(app_filter, region_name)
+        )
+        page_ids = [app_data[0] for app_data in apps_on_page]
+        if all(app_id in selected for app_id in page_ids):
+            selected = [app_id for app_id in selected if app_id not in page_ids]
+        else:
+            selected += [app_id for app_id in page_ids if app_id not in selected]
+            selected = selected[:BULK_MAX_SELECTION]
+    await state.update_data(bulk_selected=selected)
+    await show_bulk_selection_page(callback_query, state, db, catalog)
+
+
+@admin_router.callback_query(AdminActions.bulk_selecting, F.data == "admin_bulk_exit")
+async def cq_admin_bulk_exit(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """Выходит из режима выбора обратно к списку заявок."""
+    data = await state.get_data()
+    await state.clear()
+    await show_applications_page(
+        callback_query, db, catalog, page=data.get("bulk_page", 1), is_edit=True,
+        app_filter=ApplicationFilter.decode(data.get("bulk_filter"))
+    )
+
+
+@admin_router.callback_query(AdminActions.bulk_selecting, F.data.startswith("admin_bulk_do_"))
+async def cq_admin_bulk_action(callback_query: types.CallbackQuery, state: FSMContext):
+    """Запрашивает подтверждение массового действия (для отклонения - причину)."""
+    action = callback_query.data.removeprefix("admin_bulk_do_")
+    count = len((await state.get_data()).get("bulk_selected", []))
+    if action not in BULK_ACTIONS:
+        await callback_query.answer()
+        return
+    if not count:
+        await callback_query.answer("Не выбрано ни одной заявки.", show_alert=True)
+        return
+
+    if action == "reject":
+        await state.set_state(AdminActions.awaiting_bulk_rejection_reason)
+        await callback_query.message.edit_text(
+            f"📝 Введите причину отклонения выбранных заявок ({count}):\nЧтобы отменить, введите /cancel_admin_action",
+            reply_markup=None
+        )
+    else:
+        await state.set_state(AdminActions.bulk_confirmation)
+        await callback_query.message.edit_text(
+            BULK_ACTIONS[action][1].format(count=count), reply_markup=get_admin_bulk_confirm_keyboard(action)
+        )
+    await callback_query.answer()
+
+
+@admin_router.callback_query(AdminActions.bulk_confirmation, F.data == "admin_bulk_back")
+async def cq_admin_bulk_back(callback_query: types.CallbackQuery, state: FSMContext, db: Database, catalog: Catalog):
+    """Возвращает из подтверждения к выбору заявок."""
+    await state.set_state(AdminActions.bulk_selecting)
+    await show_bulk_selection_page(callback_query, state, db, catalog)
+
+
+async def _run_bulk_action(
+    action: str,
+    app_ids: list[int],
+    admin_id: int,
+    db: Database,
+    ban_manager: BanManager,
+    outbox: Outbox,
+    rejection_reason: str | None = None
+) -> str:
+    """
+    Выполняет массовое действие над заявками и ставит уведомления пользователям в очередь.
+    Возвращает отчет для администратора.
+    """
+    if action == "complete":
+        expires_at = time.time() + COMPLETED_BAN_DURATION if COMPLETED_BAN_DURATION else None
+        rows, banned = await db.bulk_update_applications(
+            app_ids, "completed", admin_id,
+            ban=(COMPLETED_BAN_REASON, BanCategory.COMPLETED.db_name, expires_at), ban_exempt=ban_manager.admin_ids
+        )
+        messages = [(user_id, APPLICATION_COMPLETED_NOTICE.format(app_id=app_id)) for app_id, user_id in rows]
+        report = f"✅ Принято заявок: {len(rows)} из {len(app_ids)}."
+    elif action == "reject":
+        rows, banned = await db.bulk_update_applications(app_ids, "rejected", admin_id)
+        messages = [
+            (user_id, APPLICATION_REJECTED_NOTICE.format(app_id=app_id, reason=rejection_reason)) for app_id, user_id in rows
+        ]
+        report = f"✅ Отклонено заявок: {len(rows)} из {len(app_ids)}."
+    else:
+        rows, banned = await db.bulk_update_applications(
+            app_ids, admin_id=admin_id,
+            ban=(ADMIN_BAN_REASON.format(admin_id=admin_id), BanCategory.MANUAL.db_name, None), ban_exempt=ban_manager.admin_ids
+        )
+        messages = [(user_id, USER_BANNED_NOTICE) for user_id in banned]
+        report = f"🚫 Заблокировано пользователей: {len(banned)} (заявок выбрано: {len(app_ids)})."
+
+    if banned:
+        # Баны записаны в обход BanManager - забираем их из журнала ban_events сразу, не дожидаясь фоновой синхронизации
+        await ban_manager.sync()
+    queued = await outbox.enqueue_many(messages)
+    if queued < len(messages):
+        logger.warning("Не удалось поставить в очередь %s уведомлений по массовому действию '%s'.", len(messages) - queued, action)
+    logger.info("Администратор %s выполнил массовое действие '%s': %s", admin_id, action, report)
+    return f"{report}\nУведомлений поставлено в очередь: {queued}."
+
+
+@admin_router.callback_query(AdminActions.bulk_confirmation, F.data.startswith("admin_bulk_confirm_"))
+async def cq_admin_bulk_confirm(
+    callback_query: types.CallbackQuery, state: FSMContext, ban_manager: BanManager, db: Database, outbox: Outbox, catalog: Catalog
+):
+    """Выполняет подтвержденное массовое действие и возвращает к списку заявок."""
+    action = callback_query.data.removeprefix("admin_bulk_confirm_")
+    if action not in BULK_ACTIONS or action == "reject":
+        await callback_query.answer()
+        return
+    data = await state.get_data()
+    await state.clear()
+    report = await _run_bulk_action(
+        action, data.get("bulk_selected", []), callback_query.from_user.id, db, ban_manager, outbox
+    )
+    await callback_query.message.answer(report)
+    await show_applications_page(
+        callback_query, db, catalog, page=1, is_edit=True, app_filter=ApplicationFilter.decode(data.get("bulk_filter"))
+    )
+
+
+@admin_router.message(Command("cancel_admin_action"), StateFilter(*BULK_STATES))
+async def cmd_cancel_bulk_action(message: types.Message, state: FSMContext, db: Database, catalog: Catalog):
+    """Отменяет массовое действие и возвращает к списку заявок."""
+    data = await state.get_data()
+    await state.clear()
+    await message.answer("Массовое действие отменено.")
+    await show_applications_page(
+        message, db, catalog, page=data.get("bulk_page", 1), app_filter=ApplicationFilter.decode(data.get("bulk_filter"))
+    )
+
+
+@admin_router.message(AdminActions.awaiting_bulk_rejection_reason, F.text)
+async def process_bulk_rejection_reason(
+    message: types.Message, state: FSMContext, ban_manager: BanManager, db: Database, outbox: Outbox, catalog: Catalog
+):
+    """Отклоняет выбранные заявки с введенной причиной."""
+    data = await state.get_data()
+    await state.clear()
+    report = await _run_bulk_action(
+        "reject", data.get("bulk_selected", []), message.from_user.id, db, ban_manager, outbox,
+        rejection_reason=message.text
+    )
+    await message.answer(report)
+    await show_applications_page(message, db, catalog, page=1, app_filter=ApplicationFilter.decode(data.get("bulk_filter")))
+
+
+# --- Рассылки ---
+
+@admin_router.message(Command("broadcast"))
+async def cmd_broadcast(message: types.Message, state: FSMContext, catalog: Catalog):
+    """Обрабатывает команду /broadcast: начинает настройку рассылки с выбора области."""
+    logger.info("Администратор %s начал настройку рассылки.", message.from_user.id)
+    await state.clear()
+    await state.set_state(AdminActions.broadcast_choosing_region)
+    await message.answer("📣 Кому отправить рассылку? Выберите область:", reply_markup=get_broadcast_region_keyboard(
+        [(region.code, region.name) for region in catalog.regions]
+    ))
+
+
+@admin_router.callback_query(AdminActions.broadcast_choosing_region, F.data.startswith("bc_region_"))
+async def cq_broadcast_region(callback_query: types.CallbackQuery, state: FSMContext, catalog: Catalog):
+    """Сохраняет выбранную область получателей и предлагает выбрать статусы заявок."""
+    region_code = callback_query.data.removeprefix("bc_region_")
+    region_name = None
+    if region_code != "all":
+        region_name = catalog.region_name(region_code)
+        if region_name is None:
+            await callback_query.answer("Неизвестная область.", show_alert=True)
+            return
+
+    await state.update_data(broadcast_region_name=region_name)
+    await state.set_state(AdminActions.broadcast_choosing_status)
+    await callback_query.message.edit_text(
+        f"Область: {region_name or 'все'}.\nВыберите статус заявок получателей:",
+        reply_markup=get_broadcast_status_keyboard()
+    )
+    await callback_query.answer()
+
+
+@admin_router.callback_query(AdminActions.broadcast_choosing_status, F.data.startswith("bc_status_"))
+async def cq_broadcast_status(callback_query: types.CallbackQuery, state: FSMContext):
+    """Сохраняет группу статусов и переходит к вводу текста рассылки."""
+    status_group = callback_query.data.removeprefix("bc_status_")
+    if status_group not in BROADCAST_STATUS_GROUPS:
+        await callback_query.answer("Неизвестная группа статусов.", show_alert=True)
+        return
+
+    await state.update_data(broadcast_status_group=status_group)
+    await state.set_state(AdminActions.broadcast_awaiting_text)
+    await callback_query.message.edit_text(
+        "✏️ Введите текст рассылки.\nДля отмены введите /cancel_admin_action",
+        reply_markup=None
+    )
+    await callback_query.answer()
+
+
+@admin_router.message(AdminActions.broadcast_awaiting_text, F.text)
+async def process_broadcast_text(message: types.Message, state: FSMContext, db: Database):
+    """Показывает предпросмотр рассылки с количеством получателей и просит подтверждение."""
+    broadcast_data = await state.update_data(broadcast_text=message.text)
+    region_name = broadcast_data.get("broadcast_region_name")
+    status_title, statuses = BROADCAST_STATUS_GROUPS[broadcast_data.get("broadcast_status_group", "all")]
+    audience_size = await db.count_broadcast_audience(region_name, statuses)
+
+    await state.set_state(AdminActions.broadcast_confirmation)
+    await message.answer(
+        f"📣 Предпросмотр рассылки\n"
+        f"Область: {region_name or 'все'}\n"
+        f"Статусы: {status_title}\n"
+        f"Получателей: {audience_size}\n\n"
+        f"{message.text}",
+        reply_markup=get_broadcast_confirm_keyboard()
+    )
+
+
+@admin_router.callback_query(AdminActions.broadcast_confirmation, F.data == "bc_confirm")
+async def cq_broadcast_confirm(callback_query: types.CallbackQuery, state: FSMContext, db: Database, broadcaster: Broadcaster):
+    """Создает рассылку и запускает ее отправку в фоне."""
+    broadcast_data = await state.get_data()
+    await state.clear()
+    admin_id = callback_query.from_user.id
+    _, statuses = BROADCAST_STATUS_GROUPS[broadcast_data.get("broadcast_status_group", "all")]
+
+    created = await db.create_broadcast(
+        admin_id, broadcast_data.get("broadcast_text", ""), broadcast_data.get("broadcast_region_name"), statuses
+    )
+    if created is None:
+        await callback_query.message.edit_text("⚠️ Не удалось создать рассылку. Попробуйте позже.", reply_markup=None)
+        await callback_query.answer()
+        return
+
+    broadcast_id, total = created
+    if total == 0:
+        await db.finish_broadcast(broadcast_id)
+        await callback_query.message.edit_text("Нет получателей, подходящих под выбранные условия.", reply_markup=None)
+    else:
+        broadcaster.start(broadcast_id)
+        logger.info("Администратор %s запустил рассылку #%s на %s получателей.", admin_id, broadcast_id, total)
+        await callback_query.message.edit_text(
+            f"📣 Рассылка #{broadcast_id} запущена: {total} получателей.\nОтчет придет по завершении.",
+            reply_markup=None
+        )
+    await callback_query.answer()
+
+
+@admin_router.callback_query(StateFilter(*BROADCAST_STATES), F.data == "bc_cancel")
+async def cq_broadcast_cancel(callback_query: types.CallbackQuery, state: FSMContext):
+    """Отменяет настройку рассылки кнопкой."""
+    logger.info("Администратор %s отменил настройку рассылки.", callback_query.from_user.id)
+    await state.clear()
+    await callback_query.message.edit_text("Рассылка отменена.", reply_markup=None)
+    await callback_query.answer()
+
+
+@admin_router.message(Command("cancel_admin_action"), StateFilter(*BROADCAST_STATES))
+async def cmd_cancel_broadcast(message: types.Message, state: FSMContext):
+    """Отменяет настройку рассылки командой."""
+    logger.info("Администратор %s отменил настройку рассылки.", message.from_user.id)
+    await state.clear()
+    await message.answer("Рассылка отменена.")
+
+
+def _format_ban_expiry(expires_at: float | None) -> str:
+    """Окончание фразы о сроке бана: ' бессрочно' или ' до 31.01.2025 18:00'."""
+    if expires_at is None:
+        return " бессрочно"
+    return f" до {datetime.fromtimestamp(expires_at).strftime('%d.%m.%Y %H:%M')}"
+
+
+@admin_router.message(Command("ban"))
+async def cmd_ban(message: types.Message, command: CommandObject, ban_manager: BanManager, outbox: Outbox):
+    """
+    Банит пользователя по ID: /ban <user_id> [срок: 30m, 12h, 7d, 2w] [причина].
+    Без срока бан бессрочный.
+    """
+    admin_id = message.from_user.id
+    args = (command.args or "").split(maxsplit=2)
+    if not args or not args[0].lstrip("-").isdigit():
+        await message.answer("Использование: /ban ID [срок, например 12h или 7d] [причина]")
+        return
+    user_id = int(args[0])
+    duration = parse_duration(args[1]) if len(args) > 1 else None
+    reason_parts = args[2:] if duration else args[1:]
+    reason = " ".join(reason_parts) or ADMIN_BAN_REASON.format(admin_id=admin_id)
+
+    existing = ban_manager.get_ban(user_id)
+    if existing is not None:
+        if existing.category == BanCategory.ADMIN:
+            await message.answer("Нельзя заблокировать администратора.")
+        else:
+            await message.answer(f"Пользователь {user_id} уже заблокирован{_format_ban_expiry(existing.expires_at)}.")
+        return
+
+    logger.info("Администратор %s банит пользователя %s на %s с. Причина: %s", admin_id, user_id, duration or '∞', reason)
+    if not await ban_manager.add_banned_user(user_id, reason, duration=duration, banned_by=admin_id):
+        await message.answer("Не удалось заблокировать пользователя. Попробуйте позже.")
+        return
+
+    ban = ban_manager.get_ban(user_id)
+    await outbox.enqueue(user_id, USER_BANNED_NOTICE)
+    await message.answer(f"✅ Пользователь {user_id} заблокирован{_format_ban_expiry(ban.expires_at if ban else None)}.")
+
+
+@admin_router.message(Command("unban"))
+async def cmd_unban(message: types.Message, command: CommandObject, ban_manager: BanManager):
+    """Снимает бан с пользователя: /unban <user_id>."""
+    args = (command.args or "").split()
+    if not args or not args[0].lstrip("-").isdigit():
+        await message.answer("Использование: /unban ID")
+        return
+    user_id = int(args[0])
+
+    logger.info("Администратор %s снимает бан с пользователя %s.", message.from_user.id, user_id)
+    if await ban_manager.remove_banned_user(user_id):
+        await message.answer(f"✅ Пользователь {user_id} разблокирован.")
+    else:
+        await message.answer(f"Пользователь {user_id} не заблокирован (или является администратором).")
+
+
+@admin_router.message(Command("stats"))
+async def cmd_stats(message: types.Message, metrics: BotMetrics):
+    """Показывает администратору статистику работы бота: нагрузку, медленные хендлеры, состояния FSM и запросы к БД."""
+    logger.info("Администратор %s запросил статистику.", message.from_user.id)
+    await message.answer(await metrics.summary())
 
 
 @admin_router.callback_query(F.data == "admin_noop")
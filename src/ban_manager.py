@@ -1,48 +1,376 @@
+import asyncio
+import bisect
 import logging
-import aiosqlite
-from typing import Set
+import math
+import re
+import time
+from array import array
+from enum import IntEnum
+from typing import Iterable, NamedTuple
 
-from src.database import get_banlist, add_to_banlist
+from src.config import BAN_SWEEP_INTERVAL, BAN_SYNC_INTERVAL, BAN_EVENTS_RETENTION
+from src.database import Database
 
 logger = logging.getLogger(__name__)
 
+
+class BanCategory(IntEnum):
+    """
+    Категория бана. В БД хранится строковым именем (manual, completed),
+    в индексе - одним байтом. ADMIN существует только в памяти: так
+    администраторы не попадают в пользовательские сценарии, но и не
+    записываются в blocked_users.
+    """
+    MANUAL = 1
+    COMPLETED = 2
+    ADMIN = 3
+
+    @property
+    def db_name(self) -> str:
+        return self.name.lower()
+
+    @classmethod
+    def from_db(cls, name: str) -> "BanCategory":
+        try:
+            return cls[name.upper()]
+        except KeyError:
+            return cls.MANUAL
+
+
+class BanInfo(NamedTuple):
+    category: BanCategory
+    expires_at: float | None
+
+
+_DURATION_RE = re.compile(r"^(\d+)([mhdw])$")
+_DURATION_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(text: str) -> float | None:
+    """
+    Разбирает длительность бана вида 30m, 12h, 7d, 2w в секунды.
+    Возвращает None, если строка не является длительностью.
+    """
+    match = _DURATION_RE.match(text.lower())
+    if not match or int(match.group(1)) == 0:
+        return None
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+class BanIndex:
+    """
+    Компактный индекс банов: отсортированный массив ID и параллельные
+    массивы сроков окончания и категорий (около 17 байт на пользователя
+    против ~100 байт у set[int] с объектами int). Проверка - бинарный
+    поиск, O(log n).
+
+    Истекшие баны удаляются лениво: при проверке истекшая запись просто
+    считается отсутствующей, а массивы пересобираются без истекших
+    записей (sweep_if_due) фоновой задачей BanManager не чаще раза в
+    sweep_interval секунд, а не в фильтре на пути обработки обновления.
+    """
+    __slots__ = ("_ids", "_expires", "_categories", "_next_expiry", "_next_sweep", "_sweep_interval", "_changes")
+
+    # В массиве сроков бессрочный бан хранится как бесконечность
+    _PERMANENT = math.inf
+
+    def __init__(self, sweep_interval: float = BAN_SWEEP_INTERVAL):
+        self._ids = array("q")
+        self._expires = array("d")
+        self._categories = array("B")
+        self._next_expiry = math.inf
+        self._next_sweep = 0.0
+        self._sweep_interval = sweep_interval
+        # Счетчик изменений add/remove: по нему sweep узнает, что индекс менялся, пока собирались новые массивы
+        self._changes = 0
+
+    @classmethod
+    def build(cls, rows: Iterable[tuple[int, BanCategory, float | None]], sweep_interval: float = BAN_SWEEP_INTERVAL) -> "BanIndex":
+        """Строит индекс из строк (user_id, категория, срок окончания) одной сортировкой."""
+        index = cls(sweep_interval)
+        for user_id, category, expires_at in sorted(rows, key=lambda row: row[0]):
+            if index._ids and index._ids[-1] == user_id:
+                continue
+            index._ids.append(user_id)
+            index._expires.append(cls._PERMANENT if expires_at is None else expires_at)
+            index._categories.append(category)
+        index._next_expiry = min(index._expires, default=math.inf)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _position(self, user_id: int) -> int:
+        """Позиция user_id в массиве или -1."""
+        i = bisect.bisect_left(self._ids, user_id)
+        return i if i < len(self._ids) and self._ids[i] == user_id else -1
+
+    def get(self, user_id: int, now: float) -> BanInfo | None:
+        """Действующий бан пользователя или None."""
+        i = self._position(user_id)
+        if i < 0 or self._expires[i] <= now:
+            return None
+        expires_at = self._expires[i]
+        return BanInfo(BanCategory(self._categories[i]), None if expires_at == self._PERMANENT else expires_at)
+
+    def add(self, user_id: int, category: BanCategory, expires_at: float | None):
+        """Добавляет или заменяет бан. Вставка в середину массива - O(n), баны выдаются редко."""
+        expires = self._PERMANENT if expires_at is None else expires_at
+        self._changes += 1
+        i = bisect.bisect_left(self._ids, user_id)
+        if i < len(self._ids) and self._ids[i] == user_id:
+            self._expires[i] = expires
+            self._categories[i] = category
+        else:
+            self._ids.insert(i, user_id)
+            self._expires.insert(i, expires)
+            self._categories.insert(i, category)
+        self._next_expiry = min(self._next_expiry, expires)
+
+    def remove(self, user_id: int) -> bool:
+        i = self._position(user_id)
+        if i < 0:
+            return False
+        self._changes += 1
+        del self._ids[i]
+        del self._expires[i]
+        del self._categories[i]
+        return True
+
+    async def sweep_if_due(self, now: float) -> int:
+        """Вызывает sweep(), если есть истекшие баны и с прошлой очистки прошло sweep_interval секунд."""
+        if now < self._next_expiry or now < self._next_sweep:
+            return 0
+        return await self.sweep(now)
+
+    async def sweep(self, now: float) -> int:
+        """
+        Удаляет истекшие баны. Возвращает количество удаленных записей.
+
+        Новые массивы собираются в отдельном потоке, поэтому проход по миллионам
+        записей не блокирует цикл событий. Если индекс за это время изменился
+        (add/remove), результат отбрасывается и очистка повторяется при следующем
+        вызове sweep_if_due.
+        """
+        changes = self._changes
+        ids, expires, categories, next_expiry = await asyncio.to_thread(
+            _without_expired, self._ids, self._expires, self._categories, now
+        )
+        if changes != self._changes:
+            return 0
+        removed = len(self._ids) - len(ids)
+        self._ids, self._expires, self._categories = ids, expires, categories
+        self._next_expiry = next_expiry
+        self._next_sweep = now + self._sweep_interval
+        return removed
+
+
+def _without_expired(ids: array, expires: array, categories: array, now: float) -> tuple[array, array, array, float]:
+    """
+    Массивы индекса без записей, истекших к now, и ближайший срок окончания среди
+    оставшихся. Участки между истекшими записями копируются срезами целиком.
+    Срок ищется в том же цикле, а не min(): min() по массиву держит GIL до конца.
+    """
+    expired, next_expiry = [], math.inf
+    for i, expires_at in enumerate(expires):
+        if expires_at <= now:
+            expired.append(i)
+        elif expires_at < next_expiry:
+            next_expiry = expires_at
+    if not expired:
+        return ids, expires, categories, next_expiry
+    kept_ids, kept_expires, kept_categories = array("q"), array("d"), array("B")
+    start = 0
+    for end in expired + [len(ids)]:
+        kept_ids.extend(ids[start:end])
+        kept_expires.extend(expires[start:end])
+        kept_categories.extend(categories[start:end])
+        start = end + 1
+    return kept_ids, kept_expires, kept_categories, next_expiry
+
+
 class BanManager:
-    def __init__(self):
-        self._banned_users_cache: Set[int] = set()
+    """
+    Баны пользователей: запись в blocked_users и индекс в памяти для фильтра IsBanned.
+
+    Индекс каждого процесса бота синхронизируется с БД через журнал
+    ban_events: фоновая задача раз в sync_interval секунд читает новые
+    записи журнала и применяет их, так что бан, выданный в другом процессе
+    или внесенный в БД вручную, начинает действовать не позже чем через
+    sync_interval секунд.
+    """
+
+    # Сколько записей журнала читать за один запрос
+    _SYNC_BATCH = 1000
+    # Как часто удалять из журнала записи старше BAN_EVENTS_RETENTION
+    _CLEANUP_INTERVAL = 3600
+
+    def __init__(self, db: Database, sync_interval: float = BAN_SYNC_INTERVAL):
+        self._db = db
+        self._index = BanIndex()
+        self._admins: list[int] = []
+        self._sync_interval = sync_interval
+        self._last_event_id = 0
+        self._sync_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
         logger.info("BanManager инициализирован. Кэш пуст.")
 
     async def load_banned_users_from_db(self):
         """
-        Загружает всех забаненных пользователей из базы данных в кэш.
+        Загружает действующие баны из базы данных в индекс.
         Вызывается при старте бота.
         """
-        banned_ids = await get_banlist()
-        self._banned_users_cache = banned_ids
-        logger.info(f"Кэш забаненных пользователей загружен из БД. Забанено: {len(self._banned_users_cache)}.")
+        # Позицию журнала запоминаем до чтения бан-листа: изменения между двумя
+        # запросами будут применены повторно, что безопасно
+        last_event_id = await self._db.get_last_ban_event_id()
+        rows = await self._db.get_banlist(time.time())
+        self._last_event_id = last_event_id
+        admins = [(user_id, BanCategory.ADMIN, None) for user_id in self._admins]
+        self._index = BanIndex.build(
+            [(user_id, BanCategory.from_db(category), expires_at) for user_id, category, expires_at in rows] + admins
+        )
+        logger.info("Кэш забаненных пользователей загружен из БД. Забанено: %s.", len(rows))
+
+    @property
+    def admin_ids(self) -> tuple[int, ...]:
+        return tuple(self._admins)
 
-    async def add_banned_user(self, user_id: int, ban_reason: str) -> bool:
+    def set_admins(self, admin_ids: Iterable[int]):
         """
-        Добавляет пользователя в банлист (в БД и обновляет кэш).
-        Возвращает True, если пользователь был успешно забанен, False если уже был забанен.
+        Закрывает администраторам пользовательские сценарии (анкету, /start)
+        без записи в blocked_users.
         """
-        if self.is_banned(user_id): # Проверка по кэшу сначала
-            logger.warning(f"Попытка забанить уже забаненного пользователя {user_id}.")
-            return False # Уже забанен (согласно кэшу)
+        self._admins = list(admin_ids)
+        for admin_id in self._admins:
+            self._index.add(admin_id, BanCategory.ADMIN, None)
 
-        try:
-            await add_to_banlist(user_id, ban_reason)
-            self._banned_users_cache.add(user_id)
-            return True
+    async def add_banned_user(
+        self,
+        user_id: int,
+        ban_reason: str,
+        category: BanCategory = BanCategory.MANUAL,
+        duration: float | None = None,
+        banned_by: int | None = None
+    ) -> bool:
+        """
+        Банит пользователя (в БД и в индексе) навсегда или на duration секунд.
+        Возвращает True, если пользователь был успешно забанен, False если уже был забанен
+        или если запись в БД не удалась.
+        """
+        now = time.time()
+        if self._index.get(user_id, now) is not None:
+            logger.warning("Попытка забанить уже забаненного пользователя %s.", user_id)
+            return False
+
+        expires_at = now + duration if duration else None
+        if not await self._db.add_to_banlist(user_id, ban_reason, category.db_name, expires_at, banned_by):
+            return False
+        self._index.add(user_id, category, expires_at)
+        return True
+
+    async def remove_banned_user(self, user_id: int) -> bool:
+        """
+        Снимает бан (из БД и из индекса). Администраторов разбанить нельзя.
+        Возвращает True, если бан был снят.
+        """
+        ban = self._index.get(user_id, time.time())
+        if ban is not None and ban.category == BanCategory.ADMIN:
+            return False
+        removed = await self._db.remove_from_banlist(user_id)
+        self._index.remove(user_id)
+        # Запись в БД могла остаться и после истечения бана в индексе - это тоже снятие бана
+        return removed
+
+    def start(self):
+        """Запускает фоновую синхронизацию индекса с журналом ban_events."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop(), name="ban-sync")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sync_loop(self):
+        next_cleanup = 0.0
+        while True:
+            await asyncio.sleep(self._sync_interval)
+            try:
+                await self.sync()
+                removed = await self._index.sweep_if_due(time.time())
+                if removed:
+                    logger.debug("Из индекса удалено истекших банов: %s.", removed)
+                if time.time() >= next_cleanup:
+                    next_cleanup = time.time() + self._CLEANUP_INTERVAL
+                    await self._db.delete_old_ban_events(time.time() - BAN_EVENTS_RETENTION)
+            except Exception as e:
+                logger.error("Ошибка синхронизации банов: %s", e, exc_info=True)
 
-        except aiosqlite.IntegrityError: # На случай, если кэш был несинхронизирован
-            logger.warning(f"Пользователь {user_id} уже находится в банлисте (ошибка БД). Обновляем кэш.")
-            self._banned_users_cache.add(user_id)
-            return False 
+    async def sync(self) -> int:
+        """
+        Применяет к индексу новые записи журнала ban_events.
+        Если нужные записи уже удалены из журнала (первая прочитанная запись - не
+        следующая за позицией, или после позиции записей нет, хотя счетчик журнала
+        ушел дальше), перечитывает бан-лист целиком.
+        Кроме фоновой задачи вызывается после массовых банов, чтобы они
+        сразу попали в индекс.
+
+        Returns:
+            Количество примененных записей.
+        """
+        async with self._sync_lock:
+            return await self._sync()
+
+    async def _sync(self) -> int:
+        applied = 0
+        while True:
+            events = await self._db.get_ban_events(self._last_event_id, self._SYNC_BATCH)
+            if not events and not await self._journal_trimmed():
+                break
+            if not events or events[0][0] != self._last_event_id + 1:
+                logger.warning("Журнал банов очищен дальше позиции %s. Перечитываем бан-лист.", self._last_event_id)
+                await self.load_banned_users_from_db()
+                return applied
+            admins = set(self._admins)
+            for event_id, user_id, action, category, expires_at in events:
+                self._last_event_id = event_id
+                if user_id in admins:
+                    continue
+                if action == "ban":
+                    self._index.add(user_id, BanCategory.from_db(category or ""), expires_at)
+                else:
+                    self._index.remove(user_id)
+            applied += len(events)
+            if len(events) < self._SYNC_BATCH:
+                break
+        if applied:
+            logger.debug("Применено изменений банов из журнала: %s.", applied)
+        return applied
+
+    async def _journal_trimmed(self) -> bool:
+        """
+        Удалены ли из журнала все записи после текущей позиции. Счетчик журнала читается
+        до повторной выборки записей, поэтому бан, записанный между запросами, не
+        принимается за очистку.
+        """
+        if await self._db.get_last_ban_event_id() <= self._last_event_id:
+            return False
+        return not await self._db.get_ban_events(self._last_event_id, 1)
+
+    def get_ban(self, user_id: int) -> BanInfo | None:
+        """Действующий бан пользователя (категория и срок окончания) или None."""
+        return self._index.get(user_id, time.time())
 
     def is_banned(self, user_id: int) -> bool:
         """
-        Проверяет, забанен ли пользователь, используя кэш.
+        Проверяет, забанен ли пользователь, используя индекс в памяти.
         Это синхронная функция для быстрой проверки в фильтрах.
         """
-        return user_id in self._banned_users_cache
+        return self._index.get(user_id, time.time()) is not None
+
 
+__all__ = ['BanManager', 'BanCategory', 'BanInfo', 'BanIndex', 'parse_duration']
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+)
+
+from src.config import (
+    BROADCAST_RATE_PER_SECOND, BROADCAST_PER_CHAT_INTERVAL, BROADCAST_WORKERS, BROADCAST_PROGRESS_BATCH
+)
+from src.database import Database
+from src.rate_limit import ChatRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз повторять отправку при сетевой ошибке или ошибке сервера Telegram
+_NETWORK_RETRIES = 3
+
+
+class Broadcaster:
+    """
+    Движок массовых рассылок.
+
+    Получатели рассылки фиксируются в БД при ее создании. Несколько
+    параллельных отправителей берут получателей из общей очереди, соблюдая
+    общий и поканальный лимиты Telegram (ChatRateLimiter). На RetryAfter
+    все отправки приостанавливаются на указанное Telegram время. Результаты
+    пачками сохраняются в БД, поэтому после перезапуска бота рассылка
+    продолжается с неотправленных получателей. По окончании администратор,
+    запустивший рассылку, получает отчет о скорости и доставке.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        limiter: ChatRateLimiter | None = None,
+        workers: int = BROADCAST_WORKERS
+    ):
+        self._bot = bot
+        self._db = db
+        self._limiter = limiter or ChatRateLimiter(BROADCAST_RATE_PER_SECOND, BROADCAST_PER_CHAT_INTERVAL)
+        self._workers = max(1, workers)
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def start(self, broadcast_id: int):
+        """Запускает отправку рассылки в фоне."""
+        if broadcast_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(broadcast_id), name=f"broadcast-{broadcast_id}")
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    async def resume_unfinished(self):
+        """Продолжает рассылки, прерванные предыдущей остановкой бота."""
+        for broadcast_id in await self._db.get_unfinished_broadcast_ids():
+            logger.info("Возобновление рассылки #%s.", broadcast_id)
+            self.start(broadcast_id)
+
+    async def close(self):
+        """Останавливает активные рассылки; сохраненный прогресс позволит продолжить их позже."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, broadcast_id: int):
+        broadcast = await self._db.get_broadcast(broadcast_id)
+        if broadcast is None:
+            logger.error("Рассылка #%s не найдена.", broadcast_id)
+            return
+        _, admin_id, text, _, total, _, _ = broadcast
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for user_id in await self._db.get_pending_broadcast_recipients(broadcast_id):
+            queue.put_nowait(user_id)
+        logger.info("Рассылка #%s: к отправке %s из %s сообщений.", broadcast_id, queue.qsize(), total)
+
+        results: list[tuple[int, bool]] = []
+        to_send = queue.qsize()
+        started = time.perf_counter()
+
+        async def save_progress():
+            if results:
+                batch = results[:]
+                results.clear()
+                await self._db.record_broadcast_results(broadcast_id, batch)
+
+        async def worker():
+            while True:
+                try:
+                    user_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results.append((user_id, await self._send(user_id, text)))
+                if len(results) >= BROADCAST_PROGRESS_BATCH:
+                    await save_progress()
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self._workers)))
+        finally:
+            # Сохраняем прогресс и при остановке бота посреди рассылки
+            await asyncio.shield(save_progress())
+
+        elapsed = time.perf_counter() - started
+        await self._db.finish_broadcast(broadcast_id)
+        broadcast = await self._db.get_broadcast(broadcast_id)
+        sent, failed = (broadcast[5], broadcast[6]) if broadcast else (0, 0)
+        rate = to_send / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            "Рассылка #%s завершена: отправлено %s, не доставлено %s из %s, %s сообщений за %.1f с (%.1f сообщ./с).",
+            broadcast_id, sent, failed, total, to_send, elapsed, rate
+        )
+        await self._report(admin_id, (
+            f"📣 Рассылка #{broadcast_id} завершена.\n"
+            f"Доставлено: {sent}, не доставлено: {failed} (всего {total}).\n"
+            f"Отправка заняла {elapsed:.1f} с, скорость {rate:.1f} сообщ./с."
+        ))
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        """
+        Отправляет одно сообщение с учетом лимитов. Возвращает True, если оно доставлено.
+        Не выбрасывает исключений (кроме отмены), чтобы сбой одной отправки не прерывал рассылку.
+        """
+        network_attempts = 0
+        while True:
+            await self._limiter.wait(chat_id)
+            try:
+                await self._bot.send_message(chat_id, text)
+                return True
+            except TelegramRetryAfter as e:
+                logger.warning("Telegram просит подождать %s с. Рассылка приостановлена.", e.retry_after)
+                self._limiter.pause(e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                logger.info("Сообщение рассылки не доставлено пользователю %s: %s", chat_id, e)
+                return False
+            except TelegramAPIError as e:
+                # Сетевые ошибки, 5xx и прочие ответы Telegram - повторяем ограниченное число раз
+                network_attempts += 1
+                if network_attempts >= _NETWORK_RETRIES:
+                    logger.warning("Сообщение рассылки пользователю %s не отправлено после %s попыток: %s", chat_id, network_attempts, e)
+                    return False
+                await asyncio.sleep(network_attempts)
+            except Exception as e:
+                logger.error("Ошибка при отправке сообщения рассылки пользователю %s: %s", chat_id, e, exc_info=True)
+                return False
+
+    async def _report(self, admin_id: int, text: str):
+        try:
+            await self._bot.send_message(admin_id, text)
+        except Exception as e:
+            logger.warning("Не удалось отправить отчет о рассылке администратору %s: %s", admin_id, e)
+
+
+__all__ = ['Broadcaster']
@@ -0,0 +1,205 @@
+import asyncio
+import bisect
+import json
+import logging
+import re
+from math import ceil
+from typing import Iterable, NamedTuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from src.config import CATALOG_PATH, ADDRESSES_PER_PAGE, ADDRESS_SEARCH_LIMIT
+from src.database import Database
+from src.keyboards import get_region_keyboard, get_address_page_keyboard, get_address_search_keyboard
+
+logger = logging.getLogger(__name__)
+
+
+class Address(NamedTuple):
+    id: int
+    region_code: str
+    text: str
+
+
+class Region(NamedTuple):
+    """Область из каталога: код для callback_data, название и адреса объектов."""
+    code: str
+    name: str
+    addresses: tuple[Address, ...]
+
+
+def load_catalog_file(path: str = CATALOG_PATH) -> list[tuple[str, str, list[str]]]:
+    """
+    Читает каталог областей и адресов из JSON-файла вида
+    {"regions": [{"code": "msk", "name": "...", "addresses": ["...", ...]}, ...]}.
+    Возвращает список (код, название, адреса).
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return [(r["code"], r["name"], list(r["addresses"])) for r in raw["regions"]]
+
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Приводит строку к виду для поиска: нижний регистр, ё -> е, без знаков препинания."""
+    return _NON_WORD_RE.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def _trigrams(word: str) -> set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class AddressSearchIndex:
+    """
+    Поиск адресов по части названия.
+
+    Для каждого адреса хранится нормализованный текст; по нему строятся
+    триграммный индекс (триграмма -> множество id адресов) и
+    отсортированный список слов для поиска по префиксу. Слово запроса
+    длиной от трех символов сужает кандидатов пересечением множеств его
+    триграмм, более короткое - диапазоном слов с таким префиксом
+    (бинарный поиск). Кандидаты проверяются вхождением подстроки, так
+    что запрос "калин" находит и "Калинина, 6", и "ул. Калининская".
+    """
+
+    def __init__(self, addresses: Iterable[Address]):
+        self._addresses: dict[int, Address] = {}
+        self._texts: dict[int, str] = {}
+        self._trigrams: dict[str, set[int]] = {}
+        words: set[tuple[str, int]] = set()
+        for address in addresses:
+            text = normalize(address.text)
+            self._addresses[address.id] = address
+            self._texts[address.id] = text
+            for word in text.split():
+                words.add((word, address.id))
+                for trigram in _trigrams(word):
+                    self._trigrams.setdefault(trigram, set()).add(address.id)
+        self._words = sorted(words)
+
+    def _prefix_ids(self, prefix: str) -> set[int]:
+        ids = set()
+        i = bisect.bisect_left(self._words, (prefix, -1))
+        while i < len(self._words) and self._words[i][0].startswith(prefix):
+            ids.add(self._words[i][1])
+            i += 1
+        return ids
+
+    def search(self, query: str, limit: int = ADDRESS_SEARCH_LIMIT) -> list[Address]:
+        """
+        Адреса, содержащие все слова запроса. Сначала адреса, где слово
+        запроса совпадает с началом слова адреса, затем остальные; внутри
+        группы - в порядке каталога.
+        """
+        query_words = normalize(query).split()
+        if not query_words:
+            return []
+
+        candidates: set[int] | None = None
+        for word in sorted(query_words, key=len, reverse=True):
+            if len(word) >= 3:
+                postings = sorted((self._trigrams.get(t, set()) for t in _trigrams(word)), key=len)
+                ids = set(postings[0]).intersection(*postings[1:])
+            else:
+                ids = self._prefix_ids(word)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+
+        matches = []
+        for address_id in candidates:
+            text = self._texts[address_id]
+            if all(word in text for word in query_words):
+                text_words = text.split()
+                starts_word = all(any(w.startswith(word) for w in text_words) for word in query_words)
+                matches.append((not starts_word, address_id))
+        matches.sort()
+        return [self._addresses[address_id] for _, address_id in matches[:limit]]
+
+
+class Catalog:
+    """
+    Каталог областей и адресов объектов (пунктов выдачи).
+
+    Хранится в таблицах catalog_regions/catalog_addresses; при первом
+    запуске таблицы заполняются из файла CATALOG_PATH. При старте каталог
+    загружается в память целиком: клавиатуры областей и все страницы
+    клавиатур адресов строятся один раз, адрес по id и название области
+    по коду ищутся в словарях, а для поиска по тексту у каждой области
+    свой AddressSearchIndex. Передается в хендлеры через CatalogMiddleware.
+
+    callback_data кнопок: область - 'region_{код}', адрес - 'address_{id}',
+    страница адресов - 'addrpage_{код}_{страница}'.
+    """
+
+    def __init__(self, regions: list[Region], per_page: int = ADDRESSES_PER_PAGE):
+        self.regions = regions
+        self._per_page = max(1, per_page)
+        self._regions: dict[str, Region] = {region.code: region for region in regions}
+        self._addresses: dict[int, Address] = {
+            address.id: address for region in regions for address in region.addresses
+        }
+        self._search: dict[str, AddressSearchIndex] = {
+            region.code: AddressSearchIndex(region.addresses) for region in regions
+        }
+        self.region_keyboard = get_region_keyboard([(region.code, region.name) for region in regions])
+        self._pages: dict[str, list[InlineKeyboardMarkup]] = {}
+        for region in regions:
+            total_pages = max(1, ceil(len(region.addresses) / self._per_page))
+            self._pages[region.code] = [
+                get_address_page_keyboard(
+                    region.code,
+                    [(a.id, a.text) for a in region.addresses[(page - 1) * self._per_page:page * self._per_page]],
+                    page,
+                    total_pages
+                )
+                for page in range(1, total_pages + 1)
+            ]
+
+    @classmethod
+    async def load(cls, db: Database, seed_path: str = CATALOG_PATH) -> "Catalog":
+        """Загружает каталог из БД, при пустом каталоге предварительно заполнив его из файла."""
+        region_rows, address_rows = await db.get_catalog()
+        if not region_rows:
+            try:
+                seed = await asyncio.to_thread(load_catalog_file, seed_path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Не удалось прочитать файл каталога %s: %s", seed_path, e)
+                seed = []
+            if seed:
+                await db.seed_catalog(seed)
+                region_rows, address_rows = await db.get_catalog()
+                logger.info("Каталог адресов заполнен из файла %s.", seed_path)
+
+        addresses: dict[str, list[Address]] = {code: [] for code, _ in region_rows}
+        for address_id, region_code, text in address_rows:
+            addresses.setdefault(region_code, []).append(Address(address_id, region_code, text))
+        catalog = cls([Region(code, name, tuple(addresses[code])) for code, name in region_rows])
+        logger.info("Каталог загружен: областей %s, адресов %s.", len(catalog.regions), len(catalog._addresses))
+        return catalog
+
+    def region_name(self, region_code: str | None) -> str | None:
+        region = self._regions.get(region_code)
+        return region.name if region else None
+
+    def address(self, address_id: int) -> Address | None:
+        return self._addresses.get(address_id)
+
+    def address_page(self, region_code: str | None, page: int = 1) -> InlineKeyboardMarkup | None:
+        """Заранее построенная страница клавиатуры адресов области (номер страницы ограничивается диапазоном)."""
+        pages = self._pages.get(region_code)
+        if not pages:
+            return None
+        return pages[min(max(page, 1), len(pages)) - 1]
+
+    def search(self, region_code: str | None, query: str, limit: int = ADDRESS_SEARCH_LIMIT) -> list[Address]:
+        index = self._search.get(region_code)
+        return index.search(query, limit) if index else []
+
+    def search_keyboard(self, region_code: str, addresses: list[Address]) -> InlineKeyboardMarkup:
+        return get_address_search_keyboard(region_code, [(a.id, a.text) for a in addresses])
+
+
+__all__ = ['Catalog', 'Region', 'Address', 'AddressSearchIndex', 'load_catalog_file', 'normalize']
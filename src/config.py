@@ -20,11 +20,187 @@ ADMIN_USER_IDS_STR = "YOUR_ADMIN_ID_1,YOUR_ADMIN_ID_2"
 # Путь к файлу базы данных
 DATABASE_FILE = r"data/database.db"
 
+# Количество постоянных соединений-читателей в пуле БД (писатель всегда один)
+DB_READER_POOL_SIZE = 3
+
+# Настройки SQLite: размер memory-mapped области (байт) и время ожидания блокировки (мс)
+DB_MMAP_SIZE = 64 * 1024 * 1024
+DB_BUSY_TIMEOUT_MS = 5000
+
+# Максимальное количество операций записи, объединяемых в одну транзакцию
+DB_WRITE_BATCH_SIZE = 100
+
+# Кэш заявок в памяти (поиск по user_id и по ID заявки): сколько записей держать и сколько секунд они живут.
+# Свои изменения процесс сбрасывает из кэша сразу; изменения из других процессов (версию данных в БД)
+# он проверяет раз в APPLICATION_CACHE_SYNC_INTERVAL секунд и тогда сбрасывает кэш целиком.
+APPLICATION_CACHE_SIZE = 10000
+APPLICATION_CACHE_TTL = 30.0
+APPLICATION_CACHE_SYNC_INTERVAL = 2.0
+
+# --- ХРАНИЛИЩЕ СОСТОЯНИЙ (FSM) ---
+
+# Сколько активных сессий держать в памяти (LRU)
+FSM_CACHE_SIZE = 10000
+# Как часто (сек) накопленные изменения состояний записываются в БД
+FSM_FLUSH_INTERVAL = 1.0
+# Через сколько секунд бездействия незаконченная анкета считается брошенной и удаляется
+FSM_STATE_TTL = 7 * 24 * 60 * 60
+# Как часто (сек) запускать очистку брошенных сессий
+FSM_SWEEP_INTERVAL = 10 * 60
+
+# --- ОЧЕРЕДНОСТЬ ОБРАБОТКИ ОБНОВЛЕНИЙ ---
+
+# Сколько обновлений обрабатывается одновременно; остальные ждут свободного места
+UPDATE_MAX_CONCURRENCY = 200
+# Сколько блокировок пользователей (обновления одного пользователя обрабатываются по очереди) держать в памяти
+USER_LOCKS_CACHE_SIZE = 10000
+
+# --- ЗАЩИТА ОТ ФЛУДА ---
+
+# Ограничения частоты обновлений от одного пользователя:
+# имя правила -> (обновлений в секунду, допустимый всплеск, действие при превышении).
+# Действие "drop" отбрасывает лишние обновления, "delay" задерживает их (не дольше THROTTLE_MAX_DELAY).
+# Хендлер выбирает правило флагом flags={"throttle": "имя"} (False - без ограничения),
+# хендлеры без флага используют правило "default". На администраторов ограничения не действуют.
+THROTTLE_RULES = {
+    "default": (2.0, 10, "delay"),
+    # /start: повторная отправка приветственной картинки
+    "greeting": (0.2, 2, "drop"),
+    # Подсказки "нажмите кнопку" в ответ на текст
+    "hint": (0.5, 2, "drop"),
+}
+# Сколько максимум (сек) задерживать обновление по правилу "delay"; если ждать дольше, обновление отбрасывается
+THROTTLE_MAX_DELAY = 2.0
+# Как часто (сек) удалять из памяти счетчики пользователей, которые давно ничего не присылали
+THROTTLE_SWEEP_INTERVAL = 60.0
+
 # Путь к приветственной картинке для команды /start
 GREETING_PICTURE_PATH = r'data/bot_picture_greeting.jpg'
 
+# Файл со списком областей и адресов объектов для анкеты (формат см. в README).
+# Из него заполняется каталог в БД при первом запуске.
+CATALOG_PATH = r'data/catalog.json'
+# Сколько адресов показывать на одной странице клавиатуры выбора адреса
+ADDRESSES_PER_PAGE = 8
+# Сколько найденных адресов показывать при поиске по тексту
+ADDRESS_SEARCH_LIMIT = 8
+
 # Количество заявок, отображаемое на одной странице в админ-панели
 APPLICATIONS_PER_PAGE = 5
+# Кэш готовых страниц списка заявок: сколько страниц держать и сколько секунд они живут.
+# Страница перестраивается при любом изменении заявок (версия данных хранится в БД, так что учитываются
+# и другие процессы); срок жизни ограничивает сдвиг границы у фильтров по периоду ("за сутки" и т.п.).
+ADMIN_PAGE_CACHE_SIZE = 200
+ADMIN_PAGE_CACHE_TTL = 60.0
+# Больше скольких совпадений не считать при поиске /find (показывается как "1000+")
+SEARCH_COUNT_LIMIT = 1000
+# Сколько заявок можно выбрать для массового действия (принять/отклонить/заблокировать) за раз
+BULK_MAX_SELECTION = 500
+
+
+# --- РАССЫЛКИ ---
+
+# Общий лимит исходящих сообщений в секунду (у Telegram около 30 сообщений/с на бота)
+BROADCAST_RATE_PER_SECOND = 25
+# Минимальный интервал (сек) между сообщениями в один и тот же чат
+BROADCAST_PER_CHAT_INTERVAL = 1.0
+# Количество параллельных отправителей одной рассылки
+BROADCAST_WORKERS = 8
+# Сколько результатов отправки копить перед сохранением прогресса в БД
+BROADCAST_PROGRESS_BATCH = 50
+
+
+# --- ОЧЕРЕДЬ УВЕДОМЛЕНИЙ (OUTBOX) ---
+
+# Как часто (сек) проверять очередь, если новых сообщений не поступало
+OUTBOX_POLL_INTERVAL = 5.0
+# Сколько сообщений брать из очереди за один проход
+OUTBOX_BATCH_SIZE = 50
+# После скольких неудачных попыток сообщение считается недоставляемым
+OUTBOX_MAX_ATTEMPTS = 8
+# Задержка перед повторной попыткой (сек): растет вдвое с каждой попыткой, но не больше максимума
+OUTBOX_RETRY_BASE_DELAY = 2.0
+OUTBOX_RETRY_MAX_DELAY = 10 * 60
+# На сколько секунд сообщение резервируется за процессом, взявшим его в отправку
+OUTBOX_CLAIM_LEASE = 60.0
+
+
+# --- РЕЖИМ ПОЛУЧЕНИЯ ОБНОВЛЕНИЙ ---
+# Настройки этого блока можно переопределить переменными окружения,
+# чтобы запускать несколько процессов бота с разными параметрами.
+import os
+
+# "polling" - бот сам опрашивает Telegram; "webhook" - Telegram присылает обновления на HTTP-сервер бота
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Публичный HTTPS-адрес, на который Telegram будет отправлять обновления (без пути), например "https://bot.example.com".
+# Если пусто, вебхук в Telegram не регистрируется (например, его уже зарегистрировал другой процесс).
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+# Путь, на который приходят обновления
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token (1-256 символов A-Z, a-z, 0-9, _ и -)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Адрес и порт, на которых слушает HTTP-сервер бота (обычно за обратным прокси)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Сколько одновременных соединений Telegram может открывать к вебхуку (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Возобновлять ли прерванные рассылки при старте. В режиме BOT_WORKERS > 1 supervisor
+# оставляет "1" только первому процессу, иначе рассылка была бы продолжена несколько раз.
+RESUME_BROADCASTS = os.getenv("RESUME_BROADCASTS", "1") == "1"
+# Обрабатывать обновление с вебхука в фоне (Telegram сразу получает ответ) или отвечать после обработки.
+# Supervisor запускает процессы-обработчики с "0", чтобы передавать обновления одного пользователя по очереди.
+WEBHOOK_HANDLE_IN_BACKGROUND = os.getenv("WEBHOOK_HANDLE_IN_BACKGROUND", "1") == "1"
+# Адрес своего сервера Bot API (например, локального telegram-bot-api); пусто - api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# --- НЕСКОЛЬКО ПРОЦЕССОВ НА ОДНОМ ХОСТЕ ---
+# Количество процессов-обработчиков. Если больше 1, bot.py запускается как supervisor:
+# сам получает обновления (в режиме BOT_MODE) и раздает их процессам по ID пользователя.
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+# Номер процесса-обработчика; задается supervisor'ом, вручную не указывается
+BOT_WORKER_INDEX = int(os.environ["BOT_WORKER_INDEX"]) if os.getenv("BOT_WORKER_INDEX") else None
+# Процесс-обработчик i слушает 127.0.0.1:WORKER_BASE_PORT+i, его /metrics - WORKER_METRICS_BASE_PORT+i
+# (0 отключает метрики процессов). Сводные /metrics и /health supervisor'а - на METRICS_PORT.
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8200"))
+WORKER_METRICS_BASE_PORT = int(os.getenv("WORKER_METRICS_BASE_PORT", "9200"))
+# Сколько обновлений supervisor передает процессам одновременно
+SUPERVISOR_MAX_IN_FLIGHT = 1000
+
+# --- БАНЫ ---
+
+# Срок бана после утверждения заявки (секунды); None - бессрочно
+COMPLETED_BAN_DURATION = None
+# Как часто (не чаще, секунды) индекс банов в памяти очищается от истекших банов
+BAN_SWEEP_INTERVAL = 60.0
+# Как часто (секунды) процесс читает журнал ban_events и применяет баны, выданные
+# другими процессами или внесенные в БД вручную
+BAN_SYNC_INTERVAL = 2.0
+# Сколько хранить записи журнала ban_events (секунды). Процесс, отставший больше
+# чем на этот срок, перечитывает бан-лист целиком.
+BAN_EVENTS_RETENTION = 86400
+
+# --- ЛОГИРОВАНИЕ ---
+
+# Общий уровень логирования и уровни для отдельных модулей,
+# например {"aiogram.event": "WARNING", "src.database": "DEBUG"}
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MODULE_LEVELS = {
+    "aiogram.event": "INFO",
+}
+# Формат записей: "text" или "json" (JSON Lines, одна запись на строку)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Папка для лог-файлов
+LOG_FOLDER = "logs"
+# Прореживание частых записей уровня INFO: не больше LOG_SAMPLING_BURST записей одного
+# шаблона за LOG_SAMPLING_WINDOW секунд (0 отключает прореживание)
+LOG_SAMPLING_BURST = 50
+LOG_SAMPLING_WINDOW = 10.0
+
+# Адрес и порт HTTP-эндпоинта /metrics (формат Prometheus). Порт 0 отключает эндпоинт.
+# При запуске нескольких процессов каждому нужен свой порт.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
 
 
 # --- КОМАНДЫ БОТА ---
@@ -36,5 +212,10 @@ DEFAULT_BOT_COMMANDS = [
     BotCommand(command="cancel", description="Отменить текущее действие"),
     # Команды ниже будут работать только у админов, но видны всем в меню
     BotCommand(command="view_apps", description="Просмотреть заявки (только для админов)"),
+    BotCommand(command="find", description="Поиск заявок: /find имя, телефон или адрес (только для админов)"),
+    BotCommand(command="broadcast", description="Рассылка заявителям (только для админов)"),
+    BotCommand(command="ban", description="Заблокировать пользователя: /ban ID [7d] [причина] (только для админов)"),
+    BotCommand(command="unban", description="Разблокировать пользователя: /unban ID (только для админов)"),
+    BotCommand(command="stats", description="Статистика работы бота (только для админов)"),
     BotCommand(command="cancel_admin_action", description="Отменить текущее действие админа (только для админов)"),
 ]
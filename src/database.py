@@ -1,16 +1,390 @@
+import asyncio
 import logging
+import re
+import time
 import aiosqlite
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import wraps
 from math import ceil
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Hashable, NamedTuple
 
-from src.config import DATABASE_FILE
+from src.config import (
+    DATABASE_FILE, DB_READER_POOL_SIZE, DB_MMAP_SIZE, DB_BUSY_TIMEOUT_MS, DB_WRITE_BATCH_SIZE, SEARCH_COUNT_LIMIT,
+    BULK_MAX_SELECTION, APPLICATION_CACHE_SIZE, APPLICATION_CACHE_TTL, APPLICATION_CACHE_SYNC_INTERVAL
+)
 
 # Настраиваем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
-async def init_db():
-    """Инициализирует базу данных и создает таблицы, если они не существуют."""
-    try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+_APPLICATION_COLUMNS = (
+    "id, user_id, username, full_name, age, citizenship, "
+    "region_name, address, phone, status, created_at, updated_at"
+)
+
+
+class PageCursor(NamedTuple):
+    """
+    Позиция в списке заявок для keyset-пагинации: ключ (updated_at, id)
+    граничной заявки соседней страницы и направление движения.
+    """
+    backward: bool
+    updated_at: str
+    app_id: int
+
+    def encode(self) -> str:
+        """Компактная строка для callback_data, например 'a20250131235959x42'."""
+        timestamp = self.updated_at.replace("-", "").replace(" ", "").replace(":", "")
+        return f"{'b' if self.backward else 'a'}{timestamp}x{self.app_id}"
+
+    @classmethod
+    def decode(cls, raw: str) -> "PageCursor":
+        """Обратное преобразование encode(). Бросает ValueError при неверном формате."""
+        direction, ts, app_id = raw[:1], raw[1:15], raw[16:]
+        if direction not in ("a", "b") or len(ts) != 14 or not ts.isdigit() or raw[15:16] != "x":
+            raise ValueError(f"Некорректный курсор страницы: {raw!r}")
+        updated_at = f"{ts[0:4]}-{ts[4:6]}-{ts[6:8]} {ts[8:10]}:{ts[10:12]}:{ts[12:14]}"
+        return cls(backward=direction == "b", updated_at=updated_at, app_id=int(app_id))
+
+    @classmethod
+    def after(cls, app_row: tuple) -> "PageCursor":
+        """Курсор на страницу, следующую за строкой app_row (id — [0], updated_at — [11])."""
+        return cls(backward=False, updated_at=app_row[11], app_id=app_row[0])
+
+    @classmethod
+    def before(cls, app_row: tuple) -> "PageCursor":
+        """Курсор на страницу, предшествующую строке app_row."""
+        return cls(backward=True, updated_at=app_row[11], app_id=app_row[0])
+
+
+class QueryStat:
+    """Накопленная статистика задержек одного метода БД."""
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+# Признак отсутствия значения в TTLCache (None - допустимое закэшированное значение)
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU-кэш с временем жизни записей для результатов запросов на чтение.
+
+    Хранит и отрицательные результаты (None). Чтобы чтение, начатое до
+    записи в БД, не положило в кэш устаревшие данные, значение
+    сохраняется, только если с начала чтения не было сбросов (номер
+    поколения generation не изменился).
+    """
+    def __init__(self, max_size: int = APPLICATION_CACHE_SIZE, ttl: float = APPLICATION_CACHE_TTL):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> Any:
+        """Значение из кэша или default, если его нет или оно устарело."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, generation: int | None = None):
+        """
+        Сохраняет значение. generation - номер поколения, взятый до чтения
+        данных: если с тех пор кэш сбрасывался, значение не сохраняется.
+        """
+        if self._max_size <= 0 or (generation is not None and generation != self.generation):
+            return
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def peek(self, key: Hashable) -> Any:
+        """Значение без учета срока жизни и счетчиков (None, если записи нет)."""
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def invalidate(self, *keys: Hashable):
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+
+def _measured(method):
+    """Декоратор: замеряет длительность вызова метода Database и копит ее в query_stats."""
+    @wraps(method)
+    async def wrapper(self: "Database", *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            self._record(method.__name__, time.perf_counter() - started)
+    return wrapper
+
+
+class Database:
+    """
+    Слой доступа к базе данных.
+
+    Держит постоянные соединения вместо открытия нового на каждый вызов:
+    пул соединений-читателей и одно соединение-писатель. Все записи
+    (заявки, статусы, баны) проходят через очередь единственной фоновой
+    задачи-писателя, которая объединяет накопившиеся операции в одну
+    транзакцию, так что число fsync растет с числом пачек, а не заявок.
+    Создается в init_db(), передается в хендлеры через DatabaseMiddleware
+    и закрывается при остановке бота.
+    """
+
+    def __init__(self, path: str = DATABASE_FILE, readers: int = DB_READER_POOL_SIZE):
+        self._path = path
+        self._readers_count = max(1, readers)
+        self._writer: aiosqlite.Connection | None = None
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+        self._write_queue: asyncio.Queue[tuple[WriteOp, asyncio.Future] | None] = asyncio.Queue()
+        self._writer_task: asyncio.Task | None = None
+        self.query_stats: dict[str, QueryStat] = {}
+        # Заявки по user_id и по ID заявки; сбрасываются методами, меняющими заявки и баны
+        self.applications_by_user = TTLCache()
+        self.applications_by_id = TTLCache()
+        # Версия данных (data_versions), которой соответствуют кэши заявок; None - еще не прочитана
+        self._cache_version: int | None = None
+        self._cache_sync_task: asyncio.Task | None = None
+
+    async def connect(self):
+        """Открывает соединение-писатель и пул читателей и настраивает SQLite."""
+        # isolation_level=None: транзакциями писателя управляем вручную (BEGIN/COMMIT)
+        self._writer = await aiosqlite.connect(self._path, isolation_level=None)
+        async with self._writer.execute("PRAGMA journal_mode=WAL") as cursor:
+            journal_mode = (await cursor.fetchone())[0]
+        await self._configure_connection(self._writer)
+        for _ in range(self._readers_count):
+            reader = await aiosqlite.connect(self._path)
+            await self._configure_connection(reader)
+            self._all_readers.append(reader)
+            self._readers.put_nowait(reader)
+        logger.info(
+            "Открыто соединений с БД '%s': 1 писатель, %s читателей (journal_mode=%s).",
+            self._path, self._readers_count, journal_mode
+        )
+
+    @staticmethod
+    async def _configure_connection(conn: aiosqlite.Connection):
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+        await conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+
+    def start_writer(self):
+        """Запускает фоновую задачу-писателя и проверку кэшей заявок (_cache_sync_loop)."""
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._writer_loop(), name="db-writer")
+        if self._cache_sync_task is None:
+            self._cache_sync_task = asyncio.create_task(self._cache_sync_loop(), name="db-cache-sync")
+
+    async def close(self):
+        """Дожидается записи накопленных операций и закрывает все соединения пула."""
+        if self._cache_sync_task is not None:
+            self._cache_sync_task.cancel()
+            try:
+                await self._cache_sync_task
+            except asyncio.CancelledError:
+                pass
+            self._cache_sync_task = None
+        if self._writer_task is not None:
+            self._write_queue.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers.clear()
+        self._readers = asyncio.Queue()
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+        logger.info("Соединения с базой данных закрыты.")
+
+    @asynccontextmanager
+    async def _read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Выдает свободное соединение-читатель из пула на время запроса."""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def _submit_write(self, op: WriteOp) -> Any:
+        """
+        Ставит операцию записи в очередь писателя и ждет ее результата.
+        Исключение aiosqlite.Error из операции пробрасывается вызывающему.
+        """
+        if self._writer_task is None:
+            raise RuntimeError("Задача-писатель БД не запущена (Database.start_writer).")
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((op, future))
+        return await future
+
+    async def _writer_loop(self):
+        """
+        Забирает операции из очереди пачками (до DB_WRITE_BATCH_SIZE) и выполняет
+        каждую пачку в одной транзакции. Каждая операция обернута в SAVEPOINT,
+        чтобы ошибка одной не откатывала остальные.
+        """
+        stopping = False
+        while not stopping:
+            item = await self._write_queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= DB_WRITE_BATCH_SIZE or self._write_queue.empty():
+                    break
+                item = self._write_queue.get_nowait()
+            stopping = item is None
+            if batch:
+                await self._run_batch(batch)
+
+    async def _run_batch(self, batch: list[tuple[WriteOp, asyncio.Future]]):
+        db = self._writer
+        results: list[tuple[asyncio.Future, Any, BaseException | None]] = []
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            # Внутри BEGIN IMMEDIATE другие процессы писать не могут, поэтому рост версии
+            # данных между этими двумя чтениями - изменения только этой пачки
+            version_before = await self._read_data_version(db)
+            for op, future in batch:
+                await db.execute("SAVEPOINT write_op")
+                try:
+                    result = await op(db)
+                except Exception as e:
+                    await db.execute("ROLLBACK TO write_op")
+                    results.append((future, None, e))
+                else:
+                    results.append((future, result, None))
+                await db.execute("RELEASE write_op")
+            version_after = await self._read_data_version(db)
+            await db.execute("COMMIT")
+        except Exception as e:
+            logger.error("Ошибка при фиксации пачки из %s операций записи: %s", len(batch), e, exc_info=True)
+            if db.in_transaction:
+                await db.execute("ROLLBACK")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug("Зафиксирована пачка из %s операций записи.", len(batch))
+        if self._cache_version is not None and self._cache_version == version_before:
+            # Свои изменения кэши уже учли (методы записи сбрасывают затронутые записи)
+            self._cache_version = version_after
+        for future, result, error in results:
+            if future.done():  # вызывающий мог быть отменен
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    async def _read_data_version(db: aiosqlite.Connection) -> int | None:
+        async with db.execute("SELECT version FROM data_versions WHERE name = 'applications'") as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+    async def _cache_sync_loop(self):
+        while True:
+            try:
+                await self.sync_application_caches()
+            except Exception as e:
+                logger.error("Ошибка проверки кэшей заявок: %s", e, exc_info=True)
+            await asyncio.sleep(APPLICATION_CACHE_SYNC_INTERVAL)
+
+    async def sync_application_caches(self) -> bool:
+        """
+        Сверяет версию данных в БД с версией, которой соответствуют кэши заявок.
+        Свои записи кэши сбрасывают точечно, а версию учитывает писатель, поэтому
+        версия вырастает только от изменений из других процессов или вручную -
+        тогда кэши сбрасываются целиком. Вызывается фоновой задачей раз в
+        APPLICATION_CACHE_SYNC_INTERVAL секунд, так что чужое изменение видно
+        не позже чем через этот срок.
+
+        Returns:
+            True, если кэши были сброшены.
+        """
+        version = await self.get_applications_version()
+        if version is None or (self._cache_version is not None and version <= self._cache_version):
+            return False
+        self.applications_by_user.clear()
+        self.applications_by_id.clear()
+        if self._cache_version is not None:
+            logger.debug("Версия данных заявок изменилась (%s -> %s), кэши заявок сброшены.", self._cache_version, version)
+        self._cache_version = version
+        return True
+
+    def _forget_applications(self, user_ids: Collection[int] = (), app_ids: Collection[int] = ()):
+        """Сбрасывает закэшированные заявки пользователей и заявки по ID (вместе со связанными записями)."""
+        user_keys, app_keys = set(user_ids), set(app_ids)
+        for user_id in user_ids:
+            row = self.applications_by_user.peek(user_id)
+            if row is not None:
+                app_keys.add(row[0])
+        for app_id in app_ids:
+            row = self.applications_by_id.peek(app_id)
+            if row is not None:
+                user_keys.add(row[1])
+        self.applications_by_user.invalidate(*user_keys)
+        self.applications_by_id.invalidate(*app_keys)
+
+    def _record(self, name: str, elapsed: float):
+        stat = self.query_stats.get(name)
+        if stat is None:
+            stat = self.query_stats[name] = QueryStat()
+        stat.add(elapsed)
+
+    async def create_schema(self):
+        """Создает таблицы и триггеры, если они не существуют. Вызывается до запуска писателя."""
+        db = self._writer
+        await db.execute("BEGIN")
+        try:
+            async with db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'application_stats'"
+            ) as cursor:
+                stats_table_exists = await cursor.fetchone() is not None
+            async with db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'applications_fts'"
+            ) as cursor:
+                fts_table_exists = await cursor.fetchone() is not None
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS applications (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -35,71 +409,373 @@ async def init_db():
                     UPDATE applications SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
                 END;
             """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_applications_status_updated
+                ON applications (status, updated_at, id);
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_applications_region_status_updated
+                ON applications (region_name, status, updated_at, id);
+            """)
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS blocked_users (
                     user_id INTEGER NOT NULL UNIQUE,
-                    reason TEXT
+                    reason TEXT,
+                    category TEXT NOT NULL DEFAULT 'manual',
+                    banned_at REAL,
+                    expires_at REAL,
+                    banned_by INTEGER
                 );
             """)
-            await db.commit()
-        logger.info(f"База данных '{DATABASE_FILE}' успешно инициализирована/проверена.")
-    except aiosqlite.Error as e:
-        logger.error(f"Ошибка при инициализации базы данных: {e}", exc_info=True)
-        raise
+            await self._migrate_blocked_users(db)
+            await self._create_ban_events_schema(db)
+            await self._create_stats_schema(db, backfill=not stats_table_exists)
+            await self._create_version_schema(db)
+            await self._create_search_schema(db, backfill=not fts_table_exists)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS fsm_storage (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT,
+                    updated_at REAL NOT NULL
+                );
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated ON fsm_storage (updated_at);")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    admin_id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'running',
+                    total INTEGER NOT NULL DEFAULT 0,
+                    sent INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    finished_at DATETIME
+                );
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                    broadcast_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    PRIMARY KEY (broadcast_id, user_id)
+                ) WITHOUT ROWID;
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    parse_mode TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending'
+                );
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS catalog_regions (
+                    code TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    position INTEGER NOT NULL
+                );
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS catalog_addresses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    region_code TEXT NOT NULL REFERENCES catalog_regions (code),
+                    address TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    active INTEGER NOT NULL DEFAULT 1
+                );
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_catalog_addresses_region
+                ON catalog_addresses (region_code, position);
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS media_cache (
+                    file_hash TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL
+                );
+            """)
+            await db.execute("COMMIT")
+        except aiosqlite.Error:
+            await db.execute("ROLLBACK")
+            raise
 
+    @staticmethod
+    async def _migrate_blocked_users(db: aiosqlite.Connection):
+        """
+        Добавляет в blocked_users из прежних версий категорию и сроки бана.
+        Баны за утвержденную заявку получают категорию 'completed', а строки
+        'admin_privilege' удаляются: администраторы больше не хранятся в бан-листе.
+        """
+        async with db.execute("PRAGMA table_info(blocked_users)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if "category" in columns:
+            return
+        await db.execute("ALTER TABLE blocked_users ADD COLUMN category TEXT NOT NULL DEFAULT 'manual'")
+        await db.execute("ALTER TABLE blocked_users ADD COLUMN banned_at REAL")
+        await db.execute("ALTER TABLE blocked_users ADD COLUMN expires_at REAL")
+        await db.execute("ALTER TABLE blocked_users ADD COLUMN banned_by INTEGER")
+        await db.execute("UPDATE blocked_users SET category = 'completed' WHERE reason = 'completed application'")
+        await db.execute("DELETE FROM blocked_users WHERE reason = 'admin_privilege'")
+        logger.info("Таблица blocked_users обновлена: добавлены категории и сроки банов.")
 
-async def get_application_by_user_id(user_id: int) -> tuple | None:
-    """
-    Получает заявку пользователя по его Telegram user_id.
+    @staticmethod
+    async def _create_ban_events_schema(db: aiosqlite.Connection):
+        """
+        Журнал изменений blocked_users. Его заполняют триггеры, поэтому в журнал
+        попадают и изменения из других процессов бота, и правки таблицы вручную.
+        Каждый процесс читает журнал после последнего примененного id и
+        применяет изменения к своему индексу банов, не перечитывая весь бан-лист.
+        """
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS ban_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                category TEXT,
+                expires_at REAL,
+                created_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+            );
+        """)
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_ban_events_created ON ban_events (created_at);")
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS ban_events_insert
+            AFTER INSERT ON blocked_users
+            BEGIN
+                INSERT INTO ban_events (user_id, action, category, expires_at)
+                VALUES (NEW.user_id, 'ban', NEW.category, NEW.expires_at);
+            END;
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS ban_events_update
+            AFTER UPDATE ON blocked_users
+            BEGIN
+                INSERT INTO ban_events (user_id, action, category, expires_at)
+                VALUES (NEW.user_id, 'ban', NEW.category, NEW.expires_at);
+            END;
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS ban_events_delete
+            AFTER DELETE ON blocked_users
+            BEGIN
+                INSERT INTO ban_events (user_id, action) VALUES (OLD.user_id, 'unban');
+            END;
+        """)
 
-    Args:
-        user_id: Уникальный идентификатор пользователя в Telegram.
+    @staticmethod
+    async def _create_search_schema(db: aiosqlite.Connection, backfill: bool):
+        """
+        Полнотекстовый индекс FTS5 по заявкам (applications_fts) для команды /find.
+        Таблица external content: тексты хранятся только в applications, а индекс
+        поддерживают триггеры, срабатывающие лишь при изменении индексируемых полей.
+        """
+        await db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS applications_fts USING fts5(
+                full_name, username, phone, citizenship, region_name, address,
+                content='applications', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS applications_fts_insert
+            AFTER INSERT ON applications
+            BEGIN
+                INSERT INTO applications_fts (rowid, full_name, username, phone, citizenship, region_name, address)
+                VALUES (NEW.id, NEW.full_name, NEW.username, NEW.phone, NEW.citizenship, NEW.region_name, NEW.address);
+            END;
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS applications_fts_update
+            AFTER UPDATE OF full_name, username, phone, citizenship, region_name, address ON applications
+            BEGIN
+                INSERT INTO applications_fts (applications_fts, rowid, full_name, username, phone, citizenship, region_name, address)
+                VALUES ('delete', OLD.id, OLD.full_name, OLD.username, OLD.phone, OLD.citizenship, OLD.region_name, OLD.address);
+                INSERT INTO applications_fts (rowid, full_name, username, phone, citizenship, region_name, address)
+                VALUES (NEW.id, NEW.full_name, NEW.username, NEW.phone, NEW.citizenship, NEW.region_name, NEW.address);
+            END;
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS applications_fts_delete
+            AFTER DELETE ON applications
+            BEGIN
+                INSERT INTO applications_fts (applications_fts, rowid, full_name, username, phone, citizenship, region_name, address)
+                VALUES ('delete', OLD.id, OLD.full_name, OLD.username, OLD.phone, OLD.citizenship, OLD.region_name, OLD.address);
+            END;
+        """)
+        if backfill:
+            await db.execute("INSERT INTO applications_fts (applications_fts) VALUES ('rebuild')")
+            logger.info("Полнотекстовый индекс заявок (applications_fts) построен по существующим данным.")
 
-    Returns:
-        Кортеж с данными заявки, если она найдена, иначе None.
-    """
-    try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            async with db.execute(
-                "SELECT id, user_id, username, full_name, age, citizenship, region_name, address, phone, status FROM applications WHERE user_id = ?",
-                (user_id,)
-            ) as cursor:
-                application = await cursor.fetchone()
-                if application:
-                    logger.info(f"Найдена заявка (id: {application[0]}) для пользователя {user_id}.")
-                else:
-                    logger.info(f"Заявка для пользователя {user_id} не найдена в БД.")
-                return application
-    except aiosqlite.Error as e:
-        logger.error(f"Ошибка при поиске заявки для user_id {user_id}: {e}", exc_info=True)
-        return None
+    @staticmethod
+    async def _create_version_schema(db: aiosqlite.Connection):
+        """
+        Версия данных заявок (data_versions, строка 'applications'). Триггеры
+        увеличивают ее при любом изменении applications и blocked_users,
+        в том числе из других процессов бота и вручную, поэтому по ней кэши
+        поверх этих таблиц узнают, что закэшированное устарело.
+        """
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        await db.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('applications', 0)")
+        for table in ("applications", "blocked_users"):
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                await db.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS data_version_{table}_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE data_versions SET version = version + 1 WHERE name = 'applications';
+                    END;
+                """)
 
+    @staticmethod
+    async def _create_stats_schema(db: aiosqlite.Connection, backfill: bool):
+        """
+        Таблица application_stats хранит количество заявок по каждому статусу.
+        Ее поддерживают триггеры на applications, поэтому подсчет заявок
+        не требует COUNT(*) по всей таблице.
+        """
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS application_stats (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS application_stats_insert
+            AFTER INSERT ON applications
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO application_stats (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END;
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS application_stats_update
+            AFTER UPDATE OF status ON applications
+            FOR EACH ROW WHEN OLD.status IS NOT NEW.status
+            BEGIN
+                UPDATE application_stats SET count = count - 1 WHERE status = OLD.status;
+                INSERT INTO application_stats (status, count) VALUES (NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END;
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS application_stats_delete
+            AFTER DELETE ON applications
+            FOR EACH ROW
+            BEGIN
+                UPDATE application_stats SET count = count - 1 WHERE status = OLD.status;
+            END;
+        """)
+        if backfill:
+            # Таблица только что создана - заполняем ее по уже существующим заявкам
+            await db.execute(
+                "INSERT INTO application_stats (status, count) "
+                "SELECT status, COUNT(*) FROM applications WHERE status IS NOT NULL GROUP BY status"
+            )
+            logger.info("Счетчики заявок по статусам (application_stats) заполнены по существующим данным.")
 
-async def add_or_update_application(
-    user_id: int,
-    username: str | None,
-    full_name: str,
-    user_data: dict,
-    existing_app_id: int | None = None
-):
-    """
-    Добавляет новую заявку или обновляет существующую в базе данных.
-
-    Args:
-        user_id: Уникальный идентификатор пользователя в Telegram.
-        username: Имя пользователя в Telegram.
-        full_name: Полное имя пользователя.
-        user_data: Словарь с дополнительными данными заявки (age, citizenship и т.д.).
-        existing_app_id: ID существующей заявки для обновления. Если None, создается новая.
-    """
-    try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+    @_measured
+    async def get_status_counts(self) -> dict[str, int]:
+        """
+        Возвращает количество заявок по статусам из таблицы application_stats.
+
+        Returns:
+            Словарь {статус: количество}; статусы без заявок не включаются.
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT status, count FROM application_stats WHERE count > 0") as cursor:
+                    return {status: count for status, count in await cursor.fetchall()}
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении счетчиков заявок: %s", e, exc_info=True)
+            return {}
+
+    @_measured
+    async def get_applications_version(self) -> int | None:
+        """
+        Текущая версия данных заявок и банов (см. _create_version_schema).
+        Входит в ключ кэша страниц списка заявок и сверяется с кэшами заявок
+        (sync_application_caches); None при ошибке чтения.
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT version FROM data_versions WHERE name = 'applications'") as cursor:
+                    row = await cursor.fetchone()
+                    return row[0] if row else None
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при чтении версии данных заявок: %s", e, exc_info=True)
+            return None
+
+    @_measured
+    async def get_application_by_user_id(self, user_id: int) -> tuple | None:
+        """
+        Получает заявку пользователя по его Telegram user_id.
+
+        Args:
+            user_id: Уникальный идентификатор пользователя в Telegram.
+
+        Returns:
+            Кортеж с данными заявки, если она найдена, иначе None.
+            Повторные запросы в течение APPLICATION_CACHE_TTL отдаются из кэша.
+        """
+        application = self.applications_by_user.get(user_id)
+        if application is not _MISSING:
+            return application
+        generation = self.applications_by_user.generation
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    "SELECT id, user_id, username, full_name, age, citizenship, region_name, address, phone, status FROM applications WHERE user_id = ?",
+                    (user_id,)
+                ) as cursor:
+                    application = await cursor.fetchone()
+                    if application:
+                        logger.info("Найдена заявка (id: %s) для пользователя %s.", application[0], user_id)
+                    else:
+                        logger.info("Заявка для пользователя %s не найдена в БД.", user_id)
+                    self.applications_by_user.put(user_id, application, generation)
+                    return application
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при поиске заявки для user_id %s: %s", user_id, e, exc_info=True)
+            return None
+
+    @_measured
+    async def add_or_update_application(
+        self,
+        user_id: int,
+        username: str | None,
+        full_name: str,
+        user_data: dict,
+        existing_app_id: int | None = None
+    ):
+        """
+        Добавляет новую заявку или обновляет существующую в базе данных.
+
+        Args:
+            user_id: Уникальный идентификатор пользователя в Telegram.
+            username: Имя пользователя в Telegram.
+            full_name: Полное имя пользователя.
+            user_data: Словарь с дополнительными данными заявки (age, citizenship и т.д.).
+            existing_app_id: ID существующей заявки для обновления. Если None, создается новая.
+        """
+        async def op(db: aiosqlite.Connection) -> int:
             if existing_app_id:
                 set_clauses = []
                 values = []
-                
+
                 fields_to_update = ['age', 'citizenship', 'region_name', 'address', 'phone']
-                
+
                 if username is not None and username != user_data.get('db_username'):
                     set_clauses.append("username = ?")
                     values.append(username)
@@ -111,19 +787,21 @@ async def add_or_update_application(
                     if field in user_data:
                         set_clauses.append(f"{field} = ?")
                         values.append(user_data.get(field))
-                
+
                 if set_clauses:
                     set_query_part = ", ".join(set_clauses)
                     values.append(existing_app_id)
-                    
+
                     query = f"UPDATE applications SET {set_query_part}, status = 'updated' WHERE id = ?"
                     await db.execute(query, tuple(values))
-                    logger.info(f"Заявка #{existing_app_id} для пользователя {user_id} обновлена в БД.")
+                    logger.info("Заявка #%s для пользователя %s обновлена в БД.", existing_app_id, user_id)
                 else:
-                    logger.info(f"Нет данных для обновления заявки #{existing_app_id}.")
+                    logger.info("Нет данных для обновления заявки #%s.", existing_app_id)
+
+                return existing_app_id
 
             else:
-                await db.execute(
+                async with db.execute(
                     """
                     INSERT INTO applications (user_id, username, full_name, age, citizenship, region_name, address, phone, status)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'new')
@@ -131,141 +809,918 @@ async def add_or_update_application(
                         username = excluded.username, full_name = excluded.full_name, age = excluded.age,
                         citizenship = excluded.citizenship, region_name = excluded.region_name, address = excluded.address,
                         phone = excluded.phone, status = 'updated_conflict', updated_at = CURRENT_TIMESTAMP
+                    RETURNING id
                     """,
                     (
                         user_id, username, full_name, user_data.get('age'), user_data.get('citizenship'),
                         user_data.get('region_name'), user_data.get('address'), user_data.get('phone')
                     )
-                )
-                logger.info(f"Новая заявка от пользователя {user_id} добавлена/обновлена в БД.")
-            await db.commit()
-    except aiosqlite.Error as e:
-        logger.error(f"Ошибка при добавлении/обновлении заявки для user_id {user_id}: {e}", exc_info=True)
+                ) as cursor:
+                    app_id = (await cursor.fetchone())[0]
+                logger.info("Новая заявка от пользователя %s добавлена/обновлена в БД.", user_id)
+                return app_id
 
+        app_id = existing_app_id
+        try:
+            app_id = await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при добавлении/обновлении заявки для user_id %s: %s", user_id, e, exc_info=True)
+        finally:
+            self._forget_applications([user_id], [app_id] if app_id else [])
 
-async def get_applications_paginated(
-    page: int = 1,
-    per_page: int = 3,
-    status_filter: list[str] | None = None
-) -> tuple[list[tuple], int, int]:
-    """
-    Получает заявки из базы данных с поддержкой пагинации и фильтрации по статусу.
+    @_measured
+    async def get_applications_paginated(
+        self,
+        page: int = 1,
+        per_page: int = 3,
+        status_filter: list[str] | None = None,
+        cursor: "PageCursor | None" = None,
+        region_name: str | None = None,
+        updated_since: str | None = None
+    ) -> tuple[list[tuple], int, int]:
+        """
+        Получает заявки из базы данных с поддержкой пагинации и фильтрации
+        по статусу, области и дате последнего изменения.
 
-    Returns:
-        Кортеж (список заявок, общее кол-во страниц, общее кол-во заявок).
-    """
-    if status_filter is None:
-        status_filter = ['new', 'updated', 'updated_conflict']
-    
-    logger.info(f"Запрос заявок: страница {page}, {per_page}/страница, статусы: {status_filter}")
+        Без курсора страница выбирается через OFFSET. С курсором используется
+        keyset-пагинация: для каждого статуса берется не более per_page строк
+        по индексу (status, updated_at, id) или, при отборе по области,
+        (region_name, status, updated_at, id) сразу после/перед курсором, так что
+        стоимость перелистывания не зависит от номера страницы.
 
-    offset = (page - 1) * per_page
-    
-    try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            placeholders = ','.join('?' for _ in status_filter)
-            count_query = f"SELECT COUNT(*) FROM applications WHERE status IN ({placeholders})"
-            
-            async with db.execute(count_query, tuple(status_filter)) as cursor:
-                total_items_tuple = await cursor.fetchone()
-                total_items = total_items_tuple[0] if total_items_tuple else 0
-
-            if total_items == 0:
-                logger.info("Не найдено заявок, соответствующих фильтру.")
-                return [], 0, 0
-
-            total_pages = ceil(total_items / per_page)
-
-            query = f"""
-                SELECT id, user_id, username, full_name, age, citizenship,
-                       region_name, address, phone, status, created_at, updated_at
-                FROM applications WHERE status IN ({placeholders})
-                ORDER BY updated_at DESC LIMIT ? OFFSET ?
-            """
-            params = tuple(status_filter) + (per_page, offset)
-            
-            async with db.execute(query, params) as cursor:
-                applications_on_page = await cursor.fetchall()
-                logger.info(f"Найдено {len(applications_on_page)} заявок на странице {page} (всего: {total_items}).")
+        Args:
+            page: Номер страницы (при keyset-пагинации используется только для отображения).
+            per_page: Количество заявок на странице.
+            status_filter: Список статусов для отбора.
+            cursor: Позиция соседней страницы, с которой продолжить выборку.
+            region_name: Отбор по области (None - все области).
+            updated_since: Нижняя граница updated_at ('YYYY-MM-DD HH:MM:SS', UTC) или None.
+
+        Returns:
+            Кортеж (список заявок, общее кол-во страниц, общее кол-во заявок).
+        """
+        if status_filter is None:
+            status_filter = ['new', 'updated', 'updated_conflict']
+
+        logger.info("Запрос заявок: страница %s, %s/страница, статусы: %s, курсор: %s", page, per_page, status_filter, cursor)
+
+        try:
+            async with self._read() as db:
+                placeholders = ','.join('?' for _ in status_filter)
+                extra_sql, extra_params = self._list_conditions(region_name, updated_since)
+                if extra_sql:
+                    # Подсчет по диапазонам индекса (region_name, status, updated_at) или (status, updated_at)
+                    count_query = f"SELECT COUNT(*) FROM applications WHERE status IN ({placeholders}){extra_sql}"
+                else:
+                    # Счетчики поддерживаются триггерами, так что это чтение нескольких строк, а не COUNT(*)
+                    count_query = f"SELECT COALESCE(SUM(count), 0) FROM application_stats WHERE status IN ({placeholders})"
+
+                async with db.execute(count_query, tuple(status_filter) + extra_params) as cursor_db:
+                    total_items_tuple = await cursor_db.fetchone()
+                    total_items = total_items_tuple[0] if total_items_tuple else 0
+
+                if total_items == 0:
+                    logger.info("Не найдено заявок, соответствующих фильтру.")
+                    return [], 0, 0
+
+                total_pages = ceil(total_items / per_page)
+
+                if cursor is not None:
+                    query, params = self._keyset_page_query(status_filter, per_page, cursor, extra_sql, extra_params)
+                else:
+                    query = f"""
+                        SELECT {_APPLICATION_COLUMNS}
+                        FROM applications WHERE status IN ({placeholders}){extra_sql}
+                        ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?
+                    """
+                    params = tuple(status_filter) + extra_params + (per_page, (page - 1) * per_page)
+
+                async with db.execute(query, params) as cursor_db:
+                    applications_on_page = list(await cursor_db.fetchall())
+                if cursor is not None and cursor.backward:
+                    applications_on_page.reverse()
+                logger.info("Найдено %s заявок на странице %s (всего: %s).", len(applications_on_page), page, total_items)
                 return applications_on_page, total_pages, total_items
-    except aiosqlite.Error as e:
-        logger.error(f"Ошибка при получении пагинированных заявок: {e}", exc_info=True)
-        return [], 0, 0
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении пагинированных заявок: %s", e, exc_info=True)
+            return [], 0, 0
 
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        """
+        Превращает ввод администратора в запрос FTS5: каждое слово ищется
+        по префиксу, все слова должны встретиться. Телефон, введенный с 8,
+        ищется в виде с 7 (так же, как он хранится после '+').
+        """
+        terms = []
+        for word in re.findall(r"\w+", text.lower()):
+            if len(word) == 11 and word.isdigit() and word.startswith("8"):
+                word = "7" + word[1:]
+            terms.append(f'"{word}"*')
+        return " ".join(terms)
 
-async def get_application_by_id(app_id: int) -> tuple | None:
-    """
-    Получает одну заявку из базы данных по ее уникальному ID.
+    @_measured
+    async def search_applications(self, text: str, page: int = 1, per_page: int = 5) -> tuple[list[tuple], int, int]:
+        """
+        Полнотекстовый поиск заявок по ФИО, username, телефону, гражданству, области и адресу.
+        Результаты упорядочены по релевантности (bm25, совпадения в ФИО и телефоне весят больше).
+        Подсчет совпадений ограничен SEARCH_COUNT_LIMIT, чтобы широкий запрос не перебирал весь индекс.
 
-    Args:
-        app_id: Первичный ключ (ID) заявки в таблице.
+        Returns:
+            Кортеж (заявки страницы, общее кол-во страниц, кол-во найденных заявок).
+        """
+        match = self._fts_query(text)
+        if not match:
+            return [], 0, 0
+        columns = ", ".join(f"a.{column.strip()}" for column in _APPLICATION_COLUMNS.split(","))
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    "SELECT COUNT(*) FROM (SELECT 1 FROM applications_fts WHERE applications_fts MATCH ? LIMIT ?)",
+                    (match, SEARCH_COUNT_LIMIT)
+                ) as cursor:
+                    total_items = (await cursor.fetchone())[0]
+                if total_items == 0:
+                    return [], 0, 0
+                total_pages = ceil(total_items / per_page)
+                page = min(max(page, 1), total_pages)
+                async with db.execute(
+                    f"""
+                    SELECT {columns}
+                    FROM applications_fts JOIN applications a ON a.id = applications_fts.rowid
+                    WHERE applications_fts MATCH ?
+                    ORDER BY bm25(applications_fts, 10.0, 5.0, 10.0, 1.0, 1.0, 2.0)
+                    LIMIT ? OFFSET ?
+                    """,
+                    (match, per_page, (page - 1) * per_page)
+                ) as cursor:
+                    rows = list(await cursor.fetchall())
+                logger.info("Поиск заявок по '%s': найдено %s, страница %s.", text, total_items, page)
+                return rows, total_pages, total_items
+        except aiosqlite.Error as e:
+            logger.error("Ошибка полнотекстового поиска заявок по '%s': %s", text, e, exc_info=True)
+            return [], 0, 0
 
-    Returns:
-        Кортеж с данными заявки, если она найдена, иначе None.
-    """
-    try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+    @staticmethod
+    def _list_conditions(region_name: str | None, updated_since: str | None) -> tuple[str, tuple]:
+        """Дополнительные условия WHERE списка заявок (начинаются с ' AND ') и их параметры."""
+        sql, params = "", ()
+        if region_name is not None:
+            sql += " AND region_name = ?"
+            params += (region_name,)
+        if updated_since is not None:
+            sql += " AND updated_at >= ?"
+            params += (updated_since,)
+        return sql, params
+
+    @staticmethod
+    def _keyset_page_query(
+        status_filter: list[str], per_page: int, cursor: "PageCursor", extra_sql: str = "", extra_params: tuple = ()
+    ) -> tuple[str, tuple]:
+        """
+        Строит keyset-запрос: по подзапросу на каждый статус (поиск по индексу
+        с LIMIT), объединенных через UNION ALL и отсортированных снаружи.
+        При движении назад порядок возрастающий, результат нужно развернуть.
+        """
+        op, order = (">", "ASC") if cursor.backward else ("<", "DESC")
+        subquery = (
+            f"SELECT * FROM (SELECT {_APPLICATION_COLUMNS} FROM applications "
+            f"WHERE status = ? AND (updated_at, id) {op} (?, ?){extra_sql} "
+            f"ORDER BY updated_at {order}, id {order} LIMIT ?)"
+        )
+        query = (
+            "SELECT * FROM (" + " UNION ALL ".join(subquery for _ in status_filter) + ") "
+            f"ORDER BY updated_at {order}, id {order} LIMIT ?"
+        )
+        params: list = []
+        for status in status_filter:
+            params.extend((status, cursor.updated_at, cursor.app_id, *extra_params, per_page))
+        params.append(per_page)
+        return query, tuple(params)
+
+    @_measured
+    async def get_application_by_id(self, app_id: int) -> tuple | None:
+        """
+        Получает одну заявку из базы данных по ее уникальному ID.
+
+        Args:
+            app_id: Первичный ключ (ID) заявки в таблице.
+
+        Returns:
+            Кортеж с данными заявки, если она найдена, иначе None.
+            Повторные запросы в течение APPLICATION_CACHE_TTL отдаются из кэша.
+        """
+        application = self.applications_by_id.get(app_id)
+        if application is not _MISSING:
+            return application
+        generation = self.applications_by_id.generation
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    f"SELECT {_APPLICATION_COLUMNS} FROM applications WHERE id = ?",
+                    (app_id,)
+                ) as cursor:
+                    application = await cursor.fetchone()
+                    if application:
+                        logger.info("Найдена заявка по app_id: %s.", app_id)
+                    else:
+                        logger.warning("Заявка с app_id: %s не найдена.", app_id)
+                    self.applications_by_id.put(app_id, application, generation)
+                    return application
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при поиске заявки по app_id %s: %s", app_id, e, exc_info=True)
+            return None
+
+    @_measured
+    async def update_application_status(self, app_id: int, new_status: str, admin_id: int | None = None):
+        """
+        Обновляет статус указанной заявки.
+
+        Args:
+            app_id: ID заявки, статус которой нужно обновить.
+            new_status: Новый статус для заявки (например, 'approved', 'rejected').
+            admin_id: ID администратора, выполняющего действие (для логирования).
+        """
+        async def op(db: aiosqlite.Connection) -> int | None:
             async with db.execute(
-                "SELECT id, user_id, username, full_name, age, citizenship, region_name, address, phone, status, created_at, updated_at FROM applications WHERE id = ?",
-                (app_id,)
+                "UPDATE applications SET status = ? WHERE id = ? RETURNING user_id", (new_status, app_id)
             ) as cursor:
-                application = await cursor.fetchone()
-                if application:
-                    logger.info(f"Найдена заявка по app_id: {app_id}.")
-                else:
-                    logger.warning(f"Заявка с app_id: {app_id} не найдена.")
-                return application
-    except aiosqlite.Error as e:
-        logger.error(f"Ошибка при поиске заявки по app_id {app_id}: {e}", exc_info=True)
-        return None
+                row = await cursor.fetchone()
+            return row[0] if row else None
 
+        user_id = None
+        try:
+            user_id = await self._submit_write(op)
+            logger.info("Статус заявки #%s обновлен на '%s' администратором %s.", app_id, new_status, admin_id or 'N/A')
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при обновлении статуса заявки #%s на '%s': %s", app_id, new_status, e, exc_info=True)
+        finally:
+            # user_id из RETURNING сбрасывает запись заявки по user_id, даже если ее нет в кэше по ID
+            self._forget_applications([user_id] if user_id is not None else [], [app_id])
 
-async def update_application_status(app_id: int, new_status: str, admin_id: int | None = None):
-    """
-    Обновляет статус указанной заявки.
+    @_measured
+    async def get_application_ids(
+        self,
+        status_filter: list[str],
+        region_name: str | None = None,
+        updated_since: str | None = None,
+        limit: int = BULK_MAX_SELECTION
+    ) -> list[int]:
+        """ID заявок, подходящих под фильтр списка (в порядке списка, не больше limit)."""
+        placeholders = ','.join('?' for _ in status_filter)
+        extra_sql, extra_params = self._list_conditions(region_name, updated_since)
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    f"SELECT id FROM applications WHERE status IN ({placeholders}){extra_sql} "
+                    "ORDER BY updated_at DESC, id DESC LIMIT ?",
+                    tuple(status_filter) + extra_params + (limit,)
+                ) as cursor:
+                    return [row[0] for row in await cursor.fetchall()]
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при выборке ID заявок по фильтру: %s", e, exc_info=True)
+            return []
 
-    Args:
-        app_id: ID заявки, статус которой нужно обновить.
-        new_status: Новый статус для заявки (например, 'approved', 'rejected').
-        admin_id: ID администратора, выполняющего действие (для логирования).
-    """
-    try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            await db.execute("UPDATE applications SET status = ? WHERE id = ?", (new_status, app_id))
-            await db.commit()
-        logger.info(f"Статус заявки #{app_id} обновлен на '{new_status}' администратором {admin_id or 'N/A'}.")
-    except aiosqlite.Error as e:
-        logger.error(f"Ошибка при обновлении статуса заявки #{app_id} на '{new_status}': {e}", exc_info=True)
+    @_measured
+    async def bulk_update_applications(
+        self,
+        app_ids: list[int],
+        new_status: str | None = None,
+        admin_id: int | None = None,
+        ban: tuple[str, str, float | None] | None = None,
+        ban_exempt: Collection[int] = ()
+    ) -> tuple[list[tuple[int, int]], list[int]]:
+        """
+        Меняет статус нескольких заявок и/или банит их авторов в одной транзакции
+        (по одному executemany на таблицу).
 
+        Args:
+            app_ids: ID заявок.
+            new_status: Новый статус или None, если статус менять не нужно.
+                Заявки, у которых статус уже такой, пропускаются.
+            admin_id: ID администратора, выполняющего действие.
+            ban: (причина, категория, срок окончания) - забанить авторов заявок.
+                Пользователи с действующим баном и из ban_exempt пропускаются.
+            ban_exempt: ID пользователей, которых банить нельзя (администраторы).
 
-async def add_to_banlist(user_id: int, reason: str):
-    """
-    Добавляет пользователя в список заблокированных (бан-лист).
+        Returns:
+            Кортеж (список (app_id, user_id) обработанных заявок, ID забаненных пользователей).
+            При ошибке - два пустых списка.
+        """
+        if not app_ids:
+            return [], []
 
-    Args:
-        user_id: ID пользователя, которого нужно заблокировать.
-        reason: Причина блокировки.
-    """
-    try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            await db.execute("INSERT INTO blocked_users (user_id, reason) VALUES (?, ?)", (user_id, reason))
-            await db.commit()
-        logger.info(f"Пользователь {user_id} добавлен в бан-лист. Причина: {reason}")
-    except aiosqlite.Error as e:
-        logger.error(f"Ошибка при добавлении пользователя {user_id} в бан-лист: {e}", exc_info=True)
+        async def op(db: aiosqlite.Connection) -> tuple[list[tuple[int, int]], list[int]]:
+            placeholders = ','.join('?' for _ in app_ids)
+            query = f"SELECT id, user_id FROM applications WHERE id IN ({placeholders})"
+            params = tuple(app_ids)
+            if new_status is not None:
+                query += " AND status != ?"
+                params += (new_status,)
+            async with db.execute(query, params) as cursor:
+                rows = [tuple(row) for row in await cursor.fetchall()]
+            if new_status is not None and rows:
+                await db.executemany(
+                    "UPDATE applications SET status = ? WHERE id = ?", [(new_status, app_id) for app_id, _ in rows]
+                )
 
+            banned: list[int] = []
+            if ban is not None and rows:
+                now = time.time()
+                user_ids = list(dict.fromkeys(user_id for _, user_id in rows))
+                async with db.execute(
+                    f"SELECT user_id FROM blocked_users WHERE user_id IN ({','.join('?' for _ in user_ids)}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    tuple(user_ids) + (now,)
+                ) as cursor:
+                    skip = {row[0] for row in await cursor.fetchall()} | set(ban_exempt)
+                banned = [user_id for user_id in user_ids if user_id not in skip]
+                reason, category, expires_at = ban
+                await db.executemany(
+                    """
+                    INSERT INTO blocked_users (user_id, reason, category, banned_at, expires_at, banned_by)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        reason = excluded.reason, category = excluded.category, banned_at = excluded.banned_at,
+                        expires_at = excluded.expires_at, banned_by = excluded.banned_by
+                    """,
+                    [(user_id, reason, category, now, expires_at, admin_id) for user_id in banned]
+                )
+            return rows, banned
 
-async def get_banlist() -> set[int]:
-    """
-    Получает множество ID всех заблокированных пользователей.
+        try:
+            rows, banned = await self._submit_write(op)
+            logger.info(
+                "Массовое действие администратора %s: заявок %s из %s, статус '%s', забанено пользователей %s.",
+                admin_id or 'N/A', len(rows), len(app_ids), new_status or '-', len(banned)
+            )
+            self._forget_applications([user_id for _, user_id in rows], app_ids)
+            return rows, banned
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при массовом обновлении %s заявок: %s", len(app_ids), e, exc_info=True)
+            self._forget_applications(app_ids=app_ids)
+            return [], []
+
+    @_measured
+    async def add_to_banlist(
+        self,
+        user_id: int,
+        reason: str,
+        category: str = 'manual',
+        expires_at: float | None = None,
+        banned_by: int | None = None
+    ) -> bool:
+        """
+        Добавляет пользователя в список заблокированных (бан-лист).
+        Истекший бан того же пользователя перезаписывается.
+
+        Args:
+            user_id: ID пользователя, которого нужно заблокировать.
+            reason: Причина блокировки.
+            category: Категория бана ('manual', 'completed').
+            expires_at: Время окончания бана (unix time) или None для бессрочного.
+            banned_by: ID администратора, выдавшего бан.
+
+        Returns:
+            True, если запись сохранена.
+        """
+        async def op(db: aiosqlite.Connection):
+            await db.execute(
+                """
+                INSERT INTO blocked_users (user_id, reason, category, banned_at, expires_at, banned_by)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    reason = excluded.reason, category = excluded.category, banned_at = excluded.banned_at,
+                    expires_at = excluded.expires_at, banned_by = excluded.banned_by
+                """,
+                (user_id, reason, category, time.time(), expires_at, banned_by)
+            )
+
+        try:
+            await self._submit_write(op)
+            logger.info("Пользователь %s добавлен в бан-лист (%s). Причина: %s", user_id, category, reason)
+            return True
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при добавлении пользователя %s в бан-лист: %s", user_id, e, exc_info=True)
+            return False
+        finally:
+            self._forget_applications([user_id])
+
+    @_measured
+    async def remove_from_banlist(self, user_id: int) -> bool:
+        """Удаляет пользователя из бан-листа. Возвращает True, если запись была."""
+        async def op(db: aiosqlite.Connection) -> bool:
+            cursor = await db.execute("DELETE FROM blocked_users WHERE user_id = ?", (user_id,))
+            return cursor.rowcount > 0
+
+        try:
+            removed = await self._submit_write(op)
+            if removed:
+                logger.info("Пользователь %s удален из бан-листа.", user_id)
+            return removed
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при удалении пользователя %s из бан-листа: %s", user_id, e, exc_info=True)
+            return False
+        finally:
+            self._forget_applications([user_id])
+
+    @_measured
+    async def get_banlist(self, now: float) -> list[tuple[int, str, float | None]]:
+        """
+        Получает действующие (не истекшие к моменту now) баны.
+
+        Returns:
+            Список кортежей (user_id, category, expires_at).
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    "SELECT user_id, category, expires_at FROM blocked_users WHERE expires_at IS NULL OR expires_at > ?",
+                    (now,)
+                ) as cursor:
+                    return list(await cursor.fetchall())
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении бан-листа: %s", e, exc_info=True)
+            return []
+
+    @_measured
+    async def get_last_ban_event_id(self) -> int:
+        """Id последней записи журнала ban_events (0, если журнал пуст)."""
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ban_events'") as cursor:
+                    row = await cursor.fetchone()
+                    return row[0] if row else 0
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении позиции журнала банов: %s", e, exc_info=True)
+            return 0
+
+    @_measured
+    async def get_ban_events(self, after_id: int, limit: int) -> list[tuple[int, int, str, str | None, float | None]]:
+        """
+        Записи журнала ban_events после after_id по возрастанию id.
+
+        Returns:
+            Список кортежей (id, user_id, action, category, expires_at), action - 'ban' или 'unban'.
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    "SELECT id, user_id, action, category, expires_at FROM ban_events WHERE id > ? ORDER BY id LIMIT ?",
+                    (after_id, limit)
+                ) as cursor:
+                    return list(await cursor.fetchall())
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при чтении журнала банов: %s", e, exc_info=True)
+            return []
+
+    @_measured
+    async def delete_old_ban_events(self, older_than: float) -> int:
+        """Удаляет записи журнала банов старше older_than (unix time). Возвращает количество удаленных."""
+        async def op(db: aiosqlite.Connection) -> int:
+            cursor = await db.execute("DELETE FROM ban_events WHERE created_at < ?", (older_than,))
+            return cursor.rowcount
+
+        try:
+            return await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при очистке журнала банов: %s", e, exc_info=True)
+            return 0
+
+    @_measured
+    async def get_fsm_record(self, key: str) -> tuple[str | None, str | None, float] | None:
+        """
+        Получает сохраненную сессию FSM.
+
+        Returns:
+            Кортеж (state, data в JSON, updated_at) или None, если сессии нет.
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT state, data, updated_at FROM fsm_storage WHERE key = ?", (key,)) as cursor:
+                    return await cursor.fetchone()
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при чтении сессии FSM %s: %s", key, e, exc_info=True)
+            return None
+
+    @_measured
+    async def save_fsm_records(self, upserts: list[tuple[str, str | None, str, float]], deletes: list[str]):
+        """
+        Сохраняет пачку сессий FSM одной операцией записи.
 
-    Returns:
-        Множество (set) с уникальными идентификаторами (user_id) заблокированных пользователей.
+        Args:
+            upserts: Список (key, state, data в JSON, updated_at) для вставки/обновления.
+            deletes: Ключи пустых сессий, которые нужно удалить.
+        """
+        async def op(db: aiosqlite.Connection):
+            if upserts:
+                await db.executemany(
+                    """
+                    INSERT INTO fsm_storage (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+                    """,
+                    upserts
+                )
+            if deletes:
+                await db.executemany("DELETE FROM fsm_storage WHERE key = ?", [(key,) for key in deletes])
+
+        await self._submit_write(op)
+
+    @_measured
+    async def delete_expired_fsm_records(self, older_than: float) -> int:
+        """
+        Удаляет сессии FSM, не обновлявшиеся с момента older_than (unix time).
+
+        Returns:
+            Количество удаленных сессий.
+        """
+        async def op(db: aiosqlite.Connection) -> int:
+            cursor = await db.execute("DELETE FROM fsm_storage WHERE updated_at < ?", (older_than,))
+            return cursor.rowcount
+
+        try:
+            return await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при очистке устаревших сессий FSM: %s", e, exc_info=True)
+            return 0
+
+    @_measured
+    async def get_fsm_state_counts(self) -> dict[str | None, int]:
+        """Возвращает количество сохраненных сессий FSM по состояниям."""
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT state, COUNT(*) FROM fsm_storage GROUP BY state") as cursor:
+                    return {state: count for state, count in await cursor.fetchall()}
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при подсчете сессий FSM: %s", e, exc_info=True)
+            return {}
+
+    @_measured
+    async def get_catalog(self) -> tuple[list[tuple[str, str]], list[tuple[int, str, str]]]:
+        """
+        Получает каталог областей и действующих адресов в порядке отображения.
+
+        Returns:
+            Кортеж (список (код, название) областей, список (id, код области, адрес) адресов).
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT code, name FROM catalog_regions ORDER BY position, code") as cursor:
+                    regions = list(await cursor.fetchall())
+                async with db.execute(
+                    "SELECT id, region_code, address FROM catalog_addresses WHERE active = 1 ORDER BY region_code, position, id"
+                ) as cursor:
+                    addresses = list(await cursor.fetchall())
+                return regions, addresses
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при загрузке каталога адресов: %s", e, exc_info=True)
+            return [], []
+
+    @_measured
+    async def seed_catalog(self, regions: list[tuple[str, str, list[str]]]):
+        """
+        Заполняет пустой каталог областями и адресами (код, название, адреса).
+        Если в каталоге уже есть области, ничего не делает.
+        """
+        async def op(db: aiosqlite.Connection):
+            async with db.execute("SELECT 1 FROM catalog_regions LIMIT 1") as cursor:
+                if await cursor.fetchone() is not None:
+                    return
+            await db.executemany(
+                "INSERT INTO catalog_regions (code, name, position) VALUES (?, ?, ?)",
+                [(code, name, position) for position, (code, name, _) in enumerate(regions)]
+            )
+            await db.executemany(
+                "INSERT INTO catalog_addresses (region_code, address, position) VALUES (?, ?, ?)",
+                [
+                    (code, address, position)
+                    for code, _, addresses in regions
+                    for position, address in enumerate(addresses)
+                ]
+            )
+
+        try:
+            await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при заполнении каталога адресов: %s", e, exc_info=True)
+
+    @_measured
+    async def get_media_file_id(self, file_hash: str) -> str | None:
+        """
+        Получает сохраненный Telegram file_id для файла с указанным хэшем содержимого.
+
+        Returns:
+            file_id или None, если файл еще не загружался.
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT file_id FROM media_cache WHERE file_hash = ?", (file_hash,)) as cursor:
+                    row = await cursor.fetchone()
+                    return row[0] if row else None
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении file_id для %s: %s", file_hash, e, exc_info=True)
+            return None
+
+    @_measured
+    async def set_media_file_id(self, file_hash: str, file_id: str | None):
+        """
+        Сохраняет file_id, выданный Telegram для файла. None удаляет запись
+        (например, если Telegram перестал принимать старый file_id).
+        """
+        async def op(db: aiosqlite.Connection):
+            if file_id is None:
+                await db.execute("DELETE FROM media_cache WHERE file_hash = ?", (file_hash,))
+            else:
+                await db.execute(
+                    "INSERT INTO media_cache (file_hash, file_id) VALUES (?, ?) "
+                    "ON CONFLICT(file_hash) DO UPDATE SET file_id = excluded.file_id",
+                    (file_hash, file_id)
+                )
+
+        try:
+            await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при сохранении file_id для %s: %s", file_hash, e, exc_info=True)
+
+    @staticmethod
+    def _audience_condition(region_name: str | None, statuses: list[str] | None) -> tuple[str, tuple]:
+        """Условие WHERE для выбора получателей рассылки среди авторов заявок."""
+        clauses = ["user_id NOT IN (SELECT user_id FROM blocked_users WHERE expires_at IS NULL OR expires_at > ?)"]
+        params: list = [time.time()]
+        if region_name is not None:
+            clauses.append("region_name = ?")
+            params.append(region_name)
+        if statuses:
+            clauses.append(f"status IN ({','.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        return " AND ".join(clauses), tuple(params)
+
+    @_measured
+    async def count_broadcast_audience(self, region_name: str | None, statuses: list[str] | None) -> int:
+        """Считает, сколько пользователей получат рассылку с указанными фильтрами."""
+        condition, params = self._audience_condition(region_name, statuses)
+        try:
+            async with self._read() as db:
+                async with db.execute(f"SELECT COUNT(*) FROM applications WHERE {condition}", params) as cursor:
+                    return (await cursor.fetchone())[0]
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при подсчете получателей рассылки: %s", e, exc_info=True)
+            return 0
+
+    @_measured
+    async def create_broadcast(
+        self, admin_id: int, text: str, region_name: str | None, statuses: list[str] | None
+    ) -> tuple[int, int] | None:
+        """
+        Создает рассылку и фиксирует список ее получателей.
+
+        Args:
+            admin_id: ID администратора, запустившего рассылку (ему придет отчет).
+            text: Текст сообщения.
+            region_name: Отбор по области из заявки (None - все области).
+            statuses: Отбор по статусам заявки (None - все статусы).
+
+        Returns:
+            Кортеж (ID рассылки, количество получателей) или None при ошибке.
+        """
+        condition, params = self._audience_condition(region_name, statuses)
+
+        async def op(db: aiosqlite.Connection) -> tuple[int, int]:
+            cursor = await db.execute("INSERT INTO broadcasts (admin_id, text) VALUES (?, ?)", (admin_id, text))
+            broadcast_id = cursor.lastrowid
+            cursor = await db.execute(
+                f"INSERT INTO broadcast_recipients (broadcast_id, user_id) "
+                f"SELECT ?, user_id FROM applications WHERE {condition}",
+                (broadcast_id,) + params
+            )
+            total = cursor.rowcount
+            await db.execute("UPDATE broadcasts SET total = ? WHERE id = ?", (total, broadcast_id))
+            return broadcast_id, total
+
+        try:
+            broadcast_id, total = await self._submit_write(op)
+            logger.info("Создана рассылка #%s администратором %s: %s получателей.", broadcast_id, admin_id, total)
+            return broadcast_id, total
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при создании рассылки администратором %s: %s", admin_id, e, exc_info=True)
+            return None
+
+    @_measured
+    async def get_broadcast(self, broadcast_id: int) -> tuple | None:
+        """
+        Returns:
+            Кортеж (id, admin_id, text, status, total, sent, failed) или None.
+        """
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    "SELECT id, admin_id, text, status, total, sent, failed FROM broadcasts WHERE id = ?",
+                    (broadcast_id,)
+                ) as cursor:
+                    return await cursor.fetchone()
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении рассылки #%s: %s", broadcast_id, e, exc_info=True)
+            return None
+
+    @_measured
+    async def get_unfinished_broadcast_ids(self) -> list[int]:
+        """Возвращает ID рассылок, прерванных остановкой бота."""
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT id FROM broadcasts WHERE status = 'running' ORDER BY id") as cursor:
+                    return [row[0] for row in await cursor.fetchall()]
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении незавершенных рассылок: %s", e, exc_info=True)
+            return []
+
+    @_measured
+    async def get_pending_broadcast_recipients(self, broadcast_id: int) -> list[int]:
+        """Возвращает ID пользователей, которым рассылка еще не отправлялась."""
+        try:
+            async with self._read() as db:
+                async with db.execute(
+                    "SELECT user_id FROM broadcast_recipients WHERE broadcast_id = ? AND status = 'pending'",
+                    (broadcast_id,)
+                ) as cursor:
+                    return [row[0] for row in await cursor.fetchall()]
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при получении получателей рассылки #%s: %s", broadcast_id, e, exc_info=True)
+            return []
+
+    @_measured
+    async def record_broadcast_results(self, broadcast_id: int, results: list[tuple[int, bool]]):
+        """
+        Сохраняет результаты отправки пачки сообщений рассылки.
+
+        Args:
+            broadcast_id: ID рассылки.
+            results: Список (user_id, доставлено ли сообщение).
+        """
+        sent = sum(1 for _, ok in results if ok)
+
+        async def op(db: aiosqlite.Connection):
+            await db.executemany(
+                "UPDATE broadcast_recipients SET status = ? WHERE broadcast_id = ? AND user_id = ?",
+                [('sent' if ok else 'failed', broadcast_id, user_id) for user_id, ok in results]
+            )
+            await db.execute(
+                "UPDATE broadcasts SET sent = sent + ?, failed = failed + ? WHERE id = ?",
+                (sent, len(results) - sent, broadcast_id)
+            )
+
+        try:
+            await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при сохранении прогресса рассылки #%s: %s", broadcast_id, e, exc_info=True)
+
+    @_measured
+    async def finish_broadcast(self, broadcast_id: int):
+        """Помечает рассылку завершенной."""
+        async def op(db: aiosqlite.Connection):
+            await db.execute(
+                "UPDATE broadcasts SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (broadcast_id,)
+            )
+
+        try:
+            await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при завершении рассылки #%s: %s", broadcast_id, e, exc_info=True)
+
+    @_measured
+    async def enqueue_outbox(self, chat_id: int, text: str, parse_mode: str | None = None) -> int | None:
+        """
+        Ставит исходящее сообщение в очередь outbox для фоновой отправки.
+
+        Returns:
+            ID сообщения в очереди или None при ошибке.
+        """
+        async def op(db: aiosqlite.Connection) -> int:
+            cursor = await db.execute(
+                "INSERT INTO outbox (chat_id, text, parse_mode, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (chat_id, text, parse_mode, time.time())
+            )
+            return cursor.lastrowid
+
+        try:
+            return await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при постановке сообщения для %s в очередь outbox: %s", chat_id, e, exc_info=True)
+            return None
+
+    @_measured
+    async def enqueue_outbox_many(self, messages: list[tuple[int, str]], parse_mode: str | None = None) -> int:
+        """
+        Ставит в очередь outbox несколько сообщений (chat_id, текст) одним executemany.
+
+        Returns:
+            Количество поставленных в очередь сообщений (0 при ошибке).
+        """
+        if not messages:
+            return 0
+
+        async def op(db: aiosqlite.Connection):
+            now = time.time()
+            await db.executemany(
+                "INSERT INTO outbox (chat_id, text, parse_mode, next_attempt_at) VALUES (?, ?, ?, ?)",
+                [(chat_id, text, parse_mode, now) for chat_id, text in messages]
+            )
+
+        try:
+            await self._submit_write(op)
+            return len(messages)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при постановке %s сообщений в очередь outbox: %s", len(messages), e, exc_info=True)
+            return 0
+
+    @_measured
+    async def claim_due_outbox(self, now: float, limit: int, lease: float) -> list[tuple[int, int, str, str | None, int]]:
+        """
+        Забирает в работу сообщения outbox, время отправки которых наступило.
+
+        Забранные сообщения откладываются на lease секунд, поэтому несколько
+        процессов бота не отправят одно сообщение дважды, а сообщения процесса,
+        упавшего посреди отправки, будут отправлены после истечения lease.
+
+        Returns:
+            Список (id, chat_id, text, parse_mode, attempts).
+        """
+        async def op(db: aiosqlite.Connection) -> list:
+            async with db.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id IN ("
+                "    SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?"
+                "    ORDER BY next_attempt_at LIMIT ?"
+                ") RETURNING id, chat_id, text, parse_mode, attempts",
+                (now + lease, now, limit)
+            ) as cursor:
+                return list(await cursor.fetchall())
+
+        try:
+            return await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при чтении очереди outbox: %s", e, exc_info=True)
+            return []
+
+    @_measured
+    async def get_next_outbox_attempt(self) -> float | None:
+        """Возвращает время ближайшей запланированной отправки из outbox (unix time) или None."""
+        try:
+            async with self._read() as db:
+                async with db.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'") as cursor:
+                    return (await cursor.fetchone())[0]
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при чтении очереди outbox: %s", e, exc_info=True)
+            return None
+
+    @_measured
+    async def complete_outbox(
+        self,
+        sent_ids: list[int],
+        retries: list[tuple[int, float, str, bool]],
+        failed: list[tuple[int, str]]
+    ):
+        """
+        Сохраняет результаты одного прохода отправки outbox.
+
+        Args:
+            sent_ids: ID доставленных сообщений (удаляются из очереди).
+            retries: Список (id, время следующей попытки, ошибка, засчитывать ли попытку).
+            failed: Список (id, ошибка) сообщений, которые больше не будут отправляться.
+        """
+        async def op(db: aiosqlite.Connection):
+            if sent_ids:
+                await db.executemany("DELETE FROM outbox WHERE id = ?", [(msg_id,) for msg_id in sent_ids])
+            if retries:
+                await db.executemany(
+                    "UPDATE outbox SET attempts = attempts + ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    [(int(counted), next_at, error, msg_id) for msg_id, next_at, error, counted in retries]
+                )
+            if failed:
+                await db.executemany(
+                    "UPDATE outbox SET attempts = attempts + 1, status = 'failed', last_error = ? WHERE id = ?",
+                    [(error, msg_id) for msg_id, error in failed]
+                )
+
+        try:
+            await self._submit_write(op)
+        except aiosqlite.Error as e:
+            logger.error("Ошибка при сохранении результатов отправки outbox: %s", e, exc_info=True)
+
+
+async def init_db(path: str = DATABASE_FILE) -> Database:
+    """
+    Открывает пул соединений, создает таблицы, если они не существуют,
+    запускает задачу-писателя и возвращает готовый к работе экземпляр Database.
     """
+    db = Database(path)
     try:
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            async with db.execute("SELECT user_id FROM blocked_users") as cursor:
-                return {row[0] for row in await cursor.fetchall()}
+        await db.connect()
+        await db.create_schema()
+        db.start_writer()
+        logger.info("База данных '%s' успешно инициализирована/проверена.", path)
     except aiosqlite.Error as e:
-        logger.error(f"Ошибка при получении бан-листа: {e}", exc_info=True)
-        return set()
\ No newline at end of file
+        logger.error("Ошибка при инициализации базы данных: %s", e, exc_info=True)
+        await db.close()
+        raise
+    return db
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from src.config import FSM_CACHE_SIZE, FSM_FLUSH_INTERVAL, FSM_STATE_TTL, FSM_SWEEP_INTERVAL
+from src.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    """Состояние и данные FSM одного ключа в памяти процесса."""
+    __slots__ = ("state", "data", "touched_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], touched_at: float):
+        self.state = state
+        self.data = data
+        self.touched_at = touched_at
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище FSM в той же базе SQLite, что и заявки.
+
+    - Горячие сессии держатся в LRU-кэше процесса (не более cache_size),
+      так что чтение состояния обычно не обращается к БД.
+    - Изменения (set_state/set_data/update_data) только помечают сессию
+      "грязной"; фоновая задача раз в flush_interval секунд сбрасывает все
+      накопленные изменения одной пачкой через писателя Database.
+    - Сессии, не менявшиеся дольше ttl секунд (брошенные анкеты), удаляются
+      из кэша и из БД периодической очисткой.
+
+    Кэш локален для процесса: при запуске нескольких воркеров обновления
+    одного пользователя должны попадать в один и тот же процесс.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        cache_size: int = FSM_CACHE_SIZE,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        ttl: float = FSM_STATE_TTL,
+        sweep_interval: float = FSM_SWEEP_INTERVAL
+    ):
+        self._db = db
+        self._cache_size = max(1, cache_size)
+        self._flush_interval = flush_interval
+        self._ttl = ttl
+        self._sweep_interval = sweep_interval
+        self._cache: OrderedDict[str, _Session] = OrderedDict()
+        # Вытесненные из LRU, но еще не записанные в БД сессии
+        self._evicted_dirty: dict[str, _Session] = {}
+        self._dirty: set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return (
+            f"{key.bot_id}:{key.business_connection_id or ''}:{key.chat_id}:"
+            f"{key.thread_id or ''}:{key.user_id}:{key.destiny}"
+        )
+
+    def start(self):
+        """Запускает фоновую задачу сброса изменений и очистки устаревших сессий."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._background_loop(), name="fsm-storage-flush")
+
+    async def close(self) -> None:
+        """Останавливает фоновую задачу и записывает оставшиеся изменения."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info("Хранилище FSM остановлено, изменения сохранены в БД.")
+
+    async def _session(self, key: StorageKey) -> tuple[str, _Session]:
+        raw_key = self._key(key)
+        session = self._cache.get(raw_key)
+        if session is not None:
+            self._cache.move_to_end(raw_key)
+            return raw_key, session
+
+        session = self._evicted_dirty.pop(raw_key, None)
+        if session is None:
+            record = await self._db.get_fsm_record(raw_key)
+            # Пока шел запрос, сессию мог загрузить параллельный хендлер
+            session = self._cache.get(raw_key)
+            if session is not None:
+                self._cache.move_to_end(raw_key)
+                return raw_key, session
+            if record is not None:
+                state, data_json, updated_at = record
+                session = _Session(state, json.loads(data_json) if data_json else {}, updated_at)
+            else:
+                session = _Session(None, {}, time.time())
+
+        self._cache[raw_key] = session
+        self._evict_overflow()
+        return raw_key, session
+
+    def _evict_overflow(self):
+        while len(self._cache) > self._cache_size:
+            raw_key, session = self._cache.popitem(last=False)
+            if raw_key in self._dirty:
+                self._evicted_dirty[raw_key] = session
+
+    def _touch(self, raw_key: str, session: _Session):
+        session.touched_at = time.time()
+        self._dirty.add(raw_key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        raw_key, session = await self._session(key)
+        session.state = state.state if isinstance(state, State) else state
+        self._touch(raw_key, session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, session = await self._session(key)
+        return session.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        raw_key, session = await self._session(key)
+        session.data = data.copy()
+        self._touch(raw_key, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, session = await self._session(key)
+        return session.data.copy()
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        raw_key, session = await self._session(key)
+        session.data.update(data)
+        self._touch(raw_key, session)
+        return session.data.copy()
+
+    async def flush(self):
+        """Записывает все накопленные изменения в БД одной пачкой."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            upserts, deletes = [], []
+            for raw_key in dirty:
+                session = self._cache.get(raw_key) or self._evicted_dirty.get(raw_key)
+                if session is None:
+                    continue
+                if session.state is None and not session.data:
+                    deletes.append(raw_key)
+                else:
+                    upserts.append((raw_key, session.state, json.dumps(session.data, ensure_ascii=False), session.touched_at))
+            try:
+                await self._db.save_fsm_records(upserts, deletes)
+            except Exception as e:
+                # Не теряем изменения: вернем ключи в "грязные" до следующей попытки
+                logger.error("Не удалось сохранить %s сессий FSM: %s", len(dirty), e, exc_info=True)
+                self._dirty |= dirty
+                return
+            for raw_key in dirty - self._dirty:
+                self._evicted_dirty.pop(raw_key, None)
+            logger.debug("Сессии FSM сохранены: записано %s, удалено %s.", len(upserts), len(deletes))
+
+    async def sweep_expired(self):
+        """Удаляет сессии, не обновлявшиеся дольше ttl, из кэша и из БД."""
+        expire_before = time.time() - self._ttl
+        stale_keys = [k for k, s in self._cache.items() if s.touched_at < expire_before and k not in self._dirty]
+        for raw_key in stale_keys:
+            del self._cache[raw_key]
+        removed = await self._db.delete_expired_fsm_records(expire_before)
+        if stale_keys or removed:
+            logger.info("Очистка FSM: из кэша удалено %s, из БД %s брошенных сессий.", len(stale_keys), removed)
+
+    async def _background_loop(self):
+        next_sweep = time.monotonic() + self._sweep_interval
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + self._sweep_interval
+                try:
+                    await self.sweep_expired()
+                except Exception as e:
+                    logger.error("Ошибка при очистке устаревших сессий FSM: %s", e, exc_info=True)
+
+
+class FSMStorageCounter:
+    """Счетчики обращений к хранилищу FSM, совершенных через BufferedFSMContext."""
+    __slots__ = ("updates", "reads", "writes", "max_reads_per_update", "max_writes_per_update")
+
+    def __init__(self):
+        self.updates = 0
+        self.reads = 0
+        self.writes = 0
+        self.max_reads_per_update = 0
+        self.max_writes_per_update = 0
+
+    def add(self, reads: int, writes: int):
+        self.updates += 1
+        self.reads += reads
+        self.writes += writes
+        self.max_reads_per_update = max(self.max_reads_per_update, reads)
+        self.max_writes_per_update = max(self.max_writes_per_update, writes)
+
+
+_UNSET = object()
+
+
+class BufferedFSMContext(FSMContext):
+    """
+    FSMContext, живущий в пределах одного апдейта.
+
+    Данные читаются из хранилища не более одного раза (при первом обращении),
+    все изменения копятся в памяти и записываются в flush() после завершения
+    хендлера: не более одной записи состояния и одной записи данных на апдейт.
+    Текущее состояние берется из raw_state, который FSMContextMiddleware уже
+    прочитал, поэтому отдельного чтения состояния не требуется.
+    """
+
+    def __init__(self, storage: BaseStorage, key: StorageKey, raw_state: Any = _UNSET):
+        super().__init__(storage=storage, key=key)
+        self._state = raw_state
+        self._data: Dict[str, Any] | None = None
+        self._state_dirty = False
+        self._data_dirty = False
+        self.reads = 0
+        self.writes = 0
+
+    async def get_state(self) -> Optional[str]:
+        if self._state is _UNSET:
+            self._state = await self.storage.get_state(key=self.key)
+            self.reads += 1
+        return self._state
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_dirty = True
+
+    async def _loaded_data(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+            self.reads += 1
+        return self._data
+
+    async def get_data(self) -> Dict[str, Any]:
+        return (await self._loaded_data()).copy()
+
+    async def get_value(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        return (await self._loaded_data()).get(key, default)
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        self._data = data.copy()
+        self._data_dirty = True
+
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        current = await self._loaded_data()
+        current.update(kwargs)
+        self._data_dirty = True
+        return current.copy()
+
+    async def flush(self):
+        """Записывает накопленные изменения состояния и данных в хранилище."""
+        if self._state_dirty:
+            await self.storage.set_state(key=self.key, state=self._state)
+            self._state_dirty = False
+            self.writes += 1
+        if self._data_dirty:
+            await self.storage.set_data(key=self.key, data=self._data)
+            self._data_dirty = False
+            self.writes += 1
+
+
+__all__ = ['SQLiteStorage', 'BufferedFSMContext', 'FSMStorageCounter']
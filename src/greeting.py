@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, InlineKeyboardMarkup
+
+from src.config import GREETING_PICTURE_PATH
+from src.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class GreetingPhoto:
+    """
+    Приветственная картинка для /start.
+
+    Файл читается с диска один раз при старте. После первой отправки
+    Telegram возвращает file_id, который сохраняется в БД (ключ - хэш
+    содержимого файла), и дальше картинка отправляется по file_id без
+    повторной загрузки. Если Telegram отклонит file_id, картинка будет
+    загружена заново, а file_id обновлен.
+    """
+
+    def __init__(self, db: Database, path: str = GREETING_PICTURE_PATH):
+        self._db = db
+        self._path = path
+        self._content: bytes | None = None
+        self._file_hash: str | None = None
+        self._file_id: str | None = None
+        self._upload_lock = asyncio.Lock()
+
+    async def load(self):
+        """Читает файл (в отдельном потоке) и подтягивает сохраненный file_id."""
+        try:
+            self._content = await asyncio.to_thread(Path(self._path).read_bytes)
+        except OSError as e:
+            logger.error("Не удалось открыть приветственное изображение по пути %s: %s", self._path, e)
+            return
+        self._file_hash = hashlib.sha256(self._content).hexdigest()
+        self._file_id = await self._db.get_media_file_id(self._file_hash)
+        logger.info(
+            "Приветственное изображение загружено (%s байт), file_id %s.",
+            len(self._content), 'найден в БД' if self._file_id else 'еще не получен'
+        )
+
+    @property
+    def available(self) -> bool:
+        return self._content is not None
+
+    async def send(self, bot: Bot, chat_id: int, caption: str, reply_markup: InlineKeyboardMarkup | None = None):
+        """Отправляет картинку по file_id, а при его отсутствии/недействительности - загружает файл."""
+        if self._file_id:
+            try:
+                await bot.send_photo(chat_id=chat_id, photo=self._file_id, caption=caption, reply_markup=reply_markup)
+                return
+            except TelegramBadRequest as e:
+                logger.warning("Telegram отклонил сохраненный file_id приветственного изображения: %s. Загружаем заново.", e)
+                await self._forget_file_id()
+
+        async with self._upload_lock:
+            if self._file_id:
+                # Пока ждали замка, файл уже загрузил другой хендлер
+                await bot.send_photo(chat_id=chat_id, photo=self._file_id, caption=caption, reply_markup=reply_markup)
+                return
+            sent = await bot.send_photo(
+                chat_id=chat_id,
+                photo=BufferedInputFile(self._content, filename='greeting.jpg'),
+                caption=caption,
+                reply_markup=reply_markup
+            )
+            if sent.photo:
+                self._file_id = sent.photo[-1].file_id
+                await self._db.set_media_file_id(self._file_hash, self._file_id)
+                logger.info("Получен и сохранен file_id приветственного изображения.")
+
+    async def _forget_file_id(self):
+        self._file_id = None
+        await self._db.set_media_file_id(self._file_hash, None)
+
+
+__all__ = ['GreetingPhoto']
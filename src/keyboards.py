@@ -1,37 +1,7 @@
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-
-USER_ASK_REGION = [
-    [InlineKeyboardButton(text="Московская область", callback_data="region_msk")],
-    [InlineKeyboardButton(text="Владимирская область", callback_data="region_vldmr")],
-]
-
-USER_ASK_ADDRESS_MSK = [
-    [InlineKeyboardButton(text="посёлок совхоза Останино, Дорожная, 28А", callback_data="address_msk_1")],
-    [InlineKeyboardButton(text="г. Королев Лесная, 6", callback_data="address_msk_2")],
-    [InlineKeyboardButton(text="д. Большие Жеребцы Восточная, 1к8", callback_data="address_msk_3")],
-    [InlineKeyboardButton(text="пос. Софрино Тютчева, с15", callback_data="address_msk_4")],
-    [InlineKeyboardButton(text="г. Мытищи Калинина, 6", callback_data="address_msk_5")],
-    [InlineKeyboardButton(text="с. Васильевское 22А", callback_data="address_msk_6")],
-    [InlineKeyboardButton(text="посёлок санатория Тишково, Курортная улица, 2", callback_data="address_msk_7")],
-    [InlineKeyboardButton(text="Сергиев Посад, Пограничная улица 32", callback_data="address_msk_8")],
-    [InlineKeyboardButton(text="Пушкино, Железнодорожная улица, 6", callback_data="address_msk_9")],
-    [InlineKeyboardButton(text="Мытищи, Калинина, 6", callback_data="address_msk_10")],
-    [InlineKeyboardButton(text="посёлок Софрино, Тютчева с15", callback_data="address_msk_11")],
-]
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
 
-USER_ASK_ADDRESS_VLDMR = [
-    [InlineKeyboardButton(text="г. Кольчугино, улица Максимова, 11", callback_data="address_vldmr_1")],
-    [InlineKeyboardButton(text="г. Петушки Московская, 16", callback_data="address_vldmr_2")],
-    [InlineKeyboardButton(text="г. Александров Королёва, 4к2", callback_data="address_vldmr_3")],
-    [InlineKeyboardButton(text="г. Александров Королёва, 9", callback_data="address_vldmr_4")],
-    [InlineKeyboardButton(text="г. Александров Гагарина, 23к1", callback_data="address_vldmr_5")],
-    [InlineKeyboardButton(text="Струнино Заречная, 32", callback_data="address_vldmr_6")],
-    [InlineKeyboardButton(text="Александров, улица Жулёва, 3", callback_data="address_vldmr_7")],
-    [InlineKeyboardButton(text="г. Александров Кольчугинская 49с1", callback_data="address_vldmr_8")],
-    [InlineKeyboardButton(text="Александров, Улица Геологов, 8", callback_data="address_vldmr_9")],
-    [InlineKeyboardButton(text="г. Кольчугино, улица Железнодорожная, 31", callback_data="address_vldmr_10")],
-    [InlineKeyboardButton(text="посёлок Городищи, Советская, 18", callback_data="address_vldmr_11")],
-]
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 USER_ASK_CONFIRMATION = [
     [InlineKeyboardButton(text="Редактировать возраст", callback_data="edit_age")],
@@ -42,59 +12,249 @@ USER_ASK_CONFIRMATION = [
     [InlineKeyboardButton(text="✅ Все верно, отправить", callback_data="confirm_submission")],
     [InlineKeyboardButton(text="❌ Отменить и начать заново", callback_data="cancel_submission")],
 ]
+_CONFIRMATION_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=USER_ASK_CONFIRMATION)
+
+_START_KEYBOARD_NEW = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="📝 Подать заявку", callback_data="start_new_application")],
+])
+_START_KEYBOARD_EXISTING = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✏️ Редактировать мою заявку", callback_data="start_edit_application")],
+    [InlineKeyboardButton(text="📝 Подать новую (заменит старую)", callback_data="start_new_application")],
+])
 
 def user_get_start_keyboard(has_existing_application: bool) -> InlineKeyboardMarkup:
-    buttons = []
-    if has_existing_application:
-        buttons.append([InlineKeyboardButton(text="✏️ Редактировать мою заявку", callback_data="start_edit_application")])
-        buttons.append([InlineKeyboardButton(text="📝 Подать новую (заменит старую)", callback_data="start_new_application")])
-    else:
-        buttons.append([InlineKeyboardButton(text="📝 Подать заявку", callback_data="start_new_application")])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return _START_KEYBOARD_EXISTING if has_existing_application else _START_KEYBOARD_NEW
 
-def get_region_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(inline_keyboard=USER_ASK_REGION)
+def get_region_keyboard(regions: list[tuple[str, str]]) -> InlineKeyboardMarkup:
+    """Выбор области. regions - пары (код, название)."""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=name, callback_data=f"region_{code}")] for code, name in regions
+    ])
 
-def get_address_keyboard(region_code: str) -> InlineKeyboardMarkup | None:
-    now_keyboard = None
-    if region_code == 'msk':
-        now_keyboard = InlineKeyboardMarkup(inline_keyboard=USER_ASK_ADDRESS_MSK)
-    elif region_code == 'vldmr':
-        now_keyboard = InlineKeyboardMarkup(inline_keyboard=USER_ASK_ADDRESS_VLDMR)
-    return now_keyboard
+def get_address_page_keyboard(
+    region_code: str, addresses: list[tuple[int, str]], current_page: int, total_pages: int
+) -> InlineKeyboardMarkup:
+    """
+    Одна страница адресов области. addresses - пары (id, текст) этой страницы.
+    Под адресами - кнопки перелистывания 'addrpage_{код области}_{страница}'.
+    """
+    buttons = [[InlineKeyboardButton(text=text, callback_data=f"address_{address_id}")] for address_id, text in addresses]
+    if total_pages > 1:
+        nav_row = []
+        if current_page > 1:
+            nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"addrpage_{region_code}_{current_page - 1}"))
+        nav_row.append(InlineKeyboardButton(text=f"{current_page}/{total_pages}", callback_data="addrpage_noop"))
+        if current_page < total_pages:
+            nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"addrpage_{region_code}_{current_page + 1}"))
+        buttons.append(nav_row)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_address_search_keyboard(region_code: str, addresses: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+    """Найденные адреса и кнопка возврата к полному списку адресов области."""
+    buttons = [[InlineKeyboardButton(text=text, callback_data=f"address_{address_id}")] for address_id, text in addresses]
+    buttons.append([InlineKeyboardButton(text="📋 Все адреса", callback_data=f"addrpage_{region_code}_1")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 async def get_confirmation_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(inline_keyboard=USER_ASK_CONFIRMATION)
+    return _CONFIRMATION_KEYBOARD
 
-def get_admin_pagination_keyboard(current_page: int, total_pages: int, action_prefix: str = "admin_apps_page_") -> InlineKeyboardMarkup | None:
+def get_admin_pagination_keyboard(
+    current_page: int,
+    total_pages: int,
+    action_prefix: str = "admin_apps_page_",
+    prev_cursor: str | None = None,
+    next_cursor: str | None = None
+) -> InlineKeyboardMarkup | None:
     """
     Клавиатура для пагинации списка заявок.
     action_prefix позволяет использовать эту клавиатуру для разных списков (например, новые, в работе и т.д.)
+    prev_cursor/next_cursor - закодированные курсоры keyset-пагинации; если переданы,
+    добавляются в callback_data после номера страницы: '{action_prefix}{page}_{cursor}'.
     """
     if total_pages <= 1:
         return None
 
+    def page_callback(page: int, cursor: str | None) -> str:
+        return f"{action_prefix}{page}_{cursor}" if cursor else f"{action_prefix}{page}"
+
     buttons_row = []
     if current_page > 1:
-        buttons_row.append(InlineKeyboardButton(text="⬅️ Пред.", callback_data=f"{action_prefix}{current_page - 1}"))
+        buttons_row.append(InlineKeyboardButton(text="⬅️ Пред.", callback_data=page_callback(current_page - 1, prev_cursor)))
     
     buttons_row.append(InlineKeyboardButton(text=f"📄 {current_page}/{total_pages}", callback_data="admin_noop")) # noop - нет операции
 
     if current_page < total_pages:
-        buttons_row.append(InlineKeyboardButton(text="След. ➡️", callback_data=f"{action_prefix}{current_page + 1}"))
+        buttons_row.append(InlineKeyboardButton(text="След. ➡️", callback_data=page_callback(current_page + 1, next_cursor)))
     
     return InlineKeyboardMarkup(inline_keyboard=[buttons_row])
 
-def get_admin_review_keyboard(app_id: int, current_page: int) -> InlineKeyboardMarkup:
+# Фильтры списка заявок /view_apps. Коды однобуквенные, чтобы фильтр помещался в callback_data.
+# Статус: код -> (название, статусы заявок)
+APP_FILTER_STATUSES = {
+    "a": ("Активные", ['new', 'updated', 'updated_conflict']),
+    "n": ("Новые", ['new']),
+    "u": ("Обновленные", ['updated', 'updated_conflict']),
+    "c": ("Принятые", ['completed']),
+    "r": ("Отклоненные", ['rejected']),
+    "x": ("Все", ['new', 'updated', 'updated_conflict', 'completed', 'rejected']),
+}
+# Период (по дате последнего изменения заявки): код -> (название, дней или None)
+APP_FILTER_PERIODS = {
+    "a": ("За все время", None),
+    "d": ("За сутки", 1),
+    "w": ("За неделю", 7),
+    "m": ("За месяц", 30),
+}
+
+
+class ApplicationFilter(NamedTuple):
+    """
+    Фильтр списка заявок: код статуса, код периода и код области из каталога (None - все).
+    В callback_data передается строкой вида '{статус}{период}{код области}', например 'rwvldmr'.
+    """
+    status: str = "a"
+    period: str = "a"
+    region_code: str | None = None
+
+    def encode(self) -> str:
+        return f"{self.status}{self.period}{self.region_code or ''}"
+
+    @classmethod
+    def decode(cls, raw: str | None) -> "ApplicationFilter":
+        """Разбирает строку encode(); при неверном формате возвращает фильтр по умолчанию."""
+        if not raw or len(raw) < 2 or raw[0] not in APP_FILTER_STATUSES or raw[1] not in APP_FILTER_PERIODS:
+            return cls()
+        return cls(raw[0], raw[1], raw[2:] or None)
+
+    @property
+    def statuses(self) -> list[str]:
+        return APP_FILTER_STATUSES[self.status][1]
+
+    def updated_since(self, now: datetime | None = None) -> str | None:
+        """Нижняя граница updated_at в формате SQLite (UTC) или None."""
+        days = APP_FILTER_PERIODS[self.period][1]
+        if days is None:
+            return None
+        since = (now or datetime.now(timezone.utc).replace(tzinfo=None)) - timedelta(days=days)
+        return since.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def get_admin_filter_keyboard(app_filter: ApplicationFilter, regions: list[tuple[str, str]]) -> InlineKeyboardMarkup:
+    """
+    Выбор фильтра списка заявок. Каждая кнопка открывает это же меню с измененным фильтром
+    ('admin_filter_{фильтр}'), кнопка "Показать" - первую страницу списка с фильтром.
+    regions - пары (код, название) областей каталога.
+    """
+    def option(text: str, selected: bool, new_filter: ApplicationFilter) -> InlineKeyboardButton:
+        return InlineKeyboardButton(text=f"✅ {text}" if selected else text, callback_data=f"admin_filter_{new_filter.encode()}")
+
+    status_buttons = [
+        option(title, code == app_filter.status, app_filter._replace(status=code))
+        for code, (title, _) in APP_FILTER_STATUSES.items()
+    ]
+    period_buttons = [
+        option(title, code == app_filter.period, app_filter._replace(period=code))
+        for code, (title, _) in APP_FILTER_PERIODS.items()
+    ]
+    region_buttons = [option("Все области", app_filter.region_code is None, app_filter._replace(region_code=None))]
+    region_buttons += [
+        option(name, code == app_filter.region_code, app_filter._replace(region_code=code))
+        for code, name in regions
+    ]
+    buttons = [status_buttons[:3], status_buttons[3:], period_buttons[:2], period_buttons[2:]]
+    buttons += [[button] for button in region_buttons]
+    buttons.append([InlineKeyboardButton(text="📋 Показать заявки", callback_data=f"admin_viewapps_page_{app_filter.encode()}_1")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+# Массовые действия над выбранными заявками: код -> (текст кнопки, текст подтверждения)
+BULK_ACTIONS = {
+    "complete": ("✅ Принять", "Принять выбранные заявки ({count}) и уведомить пользователей?"),
+    "reject": ("❌ Отклонить", None),
+    "ban": ("🚫 Заблокировать", "Заблокировать авторов выбранных заявок ({count})?"),
+}
+
+
+def get_admin_bulk_keyboard(
+    items: list[tuple[int, str, bool]], current_page: int, total_pages: int, selected_count: int
+) -> InlineKeyboardMarkup:
+    """
+    Клавиатура выбора нескольких заявок для массового действия.
+    items - (ID заявки, подпись, выбрана ли) для заявок текущей страницы.
+    Выбор хранится в FSM, поэтому callback_data не содержат фильтр:
+    'admin_bulk_toggle_{app_id}', 'admin_bulk_page_{page}', 'admin_bulk_do_{действие}'.
+    """
+    buttons = [
+        [InlineKeyboardButton(text=f"{'✅' if selected else '⬜️'} {label}", callback_data=f"admin_bulk_toggle_{app_id}")]
+        for app_id, label, selected in items
+    ]
+    pagination_kb = get_admin_pagination_keyboard(current_page, total_pages, action_prefix="admin_bulk_page_")
+    if pagination_kb:
+        buttons.extend(pagination_kb.inline_keyboard)
+    buttons.append([
+        InlineKeyboardButton(text="☑️ Вся страница", callback_data="admin_bulk_selpage"),
+        InlineKeyboardButton(text="☑️ Все по фильтру", callback_data="admin_bulk_selall"),
+        InlineKeyboardButton(text="✖️ Сбросить", callback_data="admin_bulk_clear"),
+    ])
+    action_buttons = [
+        InlineKeyboardButton(text=f"{title} ({selected_count})", callback_data=f"admin_bulk_do_{action}")
+        for action, (title, _) in BULK_ACTIONS.items()
+    ]
+    buttons.append(action_buttons[:2])
+    buttons.append(action_buttons[2:] + [InlineKeyboardButton(text="↩️ К списку", callback_data="admin_bulk_exit")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_admin_bulk_confirm_keyboard(action: str) -> InlineKeyboardMarkup:
+    buttons = [
+        [InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"admin_bulk_confirm_{action}")],
+        [InlineKeyboardButton(text="↩️ Назад к выбору", callback_data="admin_bulk_back")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_admin_review_keyboard(app_id: int, current_page: int, user_id: int) -> InlineKeyboardMarkup:
     """
     Клавиатура для детального просмотра и действий с одной заявкой.
     current_page - страница списка, на которую нужно вернуться.
+    user_id - ID автора заявки (нужен для кнопки блокировки).
     """
     buttons = [
         [InlineKeyboardButton(text="✉️ Написать пользователю", callback_data=f"admin_review_write_{app_id}_{current_page}")],
         [InlineKeyboardButton(text="🏁 Завершить заявку", callback_data=f"admin_review_complete_{app_id}_{current_page}")],
         [InlineKeyboardButton(text="❌ Отклонить заявку", callback_data=f"admin_review_reject_{app_id}_{current_page}")],
-        [InlineKeyboardButton(text="⛔ Заблокировать пользователя", callback_data=f"admin_ban_user_{app_id}_{current_page}")],
+        [InlineKeyboardButton(text="⛔ Заблокировать пользователя", callback_data=f"admin_ban_user_{current_page}_{app_id}_{user_id}")],
         [InlineKeyboardButton(text="⬅️ К списку заявок", callback_data=f"admin_review_backtolist_{current_page}")]
     ]
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+# Группы статусов заявок, по которым можно отобрать получателей рассылки: код -> (название, статусы)
+BROADCAST_STATUS_GROUPS = {
+    "all": ("Все статусы", None),
+    "active": ("Новые и обновленные", ['new', 'updated', 'updated_conflict']),
+    "completed": ("Принятые", ['completed']),
+    "rejected": ("Отклоненные", ['rejected']),
+}
+
+def get_broadcast_region_keyboard(regions: list[tuple[str, str]]) -> InlineKeyboardMarkup:
+    """Выбор области получателей рассылки: все области или одна из каталога (пары (код, название))."""
+    buttons = [[InlineKeyboardButton(text="Все области", callback_data="bc_region_all")]]
+    for code, name in regions:
+        buttons.append([InlineKeyboardButton(text=name, callback_data=f"bc_region_{code}")])
+    buttons.append([InlineKeyboardButton(text="❌ Отменить рассылку", callback_data="bc_cancel")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_broadcast_status_keyboard() -> InlineKeyboardMarkup:
+    """Выбор группы статусов заявок получателей рассылки."""
+    buttons = [
+        [InlineKeyboardButton(text=title, callback_data=f"bc_status_{code}")]
+        for code, (title, _) in BROADCAST_STATUS_GROUPS.items()
+    ]
+    buttons.append([InlineKeyboardButton(text="❌ Отменить рассылку", callback_data="bc_cancel")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    buttons = [
+        [InlineKeyboardButton(text="✅ Запустить рассылку", callback_data="bc_confirm")],
+        [InlineKeyboardButton(text="❌ Отменить рассылку", callback_data="bc_cancel")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -0,0 +1,242 @@
+import bisect
+import logging
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from src.database import Database
+from src.fsm_storage import SQLiteStorage
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами в формате Prometheus."""
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        # Последняя корзина - "+Inf"
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины (как histogram_quantile в Prometheus)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.bounds[-1]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class BotMetrics:
+    """
+    Метрики работы бота в памяти процесса.
+
+    Заполняются middleware из src.middlewares: задержки и ошибки по
+    хендлерам, количество обновлений по типам. При выгрузке к ним
+    добавляются распределение состояний FSM и задержки запросов к БД
+    (Database.query_stats). Отдаются в текстовом формате Prometheus на
+    /metrics и кратким отчетом по команде администратора /stats.
+    """
+
+    def __init__(self, db: Database, storage: SQLiteStorage | None = None):
+        self._db = db
+        self._storage = storage
+        self.started_at = time.time()
+        self.updates: Counter[str] = Counter()
+        self.unhandled: Counter[str] = Counter()
+        self.update_latency = Histogram()
+        self.handler_latency: dict[tuple[str, str], Histogram] = {}
+        self.errors: Counter[tuple[str, str, str]] = Counter()
+        self.queue_wait = Histogram()
+        self.coalesced_callbacks = 0
+        # (правило, dropped|delayed) -> количество обновлений, ограниченных ThrottlingMiddleware
+        self.throttled: Counter[tuple[str, str]] = Counter()
+
+    def observe_update(self, event_type: str, elapsed: float, handled: bool):
+        self.updates[event_type] += 1
+        if not handled:
+            self.unhandled[event_type] += 1
+        self.update_latency.observe(elapsed)
+
+    def observe_queue_wait(self, elapsed: float):
+        self.queue_wait.observe(elapsed)
+
+    def observe_handler(self, router: str, handler: str, elapsed: float, error: str | None = None):
+        histogram = self.handler_latency.get((router, handler))
+        if histogram is None:
+            histogram = self.handler_latency[(router, handler)] = Histogram()
+        histogram.observe(elapsed)
+        if error is not None:
+            self.errors[(router, handler, error)] += 1
+
+    async def fsm_state_counts(self) -> dict[str | None, int]:
+        """Количество сессий FSM по состояниям (с учетом еще не записанных изменений)."""
+        if self._storage is None:
+            return {}
+        await self._storage.flush()
+        return await self._db.get_fsm_state_counts()
+
+    async def render(self) -> str:
+        """Текущие значения метрик в текстовом формате Prometheus."""
+        lines = [
+            "# HELP bot_uptime_seconds Время работы процесса бота.",
+            "# TYPE bot_uptime_seconds gauge",
+            f"bot_uptime_seconds {time.time() - self.started_at:.3f}",
+            "# HELP bot_updates_total Полученные обновления по типам.",
+            "# TYPE bot_updates_total counter",
+        ]
+        lines += [f"bot_updates_total{_labels(type=t)} {n}" for t, n in sorted(self.updates.items())]
+        lines += ["# HELP bot_updates_unhandled_total Обновления, для которых не нашлось хендлера.", "# TYPE bot_updates_unhandled_total counter"]
+        lines += [f"bot_updates_unhandled_total{_labels(type=t)} {n}" for t, n in sorted(self.unhandled.items())]
+        lines += ["# HELP bot_update_duration_seconds Полное время обработки обновления.", "# TYPE bot_update_duration_seconds histogram"]
+        lines += self._histogram_lines("bot_update_duration_seconds", self.update_latency, {})
+        lines += [
+            "# HELP bot_update_queue_wait_seconds Ожидание обновлением своей очереди (предыдущих обновлений пользователя и свободного места).",
+            "# TYPE bot_update_queue_wait_seconds histogram"
+        ]
+        lines += self._histogram_lines("bot_update_queue_wait_seconds", self.queue_wait, {})
+        lines += [
+            "# HELP bot_callbacks_coalesced_total Повторные нажатия кнопки, отброшенные, пока первое еще обрабатывалось.",
+            "# TYPE bot_callbacks_coalesced_total counter",
+            f"bot_callbacks_coalesced_total {self.coalesced_callbacks}",
+            "# HELP bot_updates_throttled_total Обновления, отброшенные или задержанные защитой от флуда.",
+            "# TYPE bot_updates_throttled_total counter",
+        ]
+        lines += [
+            f"bot_updates_throttled_total{_labels(rule=rule, action=action)} {n}"
+            for (rule, action), n in sorted(self.throttled.items())
+        ]
+        lines += ["# HELP bot_handler_duration_seconds Время работы хендлера.", "# TYPE bot_handler_duration_seconds histogram"]
+        for (router, handler), histogram in sorted(self.handler_latency.items()):
+            lines += self._histogram_lines("bot_handler_duration_seconds", histogram, {"router": router, "handler": handler})
+        lines += ["# HELP bot_handler_errors_total Исключения, выброшенные хендлерами.", "# TYPE bot_handler_errors_total counter"]
+        lines += [
+            f"bot_handler_errors_total{_labels(router=r, handler=h, error=e)} {n}"
+            for (r, h, e), n in sorted(self.errors.items())
+        ]
+        lines += ["# HELP bot_fsm_sessions Сохраненные сессии FSM по состояниям.", "# TYPE bot_fsm_sessions gauge"]
+        lines += [
+            f"bot_fsm_sessions{_labels(state=state or 'none')} {n}"
+            for state, n in sorted((await self.fsm_state_counts()).items(), key=lambda item: str(item[0]))
+        ]
+        lines += [
+            "# HELP bot_db_query_duration_seconds Время выполнения методов Database.",
+            "# TYPE bot_db_query_duration_seconds summary",
+        ]
+        for name, stat in sorted(self._db.query_stats.items()):
+            lines.append(f"bot_db_query_duration_seconds_sum{_labels(query=name)} {stat.total:.6f}")
+            lines.append(f"bot_db_query_duration_seconds_count{_labels(query=name)} {stat.calls}")
+        caches = {"applications_by_user": self._db.applications_by_user, "applications_by_id": self._db.applications_by_id}
+        lines += ["# HELP bot_db_cache_requests_total Обращения к кэшам заявок Database.", "# TYPE bot_db_cache_requests_total counter"]
+        for name, cache in caches.items():
+            lines.append(f"bot_db_cache_requests_total{_labels(cache=name, result='hit')} {cache.hits}")
+            lines.append(f"bot_db_cache_requests_total{_labels(cache=name, result='miss')} {cache.misses}")
+        lines += ["# HELP bot_db_cache_entries Записи в кэшах заявок Database.", "# TYPE bot_db_cache_entries gauge"]
+        lines += [f"bot_db_cache_entries{_labels(cache=name)} {len(cache)}" for name, cache in caches.items()]
+        lines += ["# HELP bot_db_query_duration_max_seconds Максимальное время метода Database.", "# TYPE bot_db_query_duration_max_seconds gauge"]
+        lines += [
+            f"bot_db_query_duration_max_seconds{_labels(query=name)} {stat.max:.6f}"
+            for name, stat in sorted(self._db.query_stats.items())
+        ]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(name: str, histogram: Histogram, labels: dict[str, str]) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip((*histogram.bounds, "+Inf"), histogram.counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+        suffix = _labels(**labels) if labels else ""
+        lines.append(f"{name}_sum{suffix} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {histogram.count}")
+        return lines
+
+    async def summary(self, top: int = 5) -> str:
+        """Краткий текстовый отчет для команды /stats."""
+        uptime = time.time() - self.started_at
+        total = sum(self.updates.values())
+        lines = [
+            f"📊 Статистика за {int(uptime // 3600)} ч {int(uptime % 3600 // 60)} мин",
+            f"Обновлений: {total} ({total / uptime if uptime else 0:.2f}/с), "
+            f"без хендлера: {sum(self.unhandled.values())}, ошибок: {sum(self.errors.values())}",
+            f"Обработка обновления: p50 {self.update_latency.quantile(0.5) * 1000:.0f} мс, "
+            f"p95 {self.update_latency.quantile(0.95) * 1000:.0f} мс",
+            f"Ожидание очереди: p95 {self.queue_wait.quantile(0.95) * 1000:.0f} мс, "
+            f"отброшено повторных нажатий: {self.coalesced_callbacks}",
+            f"Защита от флуда: отброшено {sum(n for (_, a), n in self.throttled.items() if a == 'dropped')}, "
+            f"задержано {sum(n for (_, a), n in self.throttled.items() if a == 'delayed')}",
+        ]
+
+        slowest = sorted(self.handler_latency.items(), key=lambda item: item[1].quantile(0.95), reverse=True)[:top]
+        if slowest:
+            lines.append("\nСамые медленные хендлеры (p95):")
+            lines += [
+                f"• {handler}: {histogram.quantile(0.95) * 1000:.0f} мс ({histogram.count} вызовов)"
+                for (_, handler), histogram in slowest
+            ]
+
+        states = await self.fsm_state_counts()
+        if states:
+            lines.append("\nСессии FSM по состояниям:")
+            lines += [
+                f"• {state or 'без состояния'}: {n}"
+                for state, n in sorted(states.items(), key=lambda item: item[1], reverse=True)
+            ]
+
+        queries = sorted(self._db.query_stats.items(), key=lambda item: item[1].total, reverse=True)[:top]
+        if queries:
+            lines.append("\nЗапросы к БД (среднее / макс.):")
+            lines += [
+                f"• {name}: {stat.avg * 1000:.1f} / {stat.max * 1000:.1f} мс ({stat.calls} вызовов)"
+                for name, stat in queries
+            ]
+
+        hits = self._db.applications_by_user.hits + self._db.applications_by_id.hits
+        requests = hits + self._db.applications_by_user.misses + self._db.applications_by_id.misses
+        if requests:
+            lines.append(f"Кэш заявок: {hits / requests:.0%} попаданий из {requests} обращений")
+        return "\n".join(lines)
+
+
+async def start_metrics_server(metrics: BotMetrics, host: str, port: int) -> web.AppRunner:
+    """Запускает HTTP-сервер с эндпоинтом /metrics. Возвращает runner для остановки."""
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=await metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
+
+
+__all__ = ['BotMetrics', 'Histogram', 'start_metrics_server']
@@ -1,8 +1,28 @@
-from typing import Callable, Dict, Any, Awaitable
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Callable, Dict, Any, Awaitable, Iterable
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject, Update, CallbackQuery
 
 from src.ban_manager import BanManager
+from src.database import Database
+from src.fsm_storage import BufferedFSMContext, FSMStorageCounter
+from src.greeting import GreetingPhoto
+from src.broadcast import Broadcaster
+from src.outbox import Outbox
+from src.metrics import BotMetrics
+from src.catalog import Catalog
+from src.config import (
+    UPDATE_MAX_CONCURRENCY, USER_LOCKS_CACHE_SIZE, THROTTLE_RULES, THROTTLE_MAX_DELAY, THROTTLE_SWEEP_INTERVAL
+)
+from src.rate_limit import KeyedRateLimiter
+from src.scheduling import KeyedLocks
+
+logger = logging.getLogger(__name__)
 
 class AdminChatIdMiddleware(BaseMiddleware):
     def __init__(self, admin_chat_id: int):
@@ -34,4 +54,292 @@ class BanManagerMiddleware(BaseMiddleware):
         data["ban_manager"] = self.ban_manager
         return await handler(event, data)
 
-__all__ = ['AdminChatIdMiddleware', 'BanManagerMiddleware']
\ No newline at end of file
+class DatabaseMiddleware(BaseMiddleware):
+    def __init__(self, db: Database):
+        super().__init__()
+        self.db = db
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Общий пул соединений доступен в хендлерах как аргумент 'db'
+        data["db"] = self.db
+        return await handler(event, data)
+
+class UpdateSchedulerMiddleware(BaseMiddleware):
+    """
+    Очередность обработки обновлений.
+
+    Обновления одного пользователя обрабатываются строго по очереди
+    (KeyedLocks по ID пользователя), всего одновременно - не больше
+    max_concurrency. Повторное нажатие той же кнопки в том же сообщении,
+    пока первое еще ждет или обрабатывается, отбрасывается: Telegram
+    получает пустой ответ на callback, а хендлер не вызывается второй раз.
+
+    Регистрируется как outer-middleware на dp.update до BufferedFSMMiddleware:
+    встроенный FSMContextMiddleware читает состояние FSM до очереди, поэтому
+    после ожидания состояние перечитывается - обновление видит изменения,
+    сделанные предыдущим обновлением пользователя.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = UPDATE_MAX_CONCURRENCY,
+        locks_cache_size: int = USER_LOCKS_CACHE_SIZE,
+        metrics: BotMetrics | None = None
+    ):
+        super().__init__()
+        self.locks = KeyedLocks(locks_cache_size)
+        self.slots = asyncio.Semaphore(max(1, max_concurrency))
+        self.metrics = metrics
+        self._pending_callbacks: set[tuple] = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        callback = event.callback_query
+        callback_key = None
+        if callback is not None and user is not None:
+            message_id = callback.message.message_id if callback.message else callback.inline_message_id
+            callback_key = (user.id, message_id, callback.data)
+            if callback_key in self._pending_callbacks:
+                logger.info("Повторное нажатие '%s' пользователем %s отброшено.", callback.data, user.id)
+                if self.metrics is not None:
+                    self.metrics.coalesced_callbacks += 1
+                try:
+                    await callback.answer()
+                except Exception as e:
+                    logger.debug("Не удалось ответить на повторный callback пользователя %s: %s", user.id, e)
+                return UNHANDLED
+            self._pending_callbacks.add(callback_key)
+
+        started = time.perf_counter()
+        try:
+            async with self.locks.hold(user.id) if user is not None else contextlib.nullcontext():
+                async with self.slots:
+                    if self.metrics is not None:
+                        self.metrics.observe_queue_wait(time.perf_counter() - started)
+                    if user is not None and data.get("state") is not None:
+                        data["raw_state"] = await data["state"].get_state()
+                    return await handler(event, data)
+        finally:
+            if callback_key is not None:
+                self._pending_callbacks.discard(callback_key)
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Защита от флуда: ограничивает частоту обновлений от одного пользователя.
+
+    Правило выбирается флагом хендлера throttle (имя из rules, False -
+    без ограничения), без флага действует правило "default". У каждого
+    правила свой KeyedRateLimiter по ID пользователя. Лишнее обновление
+    по правилу "drop" отбрасывается до вызова хендлера (на callback
+    отвечается всплывающей подсказкой), по правилу "delay" - ждет
+    своего токена, но не дольше max_delay.
+
+    Регистрируется внутренним middleware на dp.message и dp.callback_query
+    раньше HandlerMetricsMiddleware, чтобы отброшенные обновления не
+    попадали во время работы хендлеров. Ожидание по правилу "delay"
+    происходит внутри очереди UpdateSchedulerMiddleware, поэтому
+    флудящий пользователь занимает не больше одного места из
+    UPDATE_MAX_CONCURRENCY.
+    """
+    def __init__(
+        self,
+        rules: dict[str, tuple[float, int, str]] = THROTTLE_RULES,
+        max_delay: float = THROTTLE_MAX_DELAY,
+        exempt_ids: Iterable[int] = (),
+        metrics: BotMetrics | None = None
+    ):
+        super().__init__()
+        self.limiters = {
+            name: (KeyedRateLimiter(rate, burst, THROTTLE_SWEEP_INTERVAL), action)
+            for name, (rate, burst, action) in rules.items()
+        }
+        self.max_delay = max_delay
+        self.exempt_ids = frozenset(exempt_ids)
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        rule = get_flag(data, "throttle", default="default")
+        if user is None or rule is False or user.id in self.exempt_ids:
+            return await handler(event, data)
+        limiter = self.limiters.get(rule)
+        if limiter is None:
+            logger.error("Неизвестное правило ограничения частоты '%s'.", rule)
+            return await handler(event, data)
+
+        bucket, action = limiter
+        delay = bucket.reserve(user.id, self.max_delay if action == "delay" else 0.0)
+        if delay is None:
+            logger.info("Обновление пользователя %s отброшено по правилу '%s'.", user.id, rule)
+            if self.metrics is not None:
+                self.metrics.throttled[(rule, "dropped")] += 1
+            if isinstance(event, CallbackQuery):
+                try:
+                    await event.answer("Слишком часто. Подождите немного.")
+                except Exception as e:
+                    logger.debug("Не удалось ответить на callback пользователя %s: %s", user.id, e)
+            return None
+        if delay > 0:
+            if self.metrics is not None:
+                self.metrics.throttled[(rule, "delayed")] += 1
+            await asyncio.sleep(delay)
+        return await handler(event, data)
+
+class BufferedFSMMiddleware(BaseMiddleware):
+    """
+    Подменяет FSMContext апдейта на BufferedFSMContext: данные FSM читаются
+    из хранилища один раз, а изменения записываются одним сбросом после
+    хендлера. Должен регистрироваться как outer-middleware на dp.update
+    (после встроенного FSMContextMiddleware).
+    """
+    def __init__(self, counter: FSMStorageCounter | None = None):
+        super().__init__()
+        self.counter = counter or FSMStorageCounter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        context = data.get("state")
+        if context is None:
+            return await handler(event, data)
+
+        buffered = BufferedFSMContext(storage=context.storage, key=context.key, raw_state=data.get("raw_state"))
+        data["state"] = buffered
+        try:
+            return await handler(event, data)
+        finally:
+            # Сохраняем изменения и при ошибке в хендлере - как и при прямой записи в хранилище
+            await buffered.flush()
+            self.counter.add(buffered.reads, buffered.writes)
+            logger.debug("FSM %s: чтений хранилища %s, записей %s.", context.key.user_id, buffered.reads, buffered.writes)
+
+class GreetingPhotoMiddleware(BaseMiddleware):
+    def __init__(self, greeting_photo: GreetingPhoto):
+        super().__init__()
+        self.greeting_photo = greeting_photo
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["greeting_photo"] = self.greeting_photo
+        return await handler(event, data)
+
+class BroadcasterMiddleware(BaseMiddleware):
+    def __init__(self, broadcaster: Broadcaster):
+        super().__init__()
+        self.broadcaster = broadcaster
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["broadcaster"] = self.broadcaster
+        return await handler(event, data)
+
+class OutboxMiddleware(BaseMiddleware):
+    def __init__(self, outbox: Outbox):
+        super().__init__()
+        self.outbox = outbox
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["outbox"] = self.outbox
+        return await handler(event, data)
+
+class CatalogMiddleware(BaseMiddleware):
+    def __init__(self, catalog: Catalog):
+        super().__init__()
+        self.catalog = catalog
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["catalog"] = self.catalog
+        return await handler(event, data)
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: считает обновления по типам и полное
+    время их обработки, а также передает метрики в хендлеры (для /stats).
+    """
+    def __init__(self, metrics: BotMetrics):
+        super().__init__()
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["metrics"] = self.metrics
+        started = time.perf_counter()
+        result = UNHANDLED
+        try:
+            result = await handler(event, data)
+            return result
+        finally:
+            self.metrics.observe_update(event.event_type, time.perf_counter() - started, handled=result is not UNHANDLED)
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время работы и ошибки конкретного хендлера (роутер и имя функции)."""
+    def __init__(self, metrics: BotMetrics):
+        super().__init__()
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter()
+        error = None
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            router = data.get("event_router")
+            self.metrics.observe_handler(
+                router.name if router else "",
+                data["handler"].callback.__name__,
+                time.perf_counter() - started,
+                error
+            )
+
+__all__ = [
+    'AdminChatIdMiddleware', 'BanManagerMiddleware', 'DatabaseMiddleware', 'BufferedFSMMiddleware',
+    'GreetingPhotoMiddleware', 'BroadcasterMiddleware', 'OutboxMiddleware', 'UpdateMetricsMiddleware',
+    'HandlerMetricsMiddleware', 'CatalogMiddleware', 'UpdateSchedulerMiddleware', 'ThrottlingMiddleware'
+]
\ No newline at end of file
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+)
+
+from src.config import (
+    BROADCAST_RATE_PER_SECOND, BROADCAST_PER_CHAT_INTERVAL, OUTBOX_POLL_INTERVAL, OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE_DELAY, OUTBOX_RETRY_MAX_DELAY, OUTBOX_CLAIM_LEASE
+)
+from src.database import Database
+from src.rate_limit import ChatRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Очередь исходящих уведомлений (в админ-чат и пользователям).
+
+    Хендлер только записывает сообщение в таблицу outbox и сразу
+    продолжает работу; отправкой занимается фоновая задача. Она соблюдает
+    лимиты Telegram (ChatRateLimiter, общий с рассыльщиком), на RetryAfter
+    приостанавливает отправку, а при сетевых ошибках повторяет попытки с
+    экспоненциальной задержкой. Так как очередь хранится в БД, сообщения,
+    не отправленные до остановки бота, будут отправлены после перезапуска,
+    а несколько процессов бота могут разбирать одну очередь одновременно.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        limiter: ChatRateLimiter | None = None,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS
+    ):
+        self._bot = bot
+        self._db = db
+        self._limiter = limiter or ChatRateLimiter(BROADCAST_RATE_PER_SECOND, BROADCAST_PER_CHAT_INTERVAL)
+        self._poll_interval = poll_interval
+        self._batch_size = max(1, batch_size)
+        self._max_attempts = max(1, max_attempts)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        """Запускает фоновую отправку сообщений из очереди."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._dispatch_loop(), name="outbox-dispatcher")
+
+    async def close(self):
+        """Останавливает отправку; неотправленные сообщения остаются в БД до следующего запуска."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def enqueue(self, chat_id: int, text: str, parse_mode: str | None = None) -> bool:
+        """
+        Ставит сообщение в очередь на отправку.
+
+        Returns:
+            True, если сообщение сохранено в очереди.
+        """
+        message_id = await self._db.enqueue_outbox(chat_id, text, parse_mode)
+        if message_id is None:
+            return False
+        self._wakeup.set()
+        return True
+
+    async def enqueue_many(self, messages: list[tuple[int, str]], parse_mode: str | None = None) -> int:
+        """
+        Ставит в очередь несколько сообщений (chat_id, текст) одной записью в БД.
+        Например, уведомления по массовому действию над заявками.
+
+        Returns:
+            Количество поставленных в очередь сообщений.
+        """
+        queued = await self._db.enqueue_outbox_many(messages, parse_mode)
+        if queued:
+            self._wakeup.set()
+        return queued
+
+    async def _dispatch_loop(self):
+        while True:
+            try:
+                processed = await self.dispatch_due()
+            except Exception as e:
+                logger.error("Ошибка при отправке сообщений из outbox: %s", e, exc_info=True)
+                processed = 0
+            if processed >= self._batch_size:
+                # Очередь не разобрана до конца - продолжаем без ожидания
+                continue
+            await self._wait_next()
+
+    async def _wait_next(self):
+        timeout = self._poll_interval
+        next_at = await self._db.get_next_outbox_attempt()
+        if next_at is not None:
+            timeout = min(timeout, max(0.0, next_at - time.time()))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def dispatch_due(self) -> int:
+        """
+        Отправляет одну пачку сообщений, время отправки которых наступило.
+
+        Returns:
+            Количество обработанных сообщений.
+        """
+        # Сбрасываем флаг до выборки: сообщения, поставленные во время отправки, разбудят следующий проход
+        self._wakeup.clear()
+        due = await self._db.claim_due_outbox(time.time(), self._batch_size, OUTBOX_CLAIM_LEASE)
+        if not due:
+            return 0
+
+        sent_ids: list[int] = []
+        retries: list[tuple[int, float, str, bool]] = []
+        failed: list[tuple[int, str]] = []
+
+        async def deliver(message_id: int, chat_id: int, text: str, parse_mode: str | None, attempts: int):
+            await self._limiter.wait(chat_id)
+            try:
+                await self._bot.send_message(chat_id, text, parse_mode=parse_mode)
+            except TelegramRetryAfter as e:
+                logger.warning("Telegram просит подождать %s с. Отправка outbox приостановлена.", e.retry_after)
+                self._limiter.pause(e.retry_after)
+                # Попытку не засчитываем: сообщение не было отклонено
+                retries.append((message_id, time.time() + e.retry_after, str(e), False))
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                logger.warning("Уведомление #%s для %s не может быть доставлено: %s", message_id, chat_id, e)
+                failed.append((message_id, str(e)))
+            except Exception as e:
+                # Сетевые и прочие временные ошибки: повторяем с растущей задержкой
+                if attempts + 1 >= self._max_attempts:
+                    logger.error("Уведомление #%s для %s не отправлено после %s попыток: %s", message_id, chat_id, attempts + 1, e)
+                    failed.append((message_id, str(e)))
+                else:
+                    delay = min(OUTBOX_RETRY_BASE_DELAY * 2 ** attempts, OUTBOX_RETRY_MAX_DELAY)
+                    logger.warning("Уведомление #%s для %s не отправлено (%s), повтор через %.0f с.", message_id, chat_id, e, delay)
+                    retries.append((message_id, time.time() + delay, str(e), True))
+            else:
+                sent_ids.append(message_id)
+
+        try:
+            await asyncio.gather(*(deliver(*row) for row in due))
+        finally:
+            # Сохраняем результаты и при остановке бота посреди пачки
+            await asyncio.shield(self._db.complete_outbox(sent_ids, retries, failed))
+        logger.debug("Outbox: отправлено %s, отложено %s, отклонено %s.", len(sent_ids), len(retries), len(failed))
+        return len(due)
+
+
+__all__ = ['Outbox']
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket: не более rate операций в секунду
+    с допустимым всплеском до capacity операций.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ждет, пока появится свободный токен, и забирает его."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Запрещает выдачу токенов на seconds секунд (например, после RetryAfter от Telegram)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        # Токены начинают копиться только после паузы, иначе сразу после нее ушел бы весь запас capacity
+        self._updated_at = self._paused_until
+
+
+class ChatRateLimiter:
+    """
+    Ограничитель исходящих сообщений с учетом лимитов Telegram:
+    общий token bucket на бота и минимальный интервал между
+    сообщениями в один чат.
+    """
+
+    # При каком количестве отслеживаемых чатов удалять устаревшие записи
+    _PRUNE_THRESHOLD = 10000
+
+    def __init__(self, rate_per_second: float, per_chat_interval: float):
+        self._bucket = TokenBucket(rate_per_second)
+        self._per_chat_interval = per_chat_interval
+        self._next_allowed: dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        """Ждет, пока отправка в chat_id станет допустимой по обоим лимитам."""
+        now = time.monotonic()
+        next_allowed = self._next_allowed.get(chat_id, 0.0)
+        # Резервируем слот заранее, чтобы параллельные отправки в тот же чат выстроились в очередь
+        self._next_allowed[chat_id] = max(now, next_allowed) + self._per_chat_interval
+        if len(self._next_allowed) > self._PRUNE_THRESHOLD:
+            self._prune(now)
+        if next_allowed > now:
+            await asyncio.sleep(next_allowed - now)
+        await self._bucket.acquire()
+
+    def pause(self, seconds: float):
+        """Приостанавливает все отправки (Telegram ответил RetryAfter)."""
+        self._bucket.pause(seconds)
+
+    def _prune(self, now: float):
+        self._next_allowed = {chat: t for chat, t in self._next_allowed.items() if t > now}
+
+
+class KeyedRateLimiter:
+    """
+    Token bucket для множества ключей (например, ID пользователей) без
+    объекта на ключ: для каждого ключа хранится одно число - момент, к
+    которому его корзина снова наполнится (алгоритм GCRA). Ключ с
+    полной корзиной ничем не отличается от отсутствующего, поэтому раз в
+    sweep_interval секунд такие ключи удаляются из памяти.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, sweep_interval: float = 60.0):
+        self._interval = 1 / rate
+        # Насколько момент наполнения может опережать текущее время, чтобы операция прошла сразу
+        self._tolerance = (max(1, burst) - 1) * self._interval
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._full_at: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+    def reserve(self, key: int, max_delay: float = 0.0) -> float | None:
+        """
+        Забирает токен ключа. Возвращает, сколько секунд нужно подождать
+        перед операцией (0 - можно сразу), или None, если ждать пришлось бы
+        дольше max_delay; в этом случае токен не расходуется.
+        """
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._prune(now)
+        full_at = max(self._full_at.get(key, now), now)
+        delay = full_at - self._tolerance - now
+        if delay > max_delay:
+            return None
+        self._full_at[key] = full_at + self._interval
+        return max(0.0, delay)
+
+    def _prune(self, now: float):
+        self._next_sweep = now + self._sweep_interval
+        self._full_at = {key: t for key, t in self._full_at.items() if t > now}
+
+
+__all__ = ['TokenBucket', 'ChatRateLimiter', 'KeyedRateLimiter']
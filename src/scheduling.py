@@ -0,0 +1,66 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+from src.config import USER_LOCKS_CACHE_SIZE
+
+
+class _KeyedLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Сколько задач держат блокировку или ждут ее
+        self.users = 0
+
+
+class KeyedLocks:
+    """
+    Блокировки по ключу (например, ID пользователя).
+
+    Объекты блокировок создаются при первом обращении и хранятся в LRU не
+    больше max_size штук: при переполнении удаляются самые давно
+    использованные свободные блокировки. Блокировка, которую кто-то держит
+    или ждет, не удаляется, поэтому очередность по ключу не нарушается.
+    """
+
+    def __init__(self, max_size: int = USER_LOCKS_CACHE_SIZE):
+        self._max_size = max(1, max_size)
+        self._locks: OrderedDict[Hashable, _KeyedLock] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """Держит блокировку ключа на время блока async with."""
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyedLock()
+        else:
+            self._locks.move_to_end(key)
+        # Счетчик увеличиваем до вытеснения, чтобы новая запись не вытеснила сама себя
+        entry.users += 1
+        self._evict()
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+
+    def _evict(self):
+        excess = len(self._locks) - self._max_size
+        if excess <= 0:
+            return
+        stale = []
+        for key, entry in self._locks.items():
+            if entry.users == 0:
+                stale.append(key)
+                if len(stale) >= excess:
+                    break
+        for key in stale:
+            del self._locks[key]
+
+
+__all__ = ['KeyedLocks']
@@ -1,33 +1,134 @@
 # --- НАСТРОЙКА ЛОГИРОВАНИЯ ---
+import json
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
 from datetime import datetime
 
-def setup_logger():
-    log_level = logging.INFO
-    log_folder = "logs"
+from src.config import (
+    LOG_LEVEL, LOG_MODULE_LEVELS, LOG_FORMAT, LOG_FOLDER, LOG_SAMPLING_BURST, LOG_SAMPLING_WINDOW
+)
 
+TEXT_FORMAT = "%(asctime)s - %(levelname)-8s - %(name)-25s - %(module)s.%(funcName)s:%(lineno)d - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись как один JSON-объект в строке (JSON Lines)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "where": f"{record.module}.{record.funcName}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Прореживает частые однотипные записи уровня INFO и ниже.
+
+    Записи группируются по логгеру и шаблону сообщения (до подстановки
+    аргументов), поэтому "Пользователь %s указал возраст" от тысяч
+    пользователей считается одним событием. За окно window секунд
+    пропускается не больше burst записей каждого шаблона; число
+    отброшенных дописывается к первой записи следующего окна.
+    WARNING и выше проходят всегда.
+    """
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self._burst = burst
+        self._window = window
+        # (логгер, шаблон) -> [начало окна, пропущено в окне, отброшено в окне]
+        self._windows: dict[tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self._burst <= 0:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self._window:
+            dropped = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if dropped:
+                record.msg = f"{record.getMessage()} (и еще {dropped} похожих сообщений пропущено)"
+                record.args = None
+            return True
+        if window[1] < self._burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """
+    QueueHandler, который подставляет аргументы в сообщение в потоке
+    вызывающего кода (аргументы могут измениться позже), а оформление
+    записи (время, формат, исключение) оставляет фоновому потоку.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logger(
+    level: str = LOG_LEVEL,
+    module_levels: dict[str, str] = LOG_MODULE_LEVELS,
+    log_format: str = LOG_FORMAT,
+    log_folder: str = LOG_FOLDER,
+    console: bool = True,
+    sampling_burst: int = LOG_SAMPLING_BURST,
+    name: str = "bot"
+) -> QueueListener:
+    """
+    Настраивает асинхронное логирование.
+
+    Логгеры кладут записи в очередь (это почти ничего не стоит циклу
+    событий), а запись в консоль и файл с ротацией выполняет фоновый поток
+    QueueListener. Возвращает запущенный listener; его нужно остановить
+    (listener.stop()) при завершении, чтобы дописать оставшиеся записи.
+    name - окончание имени файла лога (у каждого процесса бота свой файл).
+    """
     # Создаем папку для логов, если ее нет
     os.makedirs(log_folder, exist_ok=True)
 
     # Генерируем имя файла лога с текущей датой и временем
     # Например: 20231026_143000_bot.log
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_file_path = os.path.join(log_folder, f"{timestamp}_bot.log")
+    extension = "jsonl" if log_format == "json" else "log"
+    log_file_path = os.path.join(log_folder, f"{timestamp}_{name}.{extension}")
 
     logger = logging.getLogger()
-    logger.setLevel(log_level)
+    logger.setLevel(level)
+    for module, module_level in module_levels.items():
+        logging.getLogger(module).setLevel(module_level)
 
     # Форматтер для логов
-    log_formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)-8s - %(name)-25s - %(module)s.%(funcName)s:%(lineno)d - %(message)s"
-    )
+    log_formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
 
-    # Обработчик для вывода в консоль
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(log_formatter)
+    handlers = []
+    if console:
+        # Обработчик для вывода в консоль
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(log_formatter)
+        handlers.append(console_handler)
 
     # Обработчик для записи в файл с ротацией
     # maxBytes - максимальный размер файла (5 MB)
@@ -39,10 +140,18 @@ def setup_logger():
         encoding='utf-8'
     )
     file_handler.setFormatter(log_formatter)
+    handlers.append(file_handler)
+
+    # Очередь без ограничения размера: вызывающий код никогда не ждет записи на диск
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _PreparedQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sampling_burst, LOG_SAMPLING_WINDOW))
 
     # Очищаем существующие обработчики, чтобы избежать дублирования (если были от basicConfig)
     if logger.hasHandlers():
         logger.handlers.clear()
-        
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
\ No newline at end of file
+
+    logger.addHandler(queue_handler)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
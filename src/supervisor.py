@@ -0,0 +1,454 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import secrets
+import signal
+import sys
+import time
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot
+
+from src.config import (
+    BOT_WORKERS, WORKER_BASE_PORT, WORKER_METRICS_BASE_PORT, SUPERVISOR_MAX_IN_FLIGHT, RESUME_BROADCASTS,
+    METRICS_HOST, METRICS_PORT, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_MAX_CONNECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд повторять передачу обновления процессу, который не принимает соединения (перезапускается)
+_FORWARD_RETRY_TIMEOUT = 30.0
+# Пауза перед перезапуском упавшего процесса растет до этого значения (секунды)
+_RESTART_MAX_DELAY = 30.0
+# Сколько ждать завершения процессов при остановке, прежде чем убить их (секунды)
+_STOP_TIMEOUT = 15.0
+# Тайм-аут long polling запроса getUpdates (секунды)
+_POLLING_TIMEOUT = 30
+# Сколько ждать передачи хотя бы одного обновления, если getUpdates вернул только уже принятые (секунды)
+_REPOLL_DELAY = 1.0
+
+
+def route_key(update: dict) -> int:
+    """
+    Ключ маршрутизации обновления: ID пользователя (from.id), а если его нет -
+    ID чата. Все обновления одного пользователя попадают в один процесс,
+    поэтому его состояние FSM (кэш SQLiteStorage) и порядок обработки не
+    разъезжаются между процессами.
+    """
+    for field, payload in update.items():
+        if field == "update_id" or not isinstance(payload, dict):
+            continue
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return int(user["id"])
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return int(chat["id"])
+    return 0
+
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?(\s.*)$")
+
+
+def _with_label(sample: str, label: str) -> str:
+    """Добавляет метку к строке-значению в формате Prometheus: 'name{a="1"} 5' -> 'name{worker="0",a="1"} 5'."""
+    match = _SAMPLE_RE.match(sample)
+    if match is None:
+        return sample
+    name, labels, value = match.groups()
+    return f"{name}{{{label},{labels}}}{value}" if labels else f"{name}{{{label}}}{value}"
+
+
+def merge_metrics(texts: dict[int, str]) -> list[str]:
+    """
+    Объединяет выгрузки /metrics процессов в одну: к каждому значению
+    добавляется метка worker, значения одной метрики идут подряд под одним
+    HELP/TYPE, как требует текстовый формат Prometheus.
+    """
+    families: dict[str, list[str]] = {}
+    headers: dict[str, list[str]] = {}
+    for index, text in sorted(texts.items()):
+        label = f'worker="{index}"'
+        family = ""
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                parts = line.split(maxsplit=3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    family_headers = headers.setdefault(family, [])
+                    if line not in family_headers:
+                        family_headers.append(line)
+                    families.setdefault(family, [])
+                continue
+            families.setdefault(family, []).append(_with_label(line, label))
+    lines = []
+    for family, samples in families.items():
+        lines += headers.get(family, [])
+        lines += samples
+    return lines
+
+
+class WorkerProcess:
+    """Процесс-обработчик: bot.py в режиме webhook на локальном порту."""
+
+    def __init__(self, index: int, port: int, metrics_port: int):
+        self.index = index
+        self.port = port
+        self.metrics_port = metrics_port
+        self.process: asyncio.subprocess.Process | None = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.in_flight = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}{WEBHOOK_PATH}"
+
+
+class Supervisor:
+    """
+    Запуск бота в нескольких процессах на одном хосте.
+
+    Supervisor сам получает обновления от Telegram (long polling или
+    вебхук) и передает каждое одному из BOT_WORKERS процессов-обработчиков
+    по ключу route_key(update) % BOT_WORKERS. Обработчики - обычные bot.py
+    в режиме webhook на 127.0.0.1:WORKER_BASE_PORT+i, которые отвечают на
+    запрос только после обработки обновления, поэтому обновления одного
+    пользователя передаются строго по очереди, а разных - параллельно (не
+    больше max_in_flight одновременно). Место в max_in_flight занимает
+    только обновление, которое уже передается процессу, а не ждущее своей
+    очереди, поэтому флуд одного пользователя не задерживает остальных.
+    Упавший процесс перезапускается с растущей паузой; обновления для него
+    ждут перезапуска до _FORWARD_RETRY_TIMEOUT секунд.
+
+    В режиме polling offset подтверждает Telegram только обновления до самого
+    раннего еще не переданного (pending_updates), поэтому обновления, не
+    переданные из-за остановки или падения supervisor, Telegram вернет после
+    перезапуска (доставка "хотя бы один раз").
+
+    На METRICS_HOST:METRICS_PORT supervisor отдает /metrics (метрики всех
+    процессов с меткой worker плюс собственные счетчики) и /health
+    (состояние процессов; 503, если какой-то из них не работает).
+    """
+
+    def __init__(
+        self,
+        workers: int = BOT_WORKERS,
+        worker_command: list[str] | None = None,
+        base_port: int = WORKER_BASE_PORT,
+        metrics_base_port: int = WORKER_METRICS_BASE_PORT,
+        max_in_flight: int = SUPERVISOR_MAX_IN_FLIGHT
+    ):
+        self._worker_command = worker_command or [sys.executable, os.path.abspath(sys.argv[0])]
+        self._workers = [
+            WorkerProcess(i, base_port + i, metrics_base_port + i if metrics_base_port else 0)
+            for i in range(max(1, workers))
+        ]
+        # Секрет для запросов supervisor -> обработчик; снаружи эти порты недоступны, но проверка дешевая
+        self._secret = secrets.token_urlsafe(32)
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        # Последняя передача по каждому пользователю: следующая ждет ее завершения
+        self._lanes: dict[int, asyncio.Task] = {}
+        # update_id принятых, но еще не переданных обновлений и событие "одно из них передано"
+        self.pending_updates: set[int] = set()
+        self._delivered = asyncio.Event()
+        self._session: aiohttp.ClientSession | None = None
+        self._monitors: list[asyncio.Task] = []
+        self._stopping = False
+        self.routed: Counter[int] = Counter()
+        self.failed: Counter[int] = Counter()
+
+    def _worker_env(self, worker: WorkerProcess) -> dict[str, str]:
+        env = dict(os.environ)
+        env.update(
+            BOT_MODE="webhook",
+            BOT_WORKERS=str(len(self._workers)),
+            BOT_WORKER_INDEX=str(worker.index),
+            WEBHOOK_BASE_URL="",
+            WEBHOOK_HOST="127.0.0.1",
+            WEBHOOK_PORT=str(worker.port),
+            WEBHOOK_PATH=WEBHOOK_PATH,
+            WEBHOOK_SECRET=self._secret,
+            WEBHOOK_HANDLE_IN_BACKGROUND="0",
+            METRICS_PORT=str(worker.metrics_port),
+            # Прерванные рассылки продолжает только первый процесс
+            RESUME_BROADCASTS="1" if worker.index == 0 and RESUME_BROADCASTS else "0",
+        )
+        return env
+
+    async def _spawn(self, worker: WorkerProcess):
+        # Своя группа процессов: Ctrl+C в терминале получает только supervisor и сам останавливает обработчики
+        worker.process = await asyncio.create_subprocess_exec(
+            *self._worker_command, env=self._worker_env(worker), start_new_session=True
+        )
+        worker.started_at = time.time()
+        logger.info("Запущен процесс-обработчик %s (pid %s, порт %s).", worker.index, worker.process.pid, worker.port)
+
+    async def _monitor(self, worker: WorkerProcess):
+        """Перезапускает процесс-обработчик, если он завершился не по команде supervisor."""
+        delay = 1.0
+        while True:
+            returncode = await worker.process.wait()
+            if self._stopping:
+                return
+            logger.error("Процесс-обработчик %s завершился с кодом %s. Перезапуск через %.0f с.", worker.index, returncode, delay)
+            await asyncio.sleep(delay)
+            if self._stopping:
+                return
+            # Процесс, проработавший дольше максимальной паузы, считаем стабильным и сбрасываем паузу
+            delay = 1.0 if time.time() - worker.started_at > _RESTART_MAX_DELAY else min(delay * 2, _RESTART_MAX_DELAY)
+            worker.restarts += 1
+            await self._spawn(worker)
+
+    async def start(self):
+        """Запускает процессы-обработчики и эндпоинт метрик supervisor."""
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=5))
+        for worker in self._workers:
+            await self._spawn(worker)
+            self._monitors.append(asyncio.create_task(self._monitor(worker), name=f"worker-monitor-{worker.index}"))
+        logger.info("Supervisor запустил %s процессов-обработчиков.", len(self._workers))
+
+    async def close(self):
+        """Дожидается передачи принятых обновлений и останавливает процессы-обработчики."""
+        self._stopping = True
+        lanes = list(self._lanes.values())
+        if lanes:
+            logger.info("Ожидание обработки %s принятых обновлений...", len(lanes))
+            await asyncio.wait(lanes, timeout=_STOP_TIMEOUT)
+        if self.pending_updates:
+            logger.warning(
+                "Не переданы процессам-обработчикам обновления: %s. В режиме polling Telegram вернет их после "
+                "перезапуска, в режиме webhook они потеряны.", sorted(self.pending_updates)
+            )
+        for task in self._monitors:
+            task.cancel()
+        for worker in self._workers:
+            if worker.alive:
+                # SIGINT, а не SIGTERM: bot.py завершается штатно и сохраняет состояния FSM
+                worker.process.send_signal(signal.SIGINT)
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            try:
+                await asyncio.wait_for(worker.process.wait(), _STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Процесс-обработчик %s не завершился за %s с и будет остановлен принудительно.", worker.index, _STOP_TIMEOUT)
+                worker.process.kill()
+                await worker.process.wait()
+        if self._session is not None:
+            await self._session.close()
+        logger.info("Supervisor остановлен.")
+
+    async def dispatch(self, update: dict):
+        """
+        Принимает обновление к передаче и сразу возвращается: обновление
+        ставится в очередь своего пользователя, а место среди max_in_flight
+        передаваемых обновлений занимает, только когда подойдет его очередь.
+        """
+        key = route_key(update)
+        update_id = update.get("update_id")
+        worker = self._workers[key % len(self._workers)]
+        previous = self._lanes.get(key)
+        task = asyncio.create_task(self._forward_after(previous, worker, update))
+        self._lanes[key] = task
+        self.pending_updates.add(update_id)
+
+        def release(finished: asyncio.Task):
+            if self._lanes.get(key) is finished:
+                del self._lanes[key]
+            self.pending_updates.discard(update_id)
+            self._delivered.set()
+        task.add_done_callback(release)
+
+    async def _forward_after(self, previous: asyncio.Task | None, worker: WorkerProcess, update: dict):
+        if previous is not None:
+            await asyncio.wait([previous])
+        async with self._slots:
+            worker.in_flight += 1
+            try:
+                await self._forward(worker, update)
+            finally:
+                worker.in_flight -= 1
+
+    async def _forward(self, worker: WorkerProcess, update: dict):
+        """
+        Передает обновление процессу и ждет, пока тот его обработает. При ошибке
+        соединения (процесс перезапускается) повторяет попытки; ошибку хендлера
+        не повторяет, чтобы не выполнить действие пользователя дважды.
+        """
+        deadline = time.monotonic() + _FORWARD_RETRY_TIMEOUT
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self._secret}
+        while True:
+            try:
+                async with self._session.post(worker.url, json=update, headers=headers) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        logger.error(
+                            "Процесс-обработчик %s вернул %s на обновление %s.", worker.index, response.status, update.get("update_id")
+                        )
+                        self.failed[worker.index] += 1
+                    else:
+                        self.routed[worker.index] += 1
+                    return
+            except aiohttp.ClientConnectionError as e:
+                if time.monotonic() >= deadline or self._stopping and not worker.alive:
+                    logger.error(
+                        "Обновление %s не передано процессу-обработчику %s: %s", update.get("update_id"), worker.index, e
+                    )
+                    self.failed[worker.index] += 1
+                    return
+                await asyncio.sleep(0.5)
+
+    # --- Получение обновлений ---
+
+    async def run_polling(self, bot: Bot):
+        """
+        Получает обновления через getUpdates и раздает их процессам.
+
+        offset не уходит дальше самого раннего еще не переданного обновления,
+        поэтому Telegram повторно возвращает принятые, но не переданные
+        обновления; они пропускаются по update_id. Если новых обновлений в
+        ответе нет, следующий запрос ждет передачи хотя бы одного из принятых
+        (не дольше _REPOLL_DELAY секунд), чтобы не опрашивать Telegram в цикле.
+        """
+        await bot.delete_webhook(drop_pending_updates=False)
+        logger.info("Supervisor запускается в режиме polling...")
+        offset = None
+        last_update_id = None
+        backoff = 1.0
+        while True:
+            if last_update_id is not None:
+                offset = min(self.pending_updates, default=last_update_id + 1)
+            self._delivered.clear()
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=_POLLING_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка getUpdates: %s. Повтор через %.0f с.", e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            backoff = 1.0
+            new_updates = [u for u in updates if last_update_id is None or u.update_id > last_update_id]
+            for update in new_updates:
+                await self.dispatch(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+                last_update_id = update.update_id
+            if updates and not new_updates and self.pending_updates:
+                try:
+                    await asyncio.wait_for(self._delivered.wait(), _REPOLL_DELAY)
+                except asyncio.TimeoutError:
+                    pass
+
+    def build_webhook_app(self) -> web.Application:
+        """aiohttp-приложение, принимающее вебхук Telegram и раздающее обновления процессам."""
+        async def handle_update(request: web.Request) -> web.Response:
+            if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+                return web.Response(status=401)
+            await self.dispatch(await request.json(loads=json.loads))
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, handle_update)
+        return app
+
+    async def run_webhook(self, bot: Bot):
+        """Запускает HTTP-сервер вебхука supervisor (аналог run_webhook из bot.py)."""
+        if WEBHOOK_BASE_URL:
+            await bot.set_webhook(
+                url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET or None,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                drop_pending_updates=False
+            )
+            logger.info("Вебхук зарегистрирован: %s%s", WEBHOOK_BASE_URL.rstrip('/'), WEBHOOK_PATH)
+        elif not WEBHOOK_SECRET:
+            logger.warning("WEBHOOK_SECRET не задан: запросы к вебхуку не проверяются.")
+
+        runner = web.AppRunner(self.build_webhook_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT).start()
+        logger.info("Supervisor запущен в режиме webhook на %s:%s%s.", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    # --- Состояние и метрики ---
+
+    def health(self) -> dict:
+        now = time.time()
+        workers = [
+            {
+                "index": w.index,
+                "pid": w.process.pid if w.process else None,
+                "alive": w.alive,
+                "uptime": round(now - w.started_at, 1) if w.alive else 0,
+                "restarts": w.restarts,
+                "in_flight": w.in_flight,
+                "routed": self.routed[w.index],
+                "failed": self.failed[w.index],
+            }
+            for w in self._workers
+        ]
+        return {"status": "ok" if all(w["alive"] for w in workers) else "degraded", "workers": workers}
+
+    async def _fetch_worker_metrics(self, worker: WorkerProcess) -> str | None:
+        if not worker.metrics_port or not worker.alive:
+            return None
+        try:
+            async with self._session.get(
+                f"http://127.0.0.1:{worker.metrics_port}/metrics", timeout=aiohttp.ClientTimeout(total=5)
+            ) as response:
+                return await response.text() if response.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Не удалось получить метрики процесса-обработчика %s: %s", worker.index, e)
+            return None
+
+    async def render_metrics(self) -> str:
+        """Метрики всех процессов (с меткой worker) и счетчики supervisor в формате Prometheus."""
+        texts = await asyncio.gather(*(self._fetch_worker_metrics(w) for w in self._workers))
+        lines = merge_metrics({w.index: text for w, text in zip(self._workers, texts) if text is not None})
+        lines += ["# HELP bot_worker_up Работает ли процесс-обработчик.", "# TYPE bot_worker_up gauge"]
+        lines += [f'bot_worker_up{{worker="{w.index}"}} {int(w.alive)}' for w in self._workers]
+        lines += ["# HELP bot_worker_restarts_total Перезапуски процесса-обработчика.", "# TYPE bot_worker_restarts_total counter"]
+        lines += [f'bot_worker_restarts_total{{worker="{w.index}"}} {w.restarts}' for w in self._workers]
+        lines += ["# HELP bot_worker_in_flight Обновления, переданные процессу и еще не обработанные.", "# TYPE bot_worker_in_flight gauge"]
+        lines += [f'bot_worker_in_flight{{worker="{w.index}"}} {w.in_flight}' for w in self._workers]
+        lines += ["# HELP bot_supervisor_routed_total Обновления, переданные процессу-обработчику.", "# TYPE bot_supervisor_routed_total counter"]
+        lines += [f'bot_supervisor_routed_total{{worker="{w.index}"}} {self.routed[w.index]}' for w in self._workers]
+        lines += ["# HELP bot_supervisor_failed_total Обновления, которые процесс не принял или не смог обработать.", "# TYPE bot_supervisor_failed_total counter"]
+        lines += [f'bot_supervisor_failed_total{{worker="{w.index}"}} {self.failed[w.index]}' for w in self._workers]
+        return "\n".join(lines) + "\n"
+
+    async def start_metrics_server(self, host: str = METRICS_HOST, port: int = METRICS_PORT) -> web.AppRunner:
+        """Запускает /metrics и /health supervisor. Возвращает runner для остановки."""
+        async def handle_metrics(request: web.Request) -> web.Response:
+            return web.Response(text=await self.render_metrics(), content_type="text/plain", charset="utf-8")
+
+        async def handle_health(request: web.Request) -> web.Response:
+            health = self.health()
+            return web.json_response(health, status=200 if health["status"] == "ok" else 503)
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        app.router.add_get("/health", handle_health)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host=host, port=port).start()
+        logger.info("Метрики и состояние supervisor доступны на http://%s:%s/metrics и /health", host, port)
+        return runner
+
+
+__all__ = ['Supervisor', 'WorkerProcess', 'route_key', 'merge_metrics']
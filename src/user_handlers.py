@@ -1,17 +1,16 @@
 import logging
 import re
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
 from aiogram.enums import ParseMode
 
 from src.admin_handlers import send_application_to_admins
-from src.keyboards import (
-    USER_ASK_REGION, USER_ASK_ADDRESS_MSK, USER_ASK_ADDRESS_VLDMR,
-    get_address_keyboard, get_region_keyboard, get_confirmation_keyboard
-)
-from src.database import add_or_update_application
+from src.keyboards import get_confirmation_keyboard
+from src.catalog import Catalog
+from src.database import Database
+from src.outbox import Outbox
 
 # Настраиваем логгер для этого модуля
 logger = logging.getLogger(__name__)
@@ -38,7 +37,9 @@ async def show_confirmation_message(message_or_cq: Message | CallbackQuery, stat
     """
     user_data = await state.get_data()
     user_id = message_or_cq.from_user.id
-    logger.info(f"Показ страницы подтверждения для пользователя {user_id}. Данные: {user_data}")
+    logger.info("Показ страницы подтверждения для пользователя %s.", user_id)
+    # Полные данные анкеты (телефон и т.п.) пишем только при отладке
+    logger.debug("Данные анкеты пользователя %s: %s", user_id, user_data)
     
     text = (
         f"📝 <b>Пожалуйста, проверьте введенные данные:</b>\n\n"
@@ -67,111 +68,119 @@ async def process_age(message: Message, state: FSMContext):
     """Обрабатывает введенный возраст, валидирует и переходит к следующему шагу."""
     user_id = message.from_user.id
     if not message.text or not message.text.isdigit():
-        logger.warning(f"Пользователь {user_id} ввел некорректный возраст (не цифры): '{message.text}'")
+        logger.warning("Пользователь %s ввел некорректный возраст (не цифры): '%s'", user_id, message.text)
         await message.answer("Пожалуйста, введите возраст цифрами. Например: 25")
         return
     
     age = int(message.text)
     if not (5 < age < 100):
-        logger.warning(f"Пользователь {user_id} ввел некорректный возраст (вне диапазона): {age}")
+        logger.warning("Пользователь %s ввел некорректный возраст (вне диапазона): %s", user_id, age)
         await message.answer("Пожалуйста, укажите корректный возраст (от 6 до 99 лет).")
         return
     
-    await state.update_data(age=age)
-    user_data = await state.get_data()
+    user_data = await state.update_data(age=age)
     
     if user_data.get("editing_now"):
-        logger.info(f"Пользователь {user_id} завершил редактирование возраста. Возврат к подтверждению.")
+        logger.info("Пользователь %s завершил редактирование возраста. Возврат к подтверждению.", user_id)
         await state.update_data(editing_now=False)
         await state.set_state(UserRegistration.awaiting_confirmation)
         await show_confirmation_message(message, state)
     else:
-        logger.info(f"Пользователь {user_id} указал возраст: {age}. Переход к шагу 'гражданство'.")
+        logger.info("Пользователь %s указал возраст: %s. Переход к шагу 'гражданство'.", user_id, age)
         await message.answer("Отлично! Теперь укажите свое гражданство.")
         await state.set_state(UserRegistration.awaiting_citizenship)
 
 @user_router.message(UserRegistration.awaiting_citizenship)
-async def process_citizenship(message: Message, state: FSMContext):
+async def process_citizenship(message: Message, state: FSMContext, catalog: Catalog):
     """Обрабатывает введенное гражданство и переходит к следующему шагу."""
     user_id = message.from_user.id
     citizenship = message.text.strip()
     if not citizenship or len(citizenship) < 2:
-        logger.warning(f"Пользователь {user_id} ввел некорректное гражданство: '{citizenship}'")
+        logger.warning("Пользователь %s ввел некорректное гражданство: '%s'", user_id, citizenship)
         await message.answer("Пожалуйста, введите корректное название страны/гражданства.")
         return
 
-    await state.update_data(citizenship=citizenship)
-    user_data = await state.get_data()
+    user_data = await state.update_data(citizenship=citizenship)
 
     if user_data.get("editing_now"):
-        logger.info(f"Пользователь {user_id} завершил редактирование гражданства. Возврат к подтверждению.")
+        logger.info("Пользователь %s завершил редактирование гражданства. Возврат к подтверждению.", user_id)
         await state.update_data(editing_now=False)
         await state.set_state(UserRegistration.awaiting_confirmation)
         await show_confirmation_message(message, state)
     else:
-        logger.info(f"Пользователь {user_id} указал гражданство: '{citizenship}'. Переход к выбору региона.")
+        logger.info("Пользователь %s указал гражданство: '%s'. Переход к выбору региона.", user_id, citizenship)
         await message.answer(
             "Хорошо. В какой области Вы ищете работу?",
-            reply_markup=get_region_keyboard()
+            reply_markup=catalog.region_keyboard
         )
         await state.set_state(UserRegistration.awaiting_region)
 
 @user_router.callback_query(UserRegistration.awaiting_region, F.data.startswith("region_"))
-async def process_region_callback(callback_query: CallbackQuery, state: FSMContext):
+async def process_region_callback(callback_query: CallbackQuery, state: FSMContext, catalog: Catalog):
     """Обрабатывает выбор региона через кнопку и предлагает выбрать адрес."""
-    region_code = callback_query.data.split("_")[1]
-    
-    # Находим текст кнопки по callback_data
-    selected_region_text = next(
-        (btn.text for row in USER_ASK_REGION for btn in row if btn.callback_data == callback_query.data),
-        "Не указан"
-    )
-            
+    region_code = callback_query.data.removeprefix("region_")
+    selected_region_text = catalog.region_name(region_code)
+    address_keyboard = catalog.address_page(region_code)
+    if selected_region_text is None or address_keyboard is None:
+        logger.error("Не найдена клавиатура адресов для региона '%s'.", region_code)
+        await callback_query.message.edit_text("Выберите регион из списка:", reply_markup=catalog.region_keyboard)
+        await callback_query.answer("Этот регион больше недоступен.", show_alert=True)
+        return
+
     await state.update_data(region_code=region_code, region_name=selected_region_text)
-    logger.info(f"Пользователь {callback_query.from_user.id} выбрал регион: {selected_region_text} ({region_code}).")
+    logger.info("Пользователь %s выбрал регион: %s (%s).", callback_query.from_user.id, selected_region_text, region_code)
 
-    address_keyboard = get_address_keyboard(region_code)
-    if address_keyboard:
-        await callback_query.message.edit_text(
-            f"Вы выбрали: {selected_region_text}.\nТеперь выберите адрес объекта:",
-            reply_markup=address_keyboard
-        )
-        await state.set_state(UserRegistration.awaiting_address)
-    else:
-        logger.error(f"Не найдена клавиатура адресов для региона '{region_code}'.")
-        await callback_query.message.edit_text("Ошибка: не найдена клавиатура адресов.")
-        await callback_query.answer("Ошибка конфигурации", show_alert=True)
+    await callback_query.message.edit_text(
+        f"Вы выбрали: {selected_region_text}.\n"
+        "Теперь выберите адрес объекта или напишите часть названия улицы или населенного пункта для поиска:",
+        reply_markup=address_keyboard
+    )
+    await state.set_state(UserRegistration.awaiting_address)
     await callback_query.answer()
 
-@user_router.message(UserRegistration.awaiting_region)
-async def process_region_text_instead_of_button(message: Message):
+@user_router.message(UserRegistration.awaiting_region, flags={"throttle": "hint"})
+async def process_region_text_instead_of_button(message: Message, catalog: Catalog):
     """Ловит текстовый ввод вместо нажатия кнопки выбора региона."""
-    logger.warning(f"Пользователь {message.from_user.id} ввел текст вместо выбора региона.")
+    logger.warning("Пользователь %s ввел текст вместо выбора региона.", message.from_user.id)
     await message.answer(
         "Пожалуйста, выберите регион из предложенных вариантов, нажав на кнопку.",
-        reply_markup=get_region_keyboard()
+        reply_markup=catalog.region_keyboard
     )
 
+@user_router.callback_query(UserRegistration.awaiting_address, F.data.startswith("addrpage_"))
+async def process_address_page(callback_query: CallbackQuery, state: FSMContext, catalog: Catalog):
+    """Перелистывает страницы клавиатуры адресов."""
+    if callback_query.data == "addrpage_noop":
+        await callback_query.answer()
+        return
+    region_code, _, page = callback_query.data.removeprefix("addrpage_").rpartition("_")
+    keyboard = catalog.address_page(region_code, int(page) if page.isdigit() else 1)
+    if keyboard is None:
+        keyboard = catalog.address_page((await state.get_data()).get("region_code"))
+    await callback_query.message.edit_text(
+        "Выберите адрес объекта или напишите часть названия улицы или населенного пункта для поиска:",
+        reply_markup=keyboard
+    )
+    await callback_query.answer()
+
 @user_router.callback_query(UserRegistration.awaiting_address, F.data.startswith("address_"))
-async def process_address_callback(callback_query: CallbackQuery, state: FSMContext):
+async def process_address_callback(callback_query: CallbackQuery, state: FSMContext, catalog: Catalog):
     """Обрабатывает выбор адреса через кнопку и переходит к вводу телефона."""
-    user_data = await state.get_data()
-    region_code = user_data.get('region_code')
-    
-    source_keyboard_data = USER_ASK_ADDRESS_MSK if region_code == 'msk' else USER_ASK_ADDRESS_VLDMR if region_code == 'vldmr' else None
-    selected_address_text = "Не указан"
-    if source_keyboard_data:
-        selected_address_text = next(
-            (btn.text for row in source_keyboard_data for btn in row if btn.callback_data == callback_query.data),
-            "Не указан"
-        )
+    address_id = callback_query.data.removeprefix("address_")
+    address = catalog.address(int(address_id)) if address_id.isdigit() else None
+    if address is None:
+        # Кнопка из устаревшей клавиатуры (адрес удален из каталога или старый формат callback_data)
+        region_code = (await state.get_data()).get("region_code")
+        await callback_query.message.edit_text("Выберите адрес объекта:", reply_markup=catalog.address_page(region_code))
+        await callback_query.answer("Этот адрес больше недоступен, выберите другой.", show_alert=True)
+        return
+    selected_address_text = address.text
 
-    await state.update_data(address=selected_address_text)
-    logger.info(f"Пользователь {callback_query.from_user.id} выбрал адрес: {selected_address_text}.")
+    user_data = await state.update_data(address=selected_address_text)
+    logger.info("Пользователь %s выбрал адрес: %s.", callback_query.from_user.id, selected_address_text)
     
-    current_user_data = await state.get_data()
-    if current_user_data.get("editing_now"):
-        logger.info(f"Пользователь {callback_query.from_user.id} завершил редактирование адреса. Возврат к подтверждению.")
+    if user_data.get("editing_now"):
+        logger.info("Пользователь %s завершил редактирование адреса. Возврат к подтверждению.", callback_query.from_user.id)
         await state.update_data(editing_now=False)
         await state.set_state(UserRegistration.awaiting_confirmation)
         await show_confirmation_message(callback_query, state, edit_message=True)
@@ -183,16 +192,28 @@ async def process_address_callback(callback_query: CallbackQuery, state: FSMCont
         await state.set_state(UserRegistration.awaiting_phone)
     await callback_query.answer()
 
-@user_router.message(UserRegistration.awaiting_address)
-async def process_address_text_instead_of_button(message: Message, state: FSMContext):
-    """Ловит текстовый ввод вместо нажатия кнопки выбора адреса."""
-    logger.warning(f"Пользователь {message.from_user.id} ввел текст вместо выбора адреса.")
-    user_data = await state.get_data()
-    region_code = user_data.get('region_code')
-    address_keyboard = get_address_keyboard(region_code)
+@user_router.message(UserRegistration.awaiting_address, F.text)
+async def process_address_search(message: Message, state: FSMContext, catalog: Catalog):
+    """Ищет адреса выбранной области по введенному тексту и показывает найденные кнопками."""
+    region_code = (await state.get_data()).get('region_code')
+    found = catalog.search(region_code, message.text)
+    logger.info("Пользователь %s ищет адрес: '%s', найдено %s.", message.from_user.id, message.text, len(found))
+    if found:
+        await message.answer("Найденные адреса:", reply_markup=catalog.search_keyboard(region_code, found))
+    else:
+        await message.answer(
+            "Ничего не найдено. Попробуйте написать иначе или выберите адрес из списка:",
+            reply_markup=catalog.address_page(region_code)
+        )
+
+@user_router.message(UserRegistration.awaiting_address, flags={"throttle": "hint"})
+async def process_address_text_instead_of_button(message: Message, state: FSMContext, catalog: Catalog):
+    """Ловит ввод не текстом (стикер, фото) вместо выбора адреса."""
+    logger.warning("Пользователь %s прислал не текст вместо выбора адреса.", message.from_user.id)
+    region_code = (await state.get_data()).get('region_code')
     await message.answer(
-        "Пожалуйста, выберите адрес из предложенных вариантов, нажав на кнопку.",
-        reply_markup=address_keyboard
+        "Пожалуйста, выберите адрес из предложенных вариантов или напишите часть адреса для поиска.",
+        reply_markup=catalog.address_page(region_code)
     )
 
 @user_router.message(UserRegistration.awaiting_phone)
@@ -205,14 +226,14 @@ async def process_phone(message: Message, state: FSMContext):
     normalized_phone = re.sub(r"[ \-\(\)]", "", phone_number)
     
     if not re.fullmatch(r"(\+7|8)\d{10}", normalized_phone):
-        logger.warning(f"Пользователь {user_id} ввел некорректный телефон: '{phone_number}'")
+        logger.warning("Пользователь %s ввел некорректный телефон: '%s'", user_id, phone_number)
         await message.answer(
             "Пожалуйста, введите корректный номер телефона в формате +7XXXXXXXXXX или 8XXXXXXXXXX."
         )
         return
 
     await state.update_data(phone=phone_number)
-    logger.info(f"Пользователь {user_id} указал телефон. Переход к подтверждению анкеты.")
+    logger.info("Пользователь %s указал телефон. Переход к подтверждению анкеты.", user_id)
     
     await state.set_state(UserRegistration.awaiting_confirmation)
     await show_confirmation_message(message, state)
@@ -220,11 +241,11 @@ async def process_phone(message: Message, state: FSMContext):
 # --- Хендлеры для этапа подтверждения ---
 
 @user_router.callback_query(UserRegistration.awaiting_confirmation, F.data.startswith("edit_"))
-async def process_edit_action(callback_query: CallbackQuery, state: FSMContext):
+async def process_edit_action(callback_query: CallbackQuery, state: FSMContext, catalog: Catalog):
     """Обрабатывает нажатие кнопок 'Изменить...' и переводит FSM в нужное состояние."""
     action = callback_query.data.split("_")[1]
     user_id = callback_query.from_user.id
-    logger.info(f"Пользователь {user_id} начал редактирование поля '{action}'.")
+    logger.info("Пользователь %s начал редактирование поля '%s'.", user_id, action)
     await state.update_data(editing_now=True)
 
     actions = {
@@ -238,22 +259,23 @@ async def process_edit_action(callback_query: CallbackQuery, state: FSMContext):
         await callback_query.message.edit_text(text)
         await state.set_state(new_state)
     elif action == "region":
-        await callback_query.message.edit_text("Выберите новый регион:", reply_markup=get_region_keyboard())
+        await callback_query.message.edit_text("Выберите новый регион:", reply_markup=catalog.region_keyboard)
         await state.set_state(UserRegistration.awaiting_region)
     elif action == "address":
         user_data = await state.get_data()
         region_code = user_data.get("region_code")
-        address_keyboard = get_address_keyboard(region_code)
-        await callback_query.message.edit_text("Выберите новый адрес:", reply_markup=address_keyboard)
+        await callback_query.message.edit_text(
+            "Выберите новый адрес или напишите часть адреса для поиска:", reply_markup=catalog.address_page(region_code)
+        )
         await state.set_state(UserRegistration.awaiting_address)
     
     await callback_query.answer()
 
 @user_router.callback_query(UserRegistration.awaiting_confirmation, F.data == "confirm_submission")
-async def process_confirm_submission(callback_query: CallbackQuery, state: FSMContext, bot: Bot, admin_chat_id_from_mw: int):
+async def process_confirm_submission(callback_query: CallbackQuery, state: FSMContext, db: Database, outbox: Outbox, admin_chat_id_from_mw: int):
     """Обрабатывает финальное подтверждение, сохраняет данные и отправляет уведомление."""
     user_id = callback_query.from_user.id
-    logger.info(f"Пользователь {user_id} подтвердил свою заявку. Начинаем обработку.")
+    logger.info("Пользователь %s подтвердил свою заявку. Начинаем обработку.", user_id)
     
     user_data = await state.get_data()
     await state.clear()
@@ -265,7 +287,7 @@ async def process_confirm_submission(callback_query: CallbackQuery, state: FSMCo
     await callback_query.answer()
 
     try:
-        await add_or_update_application(
+        await db.add_or_update_application(
             user_id=user_id,
             username=callback_query.from_user.username,
             full_name=callback_query.from_user.full_name,
@@ -273,22 +295,22 @@ async def process_confirm_submission(callback_query: CallbackQuery, state: FSMCo
             existing_app_id=user_data.get("existing_app_id")
         )
         await send_application_to_admins(
-            bot=bot,
+            outbox=outbox,
             admin_chat_id=admin_chat_id_from_mw,
             user_data=user_data,
             from_user=callback_query.from_user,
             app_id=user_data.get("existing_app_id")
         )
-        logger.info(f"Заявка от пользователя {user_id} успешно сохранена в БД и отправлена администраторам.")
+        logger.info("Заявка от пользователя %s успешно сохранена в БД и отправлена администраторам.", user_id)
     except Exception as e:
-        logger.error(f"Ошибка при отправке или сохранении заявки от пользователя {user_id}: {e}", exc_info=True)
+        logger.error("Ошибка при отправке или сохранении заявки от пользователя %s: %s", user_id, e, exc_info=True)
         await callback_query.message.answer("Произошла ошибка при отправке вашей заявки. Пожалуйста, попробуйте позже.")
 
 @user_router.callback_query(UserRegistration.awaiting_confirmation, F.data == "cancel_submission")
 async def process_cancel_submission(callback_query: CallbackQuery, state: FSMContext):
     """Обрабатывает отмену подачи заявки."""
     user_id = callback_query.from_user.id
-    logger.info(f"Пользователь {user_id} отменил подачу заявки.")
+    logger.info("Пользователь %s отменил подачу заявки.", user_id)
     await state.clear()
     await callback_query.message.edit_text(
         "Заявка отменена. Чтобы начать заново, введите /start",
@@ -299,7 +321,7 @@ async def process_cancel_submission(callback_query: CallbackQuery, state: FSMCon
 @user_router.message(UserRegistration.awaiting_confirmation)
 async def process_text_in_confirmation(message: Message, state: FSMContext):
     """Ловит текстовые сообщения на этапе подтверждения."""
-    logger.warning(f"Пользователь {message.from_user.id} ввел текст на этапе подтверждения.")
+    logger.warning("Пользователь %s ввел текст на этапе подтверждения.", message.from_user.id)
     await message.answer("Пожалуйста, используйте кнопки для подтверждения или редактирования данных.")
     await show_confirmation_message(message, state)
 
@@ -0,0 +1,116 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram import types
+
+from src import admin_handlers
+from src.admin_handlers import (
+    APPLICATION_COMPLETED_NOTICE, APPLICATION_REJECTED_NOTICE, USER_BANNED_NOTICE, _application_list_item, _run_bulk_action,
+    show_applications_page
+)
+from src.ban_manager import BanCategory, BanManager
+from src.catalog import Catalog
+from tests.test_database import add_application, run_with_db
+
+
+@pytest.fixture(autouse=True)
+def clean_page_caches():
+    admin_handlers._pages_cache.clear()
+    admin_handlers._shown_pages.clear()
+
+
+def make_message(chat_id: int, message_id: int, reply_markup=None) -> MagicMock:
+    message = MagicMock()
+    message.chat.id = chat_id
+    message.message_id = message_id
+    message.reply_markup = reply_markup
+    message.edit_text = AsyncMock()
+    message.answer = AsyncMock(return_value=message)
+    return message
+
+
+def press_button(message: MagicMock) -> MagicMock:
+    """Callback от кнопки в сообщении message, которое показывает последнюю отправленную клавиатуру."""
+    sent_markup = (message.edit_text.call_args or message.answer.call_args).kwargs["reply_markup"]
+    callback = MagicMock(spec=types.CallbackQuery)
+    callback.message = make_message(message.chat.id, message.message_id, sent_markup)
+    callback.answer = AsyncMock()
+    return callback
+
+
+def test_same_page_is_not_edited_again(tmp_path):
+    async def scenario(db):
+        app_id = await add_application(db, 1)
+        catalog = Catalog([])
+        message = make_message(chat_id=100, message_id=10)
+        await show_applications_page(message, db, catalog)
+        message.answer.assert_awaited_once()
+
+        callback = press_button(message)
+        await show_applications_page(callback, db, catalog, is_edit=True)
+        callback.message.edit_text.assert_not_called()
+        callback.message.answer.assert_not_called()
+        callback.answer.assert_awaited_once()
+
+        # После изменения заявки страница другая - сообщение редактируется
+        await db.update_application_status(app_id, "updated")
+        callback = press_button(message)
+        await show_applications_page(callback, db, catalog, is_edit=True)
+        callback.message.edit_text.assert_awaited_once()
+    run_with_db(tmp_path, scenario)
+
+
+def test_page_is_edited_back_from_another_screen(tmp_path):
+    async def scenario(db):
+        await add_application(db, 1)
+        catalog = Catalog([])
+        message = make_message(chat_id=100, message_id=10)
+        await show_applications_page(message, db, catalog)
+        # Сообщение переключили на карточку заявки: клавиатура в нем уже другая
+        callback = MagicMock(spec=types.CallbackQuery)
+        callback.message = make_message(100, 10, reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[]))
+        callback.answer = AsyncMock()
+        await show_applications_page(callback, db, catalog, is_edit=True)
+        callback.message.edit_text.assert_awaited_once()
+    run_with_db(tmp_path, scenario)
+
+
+def test_list_item_escapes_user_name():
+    app_row = (1, 7, "user", "<b>Иван</b> & Ко", 30, "РФ", "Область", "Адрес", "+79001234567", "new",
+               "2025-01-30 10:00:00", "2025-01-31 23:59:59")
+    text, _ = _application_list_item(app_row, 1)
+    assert "&lt;b&gt;Иван&lt;/b&gt; &amp; Ко" in text
+
+
+def test_bulk_actions_update_applications_and_notify_users(tmp_path):
+    async def scenario(db):
+        manager = BanManager(db)
+        manager.set_admins([3])
+        await manager.load_banned_users_from_db()
+        outbox = MagicMock()
+        outbox.enqueue_many = AsyncMock(side_effect=lambda messages: len(messages))
+        first, second, admin_app = [await add_application(db, user_id) for user_id in (1, 2, 3)]
+
+        report = await _run_bulk_action("reject", [first, second], 99, db, manager, outbox, rejection_reason="нет мест")
+        assert report.startswith("✅ Отклонено заявок: 2 из 2.")
+        assert sorted(outbox.enqueue_many.call_args.args[0]) == [
+            (1, APPLICATION_REJECTED_NOTICE.format(app_id=first, reason="нет мест")),
+            (2, APPLICATION_REJECTED_NOTICE.format(app_id=second, reason="нет мест")),
+        ]
+        # Заявки, у которых статус уже такой, пропускаются
+        report = await _run_bulk_action("reject", [first], 99, db, manager, outbox, rejection_reason="-")
+        assert report.startswith("✅ Отклонено заявок: 0 из 1.")
+
+        await _run_bulk_action("complete", [first, admin_app], 99, db, manager, outbox)
+        assert sorted(outbox.enqueue_many.call_args.args[0]) == [
+            (1, APPLICATION_COMPLETED_NOTICE.format(app_id=first)), (3, APPLICATION_COMPLETED_NOTICE.format(app_id=admin_app)),
+        ]
+        assert (await db.get_application_by_id(first))[9] == "completed"
+        # Бан за принятую заявку сразу попадает в индекс; администратор не банится
+        assert manager.get_ban(1).category == BanCategory.COMPLETED
+        assert manager.get_ban(3).category == BanCategory.ADMIN
+
+        await _run_bulk_action("ban", [first, second], 99, db, manager, outbox)
+        assert outbox.enqueue_many.call_args.args[0] == [(2, USER_BANNED_NOTICE)]
+        assert manager.get_ban(2).category == BanCategory.MANUAL
+    run_with_db(tmp_path, scenario)
@@ -0,0 +1,142 @@
+import asyncio
+import math
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import ban_manager
+from src.ban_manager import BanCategory, BanIndex, BanManager, parse_duration
+from tests.test_database import run_with_db
+
+
+def run_with_bans(tmp_path, scenario):
+    """Выполняет scenario(manager, db) с BanManager, загруженным из новой БД."""
+    async def with_manager(db):
+        manager = BanManager(db)
+        await manager.load_banned_users_from_db()
+        return await scenario(manager, db)
+    return run_with_db(tmp_path, with_manager)
+
+
+def external(tmp_path, *statements: tuple[str, tuple]):
+    """Изменения blocked_users и журнала из другого процесса."""
+    with sqlite3.connect(tmp_path / "test.db") as conn:
+        for sql, params in statements:
+            conn.execute(sql, params)
+
+
+def ban_row(user_id: int, category: str = "manual", expires_at: float | None = None) -> tuple[str, tuple]:
+    return (
+        "INSERT INTO blocked_users (user_id, reason, category, banned_at, expires_at, banned_by) VALUES (?, 'x', ?, ?, ?, NULL)",
+        (user_id, category, time.time(), expires_at),
+    )
+
+
+@pytest.mark.parametrize("text, seconds", [("30m", 1800), ("12h", 43200), ("7D", 604800), ("2w", 1209600), ("0d", None), ("7", None)])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == seconds
+
+
+def test_ban_and_unban(tmp_path):
+    async def scenario(manager: BanManager, db):
+        assert await manager.add_banned_user(1, "spam", duration=3600)
+        assert not await manager.add_banned_user(1, "spam")
+        ban = manager.get_ban(1)
+        assert ban.category == BanCategory.MANUAL and ban.expires_at > time.time()
+        assert [row[0] for row in await db.get_banlist(time.time())] == [1]
+        assert await manager.remove_banned_user(1)
+        assert not manager.is_banned(1)
+        assert not await manager.remove_banned_user(1)
+    run_with_bans(tmp_path, scenario)
+
+
+def test_admins_are_banned_only_in_memory(tmp_path):
+    async def scenario(manager: BanManager, db):
+        manager.set_admins([5])
+        assert manager.get_ban(5).category == BanCategory.ADMIN
+        assert not await manager.remove_banned_user(5)
+        assert manager.is_banned(5)
+        assert await db.get_banlist(time.time()) == []
+        # Журнал не перезаписывает бан администратора
+        external(tmp_path, ban_row(5))
+        await manager.sync()
+        assert manager.get_ban(5).category == BanCategory.ADMIN
+    run_with_bans(tmp_path, scenario)
+
+
+def test_expired_ban_is_ignored_and_can_be_removed(tmp_path, monkeypatch):
+    async def scenario(manager: BanManager, db):
+        await manager.add_banned_user(1, "completed application", BanCategory.COMPLETED, duration=60)
+        assert manager.get_ban(1).category == BanCategory.COMPLETED
+        later = time.time() + 120
+        monkeypatch.setattr(ban_manager, "time", SimpleNamespace(time=lambda: later))
+        assert not manager.is_banned(1)
+        assert await db.get_banlist(later) == []
+        # Запись в БД осталась - снятие бана должно сообщить об успехе
+        assert await manager.remove_banned_user(1)
+    run_with_bans(tmp_path, scenario)
+
+
+def test_bans_from_another_process_arrive_through_sync(tmp_path):
+    async def scenario(manager: BanManager, db):
+        external(tmp_path, ban_row(1, "completed"), ban_row(2, "unknown"))
+        assert not manager.is_banned(1)
+        assert await manager.sync() == 2
+        assert manager.get_ban(1).category == BanCategory.COMPLETED
+        assert manager.get_ban(2).category == BanCategory.MANUAL
+        external(tmp_path, ("DELETE FROM blocked_users WHERE user_id = ?", (1,)))
+        assert await manager.sync() == 1
+        assert not manager.is_banned(1)
+        assert await manager.sync() == 0
+    run_with_bans(tmp_path, scenario)
+
+
+@pytest.mark.parametrize("trimmed", ["all", "first"])
+def test_trimmed_journal_forces_full_reload(tmp_path, trimmed):
+    async def scenario(manager: BanManager, db):
+        external(tmp_path, ban_row(1), ban_row(2))
+        # Процесс отстал, и журнал успели очистить дальше его позиции
+        last_id = await db.get_last_ban_event_id()
+        bound = last_id if trimmed == "all" else last_id - 1
+        external(tmp_path, ("DELETE FROM ban_events WHERE id <= ?", (bound,)))
+        assert await manager.sync() == 0
+        assert manager.is_banned(1) and manager.is_banned(2)
+        # После перезагрузки позиция - конец журнала, новые записи применяются как обычно
+        external(tmp_path, ban_row(3))
+        assert await manager.sync() == 1
+        assert manager.is_banned(3)
+    run_with_bans(tmp_path, scenario)
+
+
+def test_index_lookup_and_sweep():
+    now = 1000.0
+    index = BanIndex.build([(3, BanCategory.MANUAL, None), (1, BanCategory.COMPLETED, now + 10), (2, BanCategory.MANUAL, now - 1)])
+    assert len(index) == 3
+    assert index.get(2, now) is None
+    assert index.get(1, now).expires_at == now + 10
+    assert asyncio.run(index.sweep_if_due(now)) == 1
+    assert len(index) == 2
+    assert index.get(3, now).expires_at is None
+    # Следующий срок окончания - бан пользователя 1
+    assert asyncio.run(index.sweep_if_due(now + 5)) == 0
+    assert asyncio.run(index.sweep(now + 20)) == 1
+    assert [index.get(user_id, now + 20) is not None for user_id in (1, 3)] == [False, True]
+    assert index._next_expiry == math.inf
+
+
+def test_sweep_discards_result_when_index_changes():
+    now = 1000.0
+    index = BanIndex.build([(user_id, BanCategory.MANUAL, now - 1) for user_id in range(10)])
+
+    async def sweep_with_concurrent_ban():
+        sweep = asyncio.create_task(index.sweep(now))
+        await asyncio.sleep(0)
+        index.add(100, BanCategory.MANUAL, None)
+        return await sweep
+
+    assert asyncio.run(sweep_with_concurrent_ban()) == 0
+    assert index.get(100, now) is not None
+    assert asyncio.run(index.sweep_if_due(now)) == 10
+    assert len(index) == 1
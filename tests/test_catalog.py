@@ -0,0 +1,92 @@
+import json
+import sqlite3
+
+import pytest
+
+from src.catalog import Address, AddressSearchIndex, Catalog, normalize, _trigrams
+from src.config import ADDRESSES_PER_PAGE
+from tests.test_database import run_with_db
+
+
+ADDRESSES = [
+    Address(1, "msk", "ул. Калинина, 6"),
+    Address(2, "msk", "Мытищи, ул. Калининская, 12"),
+    Address(3, "msk", "Королёв, пр-т Космонавтов, 1"),
+    Address(4, "msk", "д. Ям, 3"),
+]
+
+
+@pytest.fixture
+def index():
+    return AddressSearchIndex(ADDRESSES)
+
+
+def ids(addresses):
+    return [address.id for address in addresses]
+
+
+def test_normalize():
+    assert normalize("  Королёв, пр-т  Космонавтов!") == "королев пр т космонавтов"
+
+
+def test_trigrams():
+    assert _trigrams("ям") == set()
+    assert _trigrams("калин") == {"кал", "али", "лин"}
+
+
+def test_search_by_substring_prefers_word_start(index):
+    assert ids(index.search("калин")) == [1, 2]
+    assert ids(index.search("алинин")) == [1, 2]
+
+
+def test_search_requires_all_words(index):
+    assert ids(index.search("калининская мытищи")) == [2]
+    assert ids(index.search("калинина мытищи")) == []
+
+
+def test_search_short_word_uses_prefix(index):
+    assert ids(index.search("ям")) == [4]
+    assert ids(index.search("ул")) == [1, 2]
+
+
+def test_search_normalizes_query(index):
+    assert ids(index.search("КОРОЛЁВ")) == [3]
+    assert index.search("  ,. ") == []
+
+
+def test_search_limit(index):
+    assert ids(index.search("ул", limit=1)) == [1]
+
+
+def callbacks(markup) -> list[str]:
+    return [button.callback_data for row in markup.inline_keyboard for button in row]
+
+
+def test_catalog_is_seeded_once_and_loaded_from_database(tmp_path):
+    seed_path = tmp_path / "catalog.json"
+    seed_path.write_text(json.dumps({"regions": [
+        {"code": "msk", "name": "Московская область", "addresses": [f"Адрес {n}" for n in range(1, ADDRESSES_PER_PAGE + 4)]},
+        {"code": "spb", "name": "Ленинградская область", "addresses": ["Невский пр-т, 1"]},
+    ]}, ensure_ascii=False), encoding="utf-8")
+
+    async def scenario(db):
+        catalog = await Catalog.load(db, str(seed_path))
+        assert [(region.code, len(region.addresses)) for region in catalog.regions] == [("msk", ADDRESSES_PER_PAGE + 3), ("spb", 1)]
+        assert catalog.region_name("spb") == "Ленинградская область"
+        assert catalog.search("spb", "невский")[0].text == "Невский пр-т, 1"
+
+        # Каталог уже в БД: файл больше не читается, отключенный адрес не загружается
+        first_address = catalog.regions[0].addresses[0]
+        with sqlite3.connect(tmp_path / "test.db") as conn:
+            conn.execute("UPDATE catalog_addresses SET active = 0 WHERE id = ?", (first_address.id,))
+        reloaded = await Catalog.load(db, str(tmp_path / "missing.json"))
+        assert reloaded.address(first_address.id) is None
+        assert len(reloaded.regions[0].addresses) == ADDRESSES_PER_PAGE + 2
+        page_ids = [address.id for address in reloaded.regions[0].addresses[:ADDRESSES_PER_PAGE]]
+        assert [f"address_{address_id}" for address_id in page_ids] == [
+            data for data in callbacks(reloaded.address_page("msk", 1)) if data.startswith("address_")
+        ]
+        # Номер страницы ограничивается диапазоном
+        assert reloaded.address_page("msk", 10) is reloaded.address_page("msk", 2)
+        assert reloaded.address_page("unknown") is None
+    run_with_db(tmp_path, scenario)
@@ -0,0 +1,261 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.database import Database, PageCursor, init_db
+
+
+APP_ROW = (42, 7, "user", "User", 30, "РФ", "Область", "Адрес", "+79001234567", "new", "2025-01-30 10:00:00", "2025-01-31 23:59:59")
+
+
+@pytest.mark.parametrize("backward", [False, True])
+def test_page_cursor_round_trip(backward):
+    cursor = PageCursor(backward=backward, updated_at="2025-01-31 23:59:59", app_id=42)
+    assert PageCursor.decode(cursor.encode()) == cursor
+
+
+def test_page_cursor_encode_is_compact():
+    encoded = PageCursor(backward=False, updated_at="2025-01-31 23:59:59", app_id=42).encode()
+    assert encoded == "a20250131235959x42"
+
+
+def test_page_cursor_from_row():
+    assert PageCursor.after(APP_ROW) == PageCursor(False, "2025-01-31 23:59:59", 42)
+    assert PageCursor.before(APP_ROW) == PageCursor(True, "2025-01-31 23:59:59", 42)
+
+
+@pytest.mark.parametrize("raw", ["", "c20250131235959x42", "a2025013123595x42", "a20250131235959y42", "a2025013123595ax42", "a20250131235959x"])
+def test_page_cursor_decode_rejects_malformed(raw):
+    with pytest.raises(ValueError):
+        PageCursor.decode(raw)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Иван", '"иван"*'),
+    ("иван  петров", '"иван"* "петров"*'),
+    ("89001234567", '"79001234567"*'),
+    ("+7 900", '"7"* "900"*'),
+    ("8900", '"8900"*'),
+    ('"; DROP', '"drop"*'),
+    ("", ""),
+])
+def test_fts_query(text, expected):
+    assert Database._fts_query(text) == expected
+
+
+def run_with_db(tmp_path, scenario):
+    """Выполняет scenario(db) на новой БД во временном каталоге."""
+    async def main():
+        db = await init_db(str(tmp_path / "test.db"))
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+async def add_application(db: Database, user_id: int, **fields) -> int:
+    data = {"age": 30, "citizenship": "РФ", "region_name": "Область", "address": "Адрес", "phone": "+79001234567"}
+    await db.add_or_update_application(user_id, f"user{user_id}", f"User {user_id}", data | fields)
+    return (await db.get_application_by_user_id(user_id))[0]
+
+
+def insert_applications(path, rows: list[tuple[int, str, str, str]]):
+    """Заявки (user_id, статус, область, updated_at) напрямую в БД: так задаются нужные даты изменения."""
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO applications (user_id, username, full_name, age, citizenship, region_name, address, phone, status, "
+            "created_at, updated_at) VALUES (?, 'user', 'User', 30, 'РФ', ?, 'Адрес', '+79001234567', ?, ?, ?)",
+            [(user_id, region, status, updated_at, updated_at) for user_id, status, region, updated_at in rows]
+        )
+
+
+def test_application_cache_hits_and_misses(tmp_path):
+    async def scenario(db: Database):
+        app_id = await add_application(db, 1)
+        cache = db.applications_by_user
+        hits, misses = cache.hits, cache.misses
+        assert (await db.get_application_by_user_id(1))[0] == app_id
+        assert (cache.hits, cache.misses) == (hits + 1, misses)
+        # Отрицательный результат тоже кэшируется
+        assert await db.get_application_by_user_id(2) is None
+        assert await db.get_application_by_user_id(2) is None
+        assert (cache.hits, cache.misses) == (hits + 2, misses + 1)
+        # Поиск по ID - отдельный кэш
+        assert (await db.get_application_by_id(app_id))[1] == 1
+        assert (await db.get_application_by_id(app_id))[1] == 1
+        assert (db.applications_by_id.hits, db.applications_by_id.misses) == (1, 1)
+    run_with_db(tmp_path, scenario)
+
+
+def test_own_writes_invalidate_only_affected_entries(tmp_path):
+    async def scenario(db: Database):
+        first, second = await add_application(db, 1), await add_application(db, 2)
+        await db.get_application_by_id(first)
+        await db.get_application_by_id(second)
+        await db.update_application_status(first, "rejected")
+        hits = db.applications_by_id.hits
+        assert (await db.get_application_by_id(first))[9] == "rejected"
+        assert (await db.get_application_by_id(second))[9] == "new"
+        assert db.applications_by_id.hits == hits + 1
+        # Запись по user_id сброшена вместе с записью по ID
+        assert (await db.get_application_by_user_id(1))[9] == "rejected"
+
+        await db.add_or_update_application(2, "user2", "User 2", {"phone": "+79990000000"}, existing_app_id=second)
+        assert (await db.get_application_by_user_id(2))[8] == "+79990000000"
+        assert (await db.get_application_by_id(second))[9] == "updated"
+
+        rows, _ = await db.bulk_update_applications([first, second], "completed")
+        assert len(rows) == 2
+        assert [(await db.get_application_by_user_id(user_id))[9] for user_id in (1, 2)] == ["completed", "completed"]
+        # Свои записи не сбрасывают кэши целиком при сверке версии
+        assert not await db.sync_application_caches()
+    run_with_db(tmp_path, scenario)
+
+
+def test_foreign_write_is_picked_up_by_version_sync(tmp_path):
+    async def scenario(db: Database):
+        app_id = await add_application(db, 1)
+        await db.sync_application_caches()
+        assert (await db.get_application_by_id(app_id))[9] == "new"
+        # Изменение из другого процесса
+        with sqlite3.connect(tmp_path / "test.db") as conn:
+            conn.execute("UPDATE applications SET status = 'rejected' WHERE id = ?", (app_id,))
+        assert (await db.get_application_by_id(app_id))[9] == "new"
+        assert await db.sync_application_caches()
+        assert (await db.get_application_by_id(app_id))[9] == "rejected"
+        assert not await db.sync_application_caches()
+    run_with_db(tmp_path, scenario)
+
+
+def test_keyset_pages_match_offset_pages(tmp_path):
+    async def scenario(db: Database):
+        statuses = ["new", "updated", "updated_conflict", "rejected"]
+        # Одинаковые updated_at у соседних заявок: порядок внутри них задает id
+        insert_applications(tmp_path / "test.db", [
+            (user_id, statuses[user_id % 4], "Область A" if user_id % 3 else "Область B", f"2025-01-{1 + user_id // 2:02d} 10:00:00")
+            for user_id in range(1, 24)
+        ])
+        for region_name in (None, "Область A"):
+            query = dict(per_page=4, status_filter=statuses[:3], region_name=region_name)
+            first_page, total_pages, total = await db.get_applications_paginated(page=1, **query)
+            offset_pages = [first_page] + [
+                (await db.get_applications_paginated(page=page, **query))[0] for page in range(2, total_pages + 1)
+            ]
+            assert sum(map(len, offset_pages)) == total
+
+            forward = [first_page]
+            for page in range(2, total_pages + 1):
+                cursor = PageCursor.after(forward[-1][-1])
+                forward.append((await db.get_applications_paginated(page=page, cursor=cursor, **query))[0])
+            assert forward == offset_pages
+
+            backward = [forward[-1]]
+            for page in range(total_pages - 1, 0, -1):
+                cursor = PageCursor.before(backward[0][0])
+                backward.insert(0, (await db.get_applications_paginated(page=page, cursor=cursor, **query))[0])
+            assert backward == offset_pages
+    run_with_db(tmp_path, scenario)
+
+
+def status_counts_by_scan(path) -> dict[str, int]:
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM applications GROUP BY status").fetchall())
+
+
+def test_status_counts_follow_application_changes(tmp_path):
+    path = tmp_path / "test.db"
+
+    async def scenario(db: Database):
+        first, second = [await add_application(db, user_id) for user_id in (1, 2)]
+        await db.update_application_status(first, "completed")
+        # Повторная запись того же статуса не меняет счетчики
+        await db.update_application_status(first, "completed")
+        await db.bulk_update_applications([second], "rejected")
+        # Изменения из другого процесса учитываются теми же триггерами
+        insert_applications(path, [(3, "new", "Область", "2025-01-01 10:00:00"), (4, "new", "Область", "2025-01-01 10:00:00")])
+        with sqlite3.connect(path) as conn:
+            conn.execute("DELETE FROM applications WHERE user_id = 3")
+        assert await db.get_status_counts() == status_counts_by_scan(path) == {"completed": 1, "rejected": 1, "new": 1}
+    run_with_db(tmp_path, scenario)
+
+
+def test_status_counts_are_backfilled_for_existing_database(tmp_path):
+    path = tmp_path / "test.db"
+    run_with_db(tmp_path, Database.get_status_counts)
+    # БД от версии без счетчиков: заявки есть, таблицы application_stats нет
+    with sqlite3.connect(path) as conn:
+        for trigger in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER application_stats_{trigger}")
+        conn.execute("DROP TABLE application_stats")
+    insert_applications(path, [(1, "new", "Область", "2025-01-01 10:00:00"), (2, "completed", "Область", "2025-01-01 10:00:00")])
+
+    async def scenario(db: Database):
+        assert await db.get_status_counts() == {"new": 1, "completed": 1}
+        await add_application(db, 3)
+        assert await db.get_status_counts() == status_counts_by_scan(path)
+    run_with_db(tmp_path, scenario)
+
+
+def test_search_applications(tmp_path):
+    async def scenario(db: Database):
+        by_address = await add_application(db, 1, address="ул. Калинина, 6")
+        by_name = await add_application(db, 2)
+        await db.add_or_update_application(2, "user2", "Калинин Иван", {"phone": "+79161112233"})
+        await add_application(db, 3)
+
+        rows, total_pages, total = await db.search_applications("КАЛИН")
+        # Совпадение в ФИО весит больше, чем в адресе
+        assert [row[0] for row in rows] == [by_name, by_address] and (total_pages, total) == (1, 2)
+        for phone in ("89161112233", "+7916111"):
+            assert [row[0] for row in (await db.search_applications(phone))[0]] == [by_name]
+        rows, total_pages, total = await db.search_applications("калин", page=2, per_page=1)
+        assert [row[0] for row in rows] == [by_address] and (total_pages, total) == (2, 2)
+
+        # Индекс следует за изменениями заявок, в том числе из другого процесса
+        await db.add_or_update_application(2, "user2", "Петров Иван", {})
+        assert [row[0] for row in (await db.search_applications("калин"))[0]] == [by_address]
+        with sqlite3.connect(tmp_path / "test.db") as conn:
+            conn.execute("DELETE FROM applications WHERE id = ?", (by_address,))
+        assert await db.search_applications("калин") == ([], 0, 0)
+        assert await db.search_applications(" , ") == ([], 0, 0)
+    run_with_db(tmp_path, scenario)
+
+
+def test_search_index_is_built_for_existing_database(tmp_path):
+    path = tmp_path / "test.db"
+    run_with_db(tmp_path, Database.get_status_counts)
+    with sqlite3.connect(path) as conn:
+        for trigger in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER applications_fts_{trigger}")
+        conn.execute("DROP TABLE applications_fts")
+    insert_applications(path, [(1, "new", "Тверская область", "2025-01-01 10:00:00")])
+
+    async def scenario(db: Database):
+        rows, _, total = await db.search_applications("тверская")
+        assert total == 1 and rows[0][1] == 1
+    run_with_db(tmp_path, scenario)
+
+
+def test_data_version_follows_applications_and_bans(tmp_path):
+    path = tmp_path / "test.db"
+
+    async def scenario(db: Database):
+        versions = [await db.get_applications_version()]
+        app_id = await add_application(db, 1)
+        versions.append(await db.get_applications_version())
+        await db.update_application_status(app_id, "rejected")
+        versions.append(await db.get_applications_version())
+        with sqlite3.connect(path) as conn:
+            conn.execute("INSERT INTO blocked_users (user_id, reason, category, banned_at) VALUES (2, 'x', 'manual', 0)")
+        versions.append(await db.get_applications_version())
+        with sqlite3.connect(path) as conn:
+            conn.execute("DELETE FROM blocked_users")
+        versions.append(await db.get_applications_version())
+        assert versions == sorted(set(versions))
+        # Другие таблицы версию не меняют
+        await db.save_fsm_records([("key", "Form:age", "{}", 0.0)], [])
+        await db.enqueue_outbox(1, "текст")
+        assert await db.get_applications_version() == versions[-1]
+    run_with_db(tmp_path, scenario)
@@ -0,0 +1,106 @@
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from aiogram.fsm.storage.base import StorageKey
+
+from src import fsm_storage
+from src.database import Database
+from src.fsm_storage import BufferedFSMContext, SQLiteStorage
+from tests.test_database import run_with_db
+
+
+def storage_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def test_changes_reach_database_only_on_flush(tmp_path):
+    async def scenario(db: Database):
+        storage = SQLiteStorage(db)
+        key = storage_key(7)
+        await storage.set_state(key, "Form:age")
+        await storage.update_data(key, {"name": "Иван"})
+        assert await db.get_fsm_record(SQLiteStorage._key(key)) is None
+        # Чтение до сброса отдается из памяти процесса
+        assert await storage.get_state(key) == "Form:age"
+
+        await storage.flush()
+        state, data_json, _ = await db.get_fsm_record(SQLiteStorage._key(key))
+        assert (state, json.loads(data_json)) == ("Form:age", {"name": "Иван"})
+        # Новый процесс поднимает сессию из БД
+        restarted = SQLiteStorage(db)
+        assert await restarted.get_state(key) == "Form:age"
+        assert await restarted.get_data(key) == {"name": "Иван"}
+
+        # Пустая сессия удаляется из БД
+        await storage.set_state(key, None)
+        await storage.set_data(key, {})
+        await storage.close()
+        assert await db.get_fsm_record(SQLiteStorage._key(key)) is None
+    run_with_db(tmp_path, scenario)
+
+
+def test_evicted_dirty_session_is_not_lost(tmp_path):
+    async def scenario(db: Database):
+        storage = SQLiteStorage(db, cache_size=1)
+        first, second = storage_key(1), storage_key(2)
+        await storage.set_state(first, "Form:age")
+        await storage.set_state(second, "Form:phone")
+        assert len(storage._cache) == 1
+        # Вытесненная до сброса сессия читается из памяти, а не из БД
+        assert await storage.get_state(first) == "Form:age"
+        await storage.flush()
+        assert not storage._evicted_dirty
+        assert await db.get_fsm_state_counts() == {"Form:age": 1, "Form:phone": 1}
+    run_with_db(tmp_path, scenario)
+
+
+def test_failed_flush_keeps_changes(tmp_path):
+    async def scenario(db: Database):
+        storage = SQLiteStorage(db)
+        key = storage_key(7)
+        await storage.set_state(key, "Form:age")
+        save = db.save_fsm_records
+        db.save_fsm_records = AsyncMock(side_effect=RuntimeError("disk I/O error"))
+        await storage.flush()
+        db.save_fsm_records = save
+        await storage.flush()
+        assert (await db.get_fsm_record(SQLiteStorage._key(key)))[0] == "Form:age"
+    run_with_db(tmp_path, scenario)
+
+
+def test_sweep_removes_abandoned_sessions(tmp_path, monkeypatch):
+    async def scenario(db: Database):
+        storage = SQLiteStorage(db, ttl=60)
+        await storage.set_state(storage_key(1), "Form:age")
+        await storage.flush()
+        later = time.time() + 120
+        monkeypatch.setattr(fsm_storage, "time", SimpleNamespace(time=lambda: later))
+        await storage.set_state(storage_key(2), "Form:phone")
+        await storage.flush()
+
+        await storage.sweep_expired()
+        assert list(storage._cache) == [SQLiteStorage._key(storage_key(2))]
+        assert await db.get_fsm_state_counts() == {"Form:phone": 1}
+    run_with_db(tmp_path, scenario)
+
+
+def test_buffered_context_writes_once_per_update(tmp_path):
+    async def scenario(db: Database):
+        storage = SQLiteStorage(db)
+        key = storage_key(7)
+        await storage.set_data(key, {"name": "Иван"})
+        context = BufferedFSMContext(storage, key, raw_state="Form:name")
+        assert await context.get_state() == "Form:name"
+        assert await context.get_value("name") == "Иван"
+        await context.update_data(age=30)
+        await context.update_data(phone="+79001234567")
+        await context.set_state("Form:confirm")
+        assert await storage.get_data(key) == {"name": "Иван"}
+
+        await context.flush()
+        assert (context.reads, context.writes) == (1, 2)
+        assert await storage.get_state(key) == "Form:confirm"
+        assert await storage.get_data(key) == {"name": "Иван", "age": 30, "phone": "+79001234567"}
+    run_with_db(tmp_path, scenario)
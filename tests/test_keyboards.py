@@ -0,0 +1,72 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.keyboards import APP_FILTER_PERIODS, APP_FILTER_STATUSES, ApplicationFilter
+from tests.test_database import insert_applications, run_with_db
+
+
+@pytest.mark.parametrize("app_filter", [
+    ApplicationFilter(),
+    ApplicationFilter("r", "w", "vldmr"),
+    ApplicationFilter("x", "d", None),
+] + [ApplicationFilter(status, period, "msk") for status in APP_FILTER_STATUSES for period in APP_FILTER_PERIODS])
+def test_application_filter_round_trip(app_filter):
+    assert ApplicationFilter.decode(app_filter.encode()) == app_filter
+
+
+def test_application_filter_encode():
+    assert ApplicationFilter("r", "w", "vldmr").encode() == "rwvldmr"
+    assert ApplicationFilter().encode() == "aa"
+
+
+@pytest.mark.parametrize("raw", [None, "", "a", "za", "az", "zzmsk"])
+def test_application_filter_decode_falls_back_to_default(raw):
+    assert ApplicationFilter.decode(raw) == ApplicationFilter()
+
+
+def test_application_filter_statuses():
+    assert ApplicationFilter("c").statuses == ["completed"]
+    assert ApplicationFilter().statuses == ["new", "updated", "updated_conflict"]
+
+
+def test_application_filter_updated_since():
+    now = datetime(2025, 1, 31, 12, 0, 0)
+    assert ApplicationFilter(period="a").updated_since(now) is None
+    assert ApplicationFilter(period="d").updated_since(now) == "2025-01-30 12:00:00"
+    assert ApplicationFilter(period="w").updated_since(now) == "2025-01-24 12:00:00"
+
+
+def test_application_filter_updated_since_defaults_to_utc_now():
+    since = datetime.strptime(ApplicationFilter(period="d").updated_since(), "%Y-%m-%d %H:%M:%S")
+    expected = datetime(*time.gmtime()[:6]) - timedelta(days=1)
+    assert abs(since - expected) < timedelta(seconds=5)
+
+
+@pytest.mark.parametrize("app_filter, region_name, expected_users", [
+    (ApplicationFilter(), None, [4, 1, 2]),
+    (ApplicationFilter("a", "d"), None, [4, 1]),
+    (ApplicationFilter("a", "d"), "Область A", [1]),
+    (ApplicationFilter("r", "a"), "Область A", [3]),
+    (ApplicationFilter("x", "w"), "Область A", [3, 1]),
+    (ApplicationFilter("c"), None, []),
+])
+def test_filtered_application_list(tmp_path, app_filter, region_name, expected_users):
+    async def scenario(db):
+        insert_applications(tmp_path / "test.db", [
+            (1, "new", "Область A", "2025-01-31 10:00:00"),
+            (2, "updated", "Область A", "2025-01-20 10:00:00"),
+            (3, "rejected", "Область A", "2025-01-31 11:00:00"),
+            (4, "new", "Область B", "2025-01-31 12:00:00"),
+        ])
+        updated_since = app_filter.updated_since(datetime(2025, 1, 31, 12, 0, 0))
+        apps, _, total = await db.get_applications_paginated(
+            per_page=10, status_filter=app_filter.statuses, region_name=region_name, updated_since=updated_since
+        )
+        assert [app[1] for app in apps] == expected_users
+        assert total == len(expected_users)
+        # Выбор заявок для массового действия идет по тому же фильтру и в том же порядке
+        ids = await db.get_application_ids(app_filter.statuses, region_name, updated_since)
+        assert ids == [app[0] for app in apps]
+    run_with_db(tmp_path, scenario)
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import CallbackQuery, Message
+
+from src.metrics import BotMetrics
+from src.middlewares import ThrottlingMiddleware, UpdateSchedulerMiddleware
+
+
+def update_from(user_id: int, callback_data: str | None = None, message_id: int = 10) -> tuple[SimpleNamespace, dict]:
+    """Обновление (сообщение или нажатие кнопки) и данные middleware для него."""
+    callback = None
+    if callback_data is not None:
+        callback = SimpleNamespace(
+            data=callback_data, message=SimpleNamespace(message_id=message_id), inline_message_id=None, answer=AsyncMock()
+        )
+    return SimpleNamespace(callback_query=callback), {"event_from_user": SimpleNamespace(id=user_id)}
+
+
+class RecordingHandler:
+    """Хендлер, который ждет release и записывает начало и конец обработки."""
+
+    def __init__(self):
+        self.log: list[str] = []
+        self.release = asyncio.Event()
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, event, data):
+        name = data["name"]
+        self.log.append(f"in {name}")
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await self.release.wait()
+        self.running -= 1
+        self.log.append(f"out {name}")
+        return name
+
+
+async def dispatch_all(middleware: UpdateSchedulerMiddleware, handler: RecordingHandler, updates: list[tuple[str, tuple]]):
+    tasks = []
+    for name, (event, data) in updates:
+        tasks.append(asyncio.create_task(middleware(handler, event, data | {"name": name})))
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+    handler.release.set()
+    return await asyncio.gather(*tasks)
+
+
+def test_updates_of_one_user_are_serialized():
+    middleware = UpdateSchedulerMiddleware(max_concurrency=10)
+    handler = RecordingHandler()
+    asyncio.run(dispatch_all(middleware, handler, [("a1", update_from(1)), ("a2", update_from(1)), ("b", update_from(2))]))
+    assert handler.log.index("out a1") < handler.log.index("in a2")
+    # Другой пользователь не ждет первого
+    assert handler.log.index("in b") < handler.log.index("out a1")
+
+
+def test_concurrency_is_bounded():
+    middleware = UpdateSchedulerMiddleware(max_concurrency=2)
+    handler = RecordingHandler()
+    results = asyncio.run(dispatch_all(middleware, handler, [(str(user_id), update_from(user_id)) for user_id in range(5)]))
+    assert results == [str(user_id) for user_id in range(5)]
+    assert handler.max_running == 2
+
+
+def test_repeated_press_is_coalesced():
+    metrics = BotMetrics(db=None)
+    middleware = UpdateSchedulerMiddleware(metrics=metrics)
+    handler = RecordingHandler()
+    first, repeated, other_button = update_from(1, "approve_5"), update_from(1, "approve_5"), update_from(1, "reject_5")
+    results = asyncio.run(dispatch_all(middleware, handler, [("first", first), ("repeated", repeated), ("other", other_button)]))
+    assert results == ["first", UNHANDLED, "other"]
+    repeated[0].callback_query.answer.assert_awaited_once()
+    assert metrics.coalesced_callbacks == 1
+
+    # После обработки то же нажатие снова доходит до хендлера
+    event, data = update_from(1, "approve_5")
+    assert asyncio.run(middleware(handler, event, data | {"name": "again"})) == "again"
+
+
+def test_state_is_reread_after_waiting():
+    middleware = UpdateSchedulerMiddleware()
+    state = SimpleNamespace(current="Form:name")
+    state.get_state = AsyncMock(side_effect=lambda: state.current)
+
+    async def handler(event, data):
+        await asyncio.sleep(0.01)
+        state.current = "Form:age"
+        return data["raw_state"]
+
+    async def scenario():
+        # Оба обновления прочитали состояние до очереди; второе должно увидеть изменение первого
+        first, second = update_from(1), update_from(1)
+        return await asyncio.gather(
+            middleware(handler, first[0], first[1] | {"state": state, "raw_state": "Form:name"}),
+            middleware(handler, second[0], second[1] | {"state": state, "raw_state": "Form:name"}),
+        )
+
+    assert asyncio.run(scenario()) == ["Form:name", "Form:age"]
+
+
+async def echo(event, data):
+    return "handled"
+
+
+def throttled_call(middleware: ThrottlingMiddleware, user_id: int, event=None, **flags):
+    event = event or MagicMock(spec=Message)
+    data = {"event_from_user": SimpleNamespace(id=user_id), "handler": SimpleNamespace(flags=flags)}
+    return middleware(echo, event, data)
+
+
+def test_flood_is_dropped_per_user():
+    metrics = BotMetrics(db=None)
+    middleware = ThrottlingMiddleware(rules={"default": (1.0, 2, "drop")}, exempt_ids=[99], metrics=metrics)
+
+    async def scenario():
+        assert [await throttled_call(middleware, 1) for _ in range(2)] == ["handled", "handled"]
+        callback = MagicMock(spec=CallbackQuery)
+        callback.answer = AsyncMock()
+        assert await throttled_call(middleware, 1, callback) is None
+        callback.answer.assert_awaited_once_with("Слишком часто. Подождите немного.")
+        # Другие пользователи, администраторы и хендлеры без ограничения не затронуты
+        assert await throttled_call(middleware, 2) == "handled"
+        assert [await throttled_call(middleware, 99) for _ in range(5)] == ["handled"] * 5
+        assert await throttled_call(middleware, 1, throttle=False) == "handled"
+        assert await throttled_call(middleware, 1, throttle="unknown") == "handled"
+
+    asyncio.run(scenario())
+    assert metrics.throttled == {("default", "dropped"): 1}
+
+
+def test_delay_rule_waits_within_max_delay():
+    metrics = BotMetrics(db=None)
+    rules = {"default": (1.0, 1, "drop"), "form": (20.0, 1, "delay")}
+    middleware = ThrottlingMiddleware(rules=rules, max_delay=0.12, metrics=metrics)
+
+    async def scenario():
+        assert await throttled_call(middleware, 1, throttle="form") == "handled"
+        # Своя корзина у каждого правила: правило по умолчанию еще не тронуто
+        assert await throttled_call(middleware, 1) == "handled"
+        started = time.monotonic()
+        results = await asyncio.gather(*(throttled_call(middleware, 1, throttle="form") for _ in range(3)))
+        # Третьему пришлось бы ждать дольше max_delay
+        assert results == ["handled", "handled", None]
+        assert time.monotonic() - started >= 0.09
+
+    asyncio.run(scenario())
+    assert metrics.throttled[("form", "delayed")] == 2
+    assert metrics.throttled[("form", "dropped")] == 1
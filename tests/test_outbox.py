@@ -0,0 +1,74 @@
+import sqlite3
+import time
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from src.database import Database
+from src.outbox import Outbox
+from src.rate_limit import ChatRateLimiter
+from tests.test_database import run_with_db
+
+
+def outbox_rows(path) -> list[tuple[int, str, int]]:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT chat_id, status, attempts FROM outbox ORDER BY id").fetchall()
+
+
+def test_claimed_messages_are_leased(tmp_path):
+    async def scenario(db: Database):
+        assert await db.enqueue_outbox_many([(chat_id, "текст") for chat_id in (1, 2, 3)]) == 3
+        now = time.time()
+        first = await db.claim_due_outbox(now, limit=2, lease=60)
+        assert sorted(row[1] for row in first) == [1, 2]
+        # Второй процесс забирает только то, что еще никто не взял
+        second = await db.claim_due_outbox(now, limit=10, lease=60)
+        assert [row[1] for row in second] == [3]
+        assert await db.claim_due_outbox(now, limit=10, lease=60) == []
+        assert await db.get_next_outbox_attempt() == now + 60
+
+        # Процесс, забравший первую пачку, упал: после lease сообщения забираются снова
+        reclaimed = await db.claim_due_outbox(now + 61, limit=10, lease=60)
+        assert sorted(row[0] for row in reclaimed) == sorted(row[0] for row in first + second)
+    run_with_db(tmp_path, scenario)
+
+
+def test_complete_outbox_records_results(tmp_path):
+    async def scenario(db: Database):
+        await db.enqueue_outbox_many([(chat_id, "текст") for chat_id in (1, 2, 3, 4)])
+        now = time.time()
+        sent, retried, paused, failed = sorted(row[0] for row in await db.claim_due_outbox(now, limit=10, lease=60))
+        await db.complete_outbox(
+            [sent], [(retried, now + 5, "timeout", True), (paused, now + 1, "retry after", False)], [(failed, "blocked")]
+        )
+        assert outbox_rows(tmp_path / "test.db") == [(2, "pending", 1), (3, "pending", 0), (4, "failed", 1)]
+        assert await db.get_next_outbox_attempt() == now + 1
+        assert sorted(row[0] for row in await db.claim_due_outbox(now + 5, limit=10, lease=60)) == [retried, paused]
+    run_with_db(tmp_path, scenario)
+
+
+class FakeBot:
+    def __init__(self, errors: dict[int, Exception]):
+        self.errors = errors
+        self.sent: list[int] = []
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = None):
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        self.sent.append(chat_id)
+
+
+def test_dispatch_sends_retries_and_drops(tmp_path):
+    async def scenario(db: Database):
+        bot = FakeBot({
+            2: ConnectionError("network is unreachable"),
+            3: TelegramForbiddenError(SendMessage(chat_id=3, text="текст"), "bot was blocked by the user"),
+        })
+        outbox = Outbox(bot, db, limiter=ChatRateLimiter(1000, 0), max_attempts=2)
+        assert await outbox.enqueue_many([(1, "текст"), (2, "текст"), (3, "текст")]) == 3
+        assert await outbox.dispatch_due() == 3
+        assert bot.sent == [1]
+        assert outbox_rows(tmp_path / "test.db") == [(2, "pending", 1), (3, "failed", 1)]
+        # Повтор отложен - до его времени отправлять нечего
+        assert await outbox.dispatch_due() == 0
+    run_with_db(tmp_path, scenario)
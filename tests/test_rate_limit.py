@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import rate_limit
+from src.rate_limit import KeyedRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=fake))
+    return fake
+
+
+def test_burst_passes_then_drops(clock):
+    limiter = KeyedRateLimiter(rate=2.0, burst=3)
+    assert [limiter.reserve(1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.reserve(1) is None
+    # Другой ключ ограничивается независимо
+    assert limiter.reserve(2) == 0.0
+
+
+def test_tokens_refill_at_rate(clock):
+    limiter = KeyedRateLimiter(rate=2.0, burst=3)
+    for _ in range(3):
+        limiter.reserve(1)
+    clock.now += 0.5
+    assert limiter.reserve(1) == 0.0
+    assert limiter.reserve(1) is None
+
+
+def test_delay_within_max_delay(clock):
+    limiter = KeyedRateLimiter(rate=2.0, burst=1)
+    assert limiter.reserve(1, max_delay=1.0) == 0.0
+    assert limiter.reserve(1, max_delay=1.0) == pytest.approx(0.5)
+    assert limiter.reserve(1, max_delay=1.0) == pytest.approx(1.0)
+    # Ждать пришлось бы 1.5 с - обновление отбрасывается, токен не расходуется
+    assert limiter.reserve(1, max_delay=1.0) is None
+    clock.now += 0.5
+    assert limiter.reserve(1, max_delay=1.0) == pytest.approx(1.0)
+
+
+def test_idle_keys_are_pruned(clock):
+    limiter = KeyedRateLimiter(rate=1.0, burst=2, sweep_interval=10.0)
+    limiter.reserve(1)
+    limiter.reserve(2)
+    assert len(limiter) == 2
+    clock.now += 10.0
+    limiter.reserve(3)
+    assert len(limiter) == 1
@@ -0,0 +1,37 @@
+import asyncio
+
+from src.scheduling import KeyedLocks
+
+
+async def _run_holders(locks: KeyedLocks, keys: list[tuple[int, str]]) -> list[str]:
+    log = []
+
+    async def holder(key: int, name: str):
+        async with locks.hold(key):
+            log.append(f"in {name}")
+            await asyncio.sleep(0.01)
+            log.append(f"out {name}")
+
+    await asyncio.gather(*(holder(key, name) for key, name in keys))
+    return log
+
+
+def test_same_key_is_serialized():
+    log = asyncio.run(_run_holders(KeyedLocks(), [(1, "a1"), (1, "a2"), (2, "b")]))
+    assert log.index("out a1") < log.index("in a2")
+    # Разные ключи не ждут друг друга
+    assert log.index("in b") < log.index("out a1")
+
+
+def test_new_lock_is_not_evicted_while_held():
+    # Единственное место занято блокировкой ключа 1: новая блокировка ключа 2
+    # не должна вытеснить сама себя, иначе второй hold(2) получит другой объект
+    log = asyncio.run(_run_holders(KeyedLocks(max_size=1), [(1, "a"), (2, "b1"), (2, "b2")]))
+    assert log.index("out b1") < log.index("in b2")
+
+
+def test_free_locks_are_evicted():
+    locks = KeyedLocks(max_size=2)
+    asyncio.run(_run_holders(locks, [(key, str(key)) for key in range(5)]))
+    asyncio.run(_run_holders(locks, [(10, "x")]))
+    assert len(locks) == 2
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from src.supervisor import Supervisor, merge_metrics, route_key
+
+
+@pytest.mark.parametrize("update, key", [
+    ({"update_id": 1, "message": {"from": {"id": 7}, "chat": {"id": -100}}}, 7),
+    ({"update_id": 2, "callback_query": {"from": {"id": 8}, "message": {"chat": {"id": -100}}}}, 8),
+    ({"update_id": 3, "my_chat_member": {"chat": {"id": -100}, "from": {"id": 9}}}, 9),
+    ({"update_id": 4, "channel_post": {"chat": {"id": -100}}}, -100),
+    ({"update_id": 5, "poll": {"id": "x"}}, 0),
+])
+def test_route_key(update, key):
+    assert route_key(update) == key
+
+
+def test_merge_metrics_groups_families_and_labels_workers():
+    worker = (
+        "# HELP bot_updates_total Обновления.\n"
+        "# TYPE bot_updates_total counter\n"
+        'bot_updates_total{type="message"} 3\n'
+        "# HELP bot_uptime_seconds Время работы.\n"
+        "# TYPE bot_uptime_seconds gauge\n"
+        "bot_uptime_seconds 10\n"
+    )
+    assert merge_metrics({1: worker, 0: worker.replace("3", "5")}) == [
+        "# HELP bot_updates_total Обновления.",
+        "# TYPE bot_updates_total counter",
+        'bot_updates_total{worker="0",type="message"} 5',
+        'bot_updates_total{worker="1",type="message"} 3',
+        "# HELP bot_uptime_seconds Время работы.",
+        "# TYPE bot_uptime_seconds gauge",
+        'bot_uptime_seconds{worker="0"} 10',
+        'bot_uptime_seconds{worker="1"} 10',
+    ]
+
+
+class FakeUpdate:
+    def __init__(self, update_id: int, user_id: int):
+        self.update_id = update_id
+        self._data = {"update_id": update_id, "message": {"from": {"id": user_id}, "chat": {"id": user_id}}}
+
+    def model_dump(self, **kwargs) -> dict:
+        return self._data
+
+
+class FakeBot:
+    """getUpdates, который, как Telegram, возвращает все неподтвержденные обновления начиная с offset."""
+
+    def __init__(self, updates: list[FakeUpdate]):
+        self.updates = updates
+        self.offsets: list[int | None] = []
+
+    async def delete_webhook(self, **kwargs):
+        pass
+
+    async def get_updates(self, offset: int | None = None, timeout: int = 0) -> list[FakeUpdate]:
+        self.offsets.append(offset)
+        pending = [u for u in self.updates if offset is None or u.update_id >= offset]
+        if not pending:
+            await asyncio.sleep(0.01)
+        return pending
+
+
+def test_polling_offset_waits_for_delivery():
+    async def scenario():
+        supervisor = Supervisor(workers=1)
+        forwarded: list[int] = []
+        release_first = asyncio.Event()
+
+        async def forward(worker, update):
+            if update["update_id"] == 1:
+                await release_first.wait()
+            forwarded.append(update["update_id"])
+        supervisor._forward = forward
+
+        bot = FakeBot([FakeUpdate(1, user_id=10), FakeUpdate(2, user_id=20)])
+        polling = asyncio.create_task(supervisor.run_polling(bot))
+        await asyncio.sleep(0.1)
+        # Обновление 2 передано, 1 еще нет: offset не подтверждает ни одно, но повторно они не раздаются
+        assert forwarded == [2]
+        assert supervisor.pending_updates == {1}
+        assert set(bot.offsets) == {None, 1}
+        # Пока ничего не передается, Telegram опрашивается не чаще раза в _REPOLL_DELAY
+        assert len(bot.offsets) <= 3
+
+        release_first.set()
+        await asyncio.sleep(0.1)
+        assert forwarded == [2, 1]
+        assert bot.offsets[-1] == 3
+        polling.cancel()
+        await supervisor.close()
+    asyncio.run(scenario())